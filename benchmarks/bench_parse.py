@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""\
+Speed benchmarks using the pytest-benchmark plugin.  Run with::
+
+    py.test benchmarks/bench_parse.py
+
+Throughput (lines/s and MB/s) and peak memory are put in the
+``extra_info`` of each benchmark.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import tracemalloc
+
+import pytest
+
+from workloads import GENERATORS, input_size
+
+pytest.importorskip('pytest_benchmark')
+
+SIZES = [1000, 10000]
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('generator', GENERATORS,
+                         ids=[g.__name__ for g in GENERATORS])
+def test_read_input(benchmark, generator, size):
+    workload = generator(size)
+    reader, lines = workload.reader, workload.lines
+
+    tracemalloc.start()
+    reader.read_input(lines)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    benchmark(reader.read_input, lines)
+
+    mean = benchmark.stats.stats.mean
+    benchmark.extra_info['lines'] = len(lines)
+    benchmark.extra_info['lines_per_s'] = len(lines) / mean
+    benchmark.extra_info['MB_per_s'] = input_size(lines) / mean / 1e6
+    benchmark.extra_info['peak_MB'] = peak / 1e6
@@ -0,0 +1,67 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+"""\
+Run the benchmark workloads without any plugins and print a table of
+throughput and peak memory.  Run from the top of the repository as::
+
+    python benchmarks/run.py [--repeat N] [size ...]
+"""
+from __future__ import division, print_function, unicode_literals
+
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workloads import GENERATORS, input_size
+
+
+def measure(workload, repeat=5):
+    """Returns the best time to read the workload and the peak memory."""
+    reader, lines = workload.reader, workload.lines
+    tracemalloc.start()
+    reader.read_input(lines)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = min(timeit.repeat(lambda: reader.read_input(lines),
+                             number=1, repeat=repeat))
+    return best, peak
+
+
+def main(sizes, repeat=5):
+    fmt = '{0:<10} {1:>8} {2:>10} {3:>12} {4:>8} {5:>10}'
+    print(fmt.format('workload', 'lines', 'time (s)', 'lines/s', 'MB/s',
+                     'peak MB'))
+    for size in sizes:
+        for generator in GENERATORS:
+            workload = generator(size)
+            best, peak = measure(workload, repeat)
+            nlines = len(workload.lines)
+            print(fmt.format(workload.name, nlines, '{0:.4f}'.format(best),
+                             '{0:.0f}'.format(nlines / best),
+                             '{0:.2f}'.format(input_size(workload.lines) /
+                                              best / 1e6),
+                             '{0:.2f}'.format(peak / 1e6)))
+
+
+def parse_args(argv=None):
+    """Returns the command line options"""
+    parser = argparse.ArgumentParser(
+        description='Time reading the benchmark workloads and print '
+                    'their throughput and peak memory.')
+    parser.add_argument('sizes', metavar='size', type=int, nargs='*',
+                        default=[1000, 10000],
+                        help='The sizes of the workloads to generate '
+                             '(default: 1000 10000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='How many times to time each workload, '
+                             'keeping the best (default: 5)')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args.sizes, args.repeat)
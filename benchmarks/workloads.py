@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""\
+Synthetic workloads for benchmarking :py:class:`InputReader`.
+
+Each generator takes a size and returns a :py:class:`Workload` holding a
+reader with the keys defined and the lines of an input for it.  The inputs
+are random but the same every time for a given size.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import random
+from collections import namedtuple
+
+from input_reader import InputReader
+
+Workload = namedtuple('Workload', ['name', 'reader', 'lines'])
+
+ELEMENTS = ('h', 'he', 'li', 'be', 'b', 'c', 'n', 'o', 'f', 'ne',
+            'na', 'mg', 'al', 'si', 'p', 's', 'cl', 'ar')
+
+
+def _number(rng):
+    return '{0:.6f}'.format(rng.uniform(-100, 100))
+
+
+def flat_keys(n, nkeys=50):
+    """*n* lines spread over *nkeys* line keys of assorted types."""
+    rng = random.Random(1)
+    reader = InputReader()
+    kinds = [
+        (int, lambda: str(rng.randint(0, 10**6))),
+        (float, lambda: _number(rng)),
+        (str, lambda: rng.choice(ELEMENTS) * 3),
+        (ELEMENTS, lambda: rng.choice(ELEMENTS)),
+    ]
+    keys = []
+    for k in range(nkeys):
+        typ, make = kinds[k % len(kinds)]
+        name = 'key{0}'.format(k)
+        reader.add_line_key(name, type=[typ, typ], repeat=True)
+        keys.append((name, make))
+    lines = []
+    for i in range(n):
+        name, make = rng.choice(keys)
+        lines.append(' '.join([name, make(), make()]))
+    return Workload('flat', reader, lines)
+
+
+def nested_blocks(n, depth=20):
+    """Blocks nested *depth* deep, repeated until there are *n* lines."""
+    rng = random.Random(2)
+    reader = InputReader()
+    level = reader
+    for d in range(depth):
+        level.add_line_key('value', type=float)
+        level.add_boolean_key('flag')
+        level = level.add_block_key('level{0}'.format(d), repeat=(d == 0))
+    level.add_line_key('value', type=float)
+    level.add_boolean_key('flag')
+    lines = []
+    while len(lines) < n:
+        for d in range(depth):
+            lines.append('level{0}'.format(d))
+            lines.append('value '+_number(rng))
+            if rng.random() < 0.5:
+                lines.append('flag')
+        lines.extend(['end'] * depth)
+    return Workload('nested', reader, lines)
+
+
+def regex_lines(n):
+    """*n* lines matched by :py:meth:`~InputReader.add_regex_line`."""
+    rng = random.Random(3)
+    reader = InputReader()
+    number = r'(-?\d+\.\d+)'
+    reader.add_regex_line('xyz', ' '.join([number] * 3), repeat=True)
+    reader.add_regex_line('label', r'label\s+(\w+)', repeat=True)
+    lines = []
+    for i in range(n):
+        if i % 10:
+            lines.append(' '.join([_number(rng) for j in range(3)]))
+        else:
+            lines.append('label '+rng.choice(ELEMENTS))
+    return Workload('regex', reader, lines)
+
+
+def repeated_key(n):
+    """*n* occurrences of one ``atom str float float float`` key."""
+    rng = random.Random(4)
+    reader = InputReader()
+    reader.add_line_key('atom', type=[ELEMENTS, float, float, float],
+                        repeat=True)
+    lines = [' '.join(['atom', rng.choice(ELEMENTS)] +
+                      [_number(rng) for j in range(3)]) for i in range(n)]
+    return Workload('repeat', reader, lines)
+
+
+def wide_glob(n, width=1000):
+    """Lines of *width* floats, *n* numbers in all."""
+    rng = random.Random(5)
+    reader = InputReader()
+    reader.add_line_key('coef', type=None,
+                        glob={'len': '*', 'type': float}, repeat=True)
+    lines = ['coef '+' '.join([_number(rng) for j in range(width)])
+             for i in range(max(n // width, 1))]
+    return Workload('glob', reader, lines)
+
+
+def keyword_lines(n, nkeywords=12):
+    """*n* lines each with *nkeywords* keyword arguments."""
+    rng = random.Random(6)
+    reader = InputReader()
+    keywords = {}
+    for k in range(nkeywords):
+        typ = (int, float, ELEMENTS)[k % 3]
+        keywords['kw{0}'.format(k)] = {'type': typ}
+    reader.add_line_key('opts', type=str, keywords=keywords, repeat=True)
+    make = (lambda: str(rng.randint(0, 99)), lambda: _number(rng),
+            lambda: rng.choice(ELEMENTS))
+    lines = []
+    for i in range(n):
+        pairs = ['kw{0}={1}'.format(k, make[k % 3]())
+                 for k in range(nkeywords)]
+        lines.append(' '.join(['opts', 'run'] + pairs))
+    return Workload('keywords', reader, lines)
+
+
+GENERATORS = [flat_keys, nested_blocks, regex_lines, repeated_key,
+              wide_glob, keyword_lines]
+
+
+def input_size(lines):
+    """Returns the number of bytes in the lines as a file."""
+    return sum([len(x.encode('utf-8')) + 1 for x in lines])
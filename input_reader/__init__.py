@@ -6,15 +6,31 @@ from os.path import dirname, join
 from .input_reader import InputReader
 from .helpers import ReaderError, SUPPRESS, Namespace
 from .files import file_safety_check, abs_file_path
+from .cache import MemoryCache, SharedMemoryCache, DiskCache
+from .watcher import InputWatcher
+from .profiling import ParseStats
+from .tracing import Span, SpanRecorder
+from .generate import generate_input
+from .memory import memory_report
+from .py23compat import py23_range
 from ._version import __version__
 
 __all__ = [
            'InputReader',
            'ReaderError',
            'SUPPRESS',
+           'MemoryCache',
+           'SharedMemoryCache',
+           'DiskCache',
+           'InputWatcher',
+           'ParseStats',
+           'Span',
+           'SpanRecorder',
            'abs_file_path',
            'file_safety_check',
            'range_check',
+           'generate_input',
+           'memory_report',
            'include_path',
           ]
 
@@ -25,7 +41,7 @@ def range_check(low, high, expand=False, asint=False):
     """\
     :py:func:`range_check` will verify that that given range has a
     *low* lower than the *high*.  If both numbers are integers, it
-    will return a list of the expanded range unless *expand* is
+    will return a :py:obj:`range` of the expanded range unless *expand* is
     :py:const:`False`, in which it will just return the high and low.
     If *low* or *high* is not an integers, it will return the *low*
     and *high* values as floats.
@@ -39,8 +55,10 @@ def range_check(low, high, expand=False, asint=False):
     :keyword expand:
         If :py:obj:`True` and both *low* or *high* are integers, then
         :py:func:`range_check` will return the range of integers between
-        *low* and *high*, inclusive. Otherwise, :py:func:`range_check`
-        just returns *low* and *high*.
+        *low* and *high*, inclusive, as a :py:obj:`range` (which is not
+        expanded into a list, so that it takes no memory for large
+        ranges). Otherwise, :py:func:`range_check` just returns *low* and
+        *high*.
     :type expand: bool, optional
     :keyword asint:
         If *expand* is :py:obj:`False`, this will attempt to return the
@@ -62,7 +80,7 @@ def range_check(low, high, expand=False, asint=False):
     # If we need special integer handling, check that we have integers
     if (expand or asint) and int(low) == low and int(high) == high:
         if expand:
-            return tuple(range(int(low), int(high)+1))
+            return py23_range(int(low), int(high)+1)
         else:
             return int(low), int(high)
     # Otherwise return the floats
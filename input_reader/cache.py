@@ -0,0 +1,460 @@
+# -*- coding: utf-8 -*-
+"""Caches that let :py:meth:`InputReader.read_input` return the result
+of a previous read of a file instead of parsing it again.
+
+A cache is given to :py:class:`InputReader` with the *cache* option.
+Any object with the three methods below can be used as a cache:
+
+``key(reader, filename)``
+    Return a hashable key identifying the current contents of
+    *filename* as read by *reader*, or :py:obj:`None` if the
+    file cannot be cached.
+``get(key)``
+    Return the cached :py:class:`Namespace` for *key*, or
+    :py:obj:`None` if there is none.
+``put(key, namespace)``
+    Store *namespace* under *key*.
+"""
+from __future__ import division, print_function, unicode_literals
+
+import errno
+import hashlib
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+
+from .files import abs_file_path
+from .py23compat import py23_str, py23_basestring, py23_RecursionError
+
+__all__ = ['MemoryCache', 'SharedMemoryCache', 'DiskCache']
+
+
+def _file_identity(filename):
+    """\
+    Return a tuple that changes whenever the file on disk changes,
+    or :py:obj:`None` if the file cannot be examined.
+    """
+    try:
+        st = os.stat(filename)
+    except (IOError, OSError):
+        return None
+    mtime = getattr(st, 'st_mtime_ns', None)
+    if mtime is None:
+        mtime = int(st.st_mtime * 1e9)
+    return (os.path.abspath(filename), st.st_dev, st.st_ino,
+            st.st_size, mtime)
+
+
+def _dumps(namespace):
+    """\
+    Serialize a :py:class:`Namespace`, returning :py:obj:`None` if it
+    holds something that cannot be pickled (i.e. regex match objects),
+    or is nested too deeply to pickle.
+    """
+    try:
+        return pickle.dumps(namespace, pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError,
+            py23_RecursionError):
+        return None
+
+
+def _create_segment(name, size):
+    """\
+    Create a shared memory segment that is kept after this process
+    exits, so that other processes can still find the result in it.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, create=True, size=size,
+                                          track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        # Before Python 3.13 the resource tracker would unlink the
+        # segment (with a "leaked shared_memory" warning) when this
+        # process exits
+        if os.name == 'posix':
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _attach_segment(name):
+    """Attach to an existing shared memory segment without owning it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # Before Python 3.13 attaching registers the segment with the
+        # resource tracker, which would unlink it out from under its
+        # owner when this process exits.
+        if os.name == 'posix':
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class MemoryCache(object):
+    """\
+    A cache of parsed inputs kept in the memory of this process.
+
+    A file is found in the cache if its device, inode, size and
+    modification time are unchanged and it was stored by the same reader,
+    with the same key definitions and attributes.  Once the cache holds more than
+    *max_entries* results or *max_bytes* bytes, the least recently used
+    results are dropped.
+
+    Results are stored pickled, and every hit returns a fresh copy so
+    that callers modifying what they are given cannot corrupt the cache.
+    Results that cannot be pickled, such as those holding the match
+    objects of :py:meth:`~InputReader.add_regex_line` keys, are not cached,
+    nor are the results of readers using functions that cannot be found
+    again by name, such as lambdas, nested functions and methods replaced
+    on the reader itself.
+
+    The number of hits and misses are kept in the :py:attr:`hits` and
+    :py:attr:`misses` attributes.
+
+    :keyword max_entries:
+        The most results to keep.  :py:obj:`None` means no limit.
+        The default is :py:const:`128`.
+    :type max_entries: int
+    :keyword max_bytes:
+        The most bytes (of pickled results) to keep.  :py:obj:`None`
+        means no limit.  The default is :py:obj:`None`.
+    :type max_bytes: int
+    """
+
+    def __init__(self, max_entries=128, max_bytes=None):
+        for name, value in (('max_entries', max_entries),
+                            ('max_bytes', max_bytes)):
+            if value is not None and (not isinstance(value, int) or
+                                      value <= 0):
+                raise ValueError(name+' must be a positive int or None, '
+                                 'given '+repr(value))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        # Pickled results, least recently used first
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, reader, filename):
+        """Return the identity of *filename* and the keys of *reader*."""
+        identity = _file_identity(filename)
+        fingerprint = reader._schema_fingerprint()
+        if identity is None or fingerprint is None:
+            return None
+        return identity + (id(reader), fingerprint)
+
+    def get(self, key):
+        """Return a copy of the :py:class:`Namespace` stored for *key*."""
+        try:
+            payload = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        # Re-insert to mark as most recently used
+        self._entries[key] = payload
+        self.hits += 1
+        return pickle.loads(payload)
+
+    def put(self, key, namespace):
+        """Store *namespace* under *key*."""
+        payload = _dumps(namespace)
+        if payload is None:
+            return
+        if self.max_bytes is not None and len(payload) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= len(old)
+        self._entries[key] = payload
+        self.nbytes += len(payload)
+        # Drop the least recently used results until under the limits
+        while ((self.max_entries is not None and
+                len(self._entries) > self.max_entries) or
+               (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            self.nbytes -= len(self._entries.popitem(last=False)[1])
+
+    def clear(self):
+        """Remove all results from the cache."""
+        self._entries.clear()
+        self.nbytes = 0
+
+
+class SharedMemoryCache(object):
+    """\
+    A cache of parsed inputs kept in :py:mod:`multiprocessing.shared_memory`
+    segments so that all processes on a machine (i.e. the workers of a
+    server) can share each other's results.
+
+    Each result is stored pickled in its own segment whose name is
+    derived from the path, size and modification time of the file and
+    the key definitions of the reader, so any process using the same
+    *prefix* can find it.  Each process evicts
+    the segments it created, least recently used (by any process) first,
+    once they total more than *max_bytes*.
+
+    On POSIX systems the segments are kept after the process that
+    created them exits, so results stored by a worker that has been
+    replaced can still be found.  They are then no longer evicted by
+    any process, so a process that should not leave its results behind
+    must call :py:meth:`clear` before it exits.  Otherwise they remain
+    until the machine restarts, or until removed by hand (on Linux they
+    are the files in ``/dev/shm`` starting with *prefix*).  On Windows a
+    segment is removed once no process has it open, so results are only
+    shared between processes running at the same time.
+
+    Results that cannot be pickled, such as those holding the match
+    objects of :py:meth:`~InputReader.add_regex_line` keys, are not cached,
+    nor are the results of readers using functions that cannot be found
+    again by name, such as lambdas, nested functions and methods replaced
+    on the reader itself.
+
+    :keyword prefix:
+        The prefix of the names of the segments.  Keep this short;
+        some platforms limit segment names to 31 characters.
+        The default is :py:const:`'ir'`.
+    :type prefix: str
+    :keyword max_bytes:
+        The most memory the segments created by this process may use.
+        The default is 64 MiB.
+    :type max_bytes: int
+    :exception:
+        :py:exc:`ImportError`: :py:mod:`multiprocessing.shared_memory`
+        is not available (it was added in Python 3.8).
+    """
+
+    # Header of each segment: magic, length of the payload, last access
+    _header = struct.Struct(str('<8sQd'))
+    _magic = b'IRCACHE1'
+
+    def __init__(self, prefix='ir', max_bytes=64 * 1024 * 1024):
+        if shared_memory is None:
+            raise ImportError('SharedMemoryCache requires '
+                              'multiprocessing.shared_memory (Python 3.8+)')
+        if (not isinstance(prefix, py23_basestring) or not prefix
+                or '/' in prefix):
+            raise ValueError('prefix must be a non-empty str without "/", '
+                             'given '+repr(prefix))
+        if not isinstance(max_bytes, int) or max_bytes <= 0:
+            raise ValueError('max_bytes must be a positive int, '
+                             'given '+repr(max_bytes))
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Segments created by this process, least recently stored first
+        self._owned = OrderedDict()
+        self._nbytes = 0
+
+    def key(self, reader, filename):
+        """Return the name of the segment that would hold *filename*."""
+        identity = _file_identity(filename)
+        fingerprint = reader._schema_fingerprint()
+        if identity is None or fingerprint is None:
+            return None
+        path, dev, ino, size, mtime = identity
+        text = '\0'.join([path, py23_str(size), py23_str(mtime),
+                          fingerprint])
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        return '{0}_{1}'.format(self.prefix, digest[:24])
+
+    def get(self, key):
+        """Return the :py:class:`Namespace` stored in segment *key*."""
+        try:
+            shm = _attach_segment(key)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            buf = shm.buf
+            magic, length, atime = self._header.unpack_from(buf, 0)
+            # The owner writes the header last, so this also
+            # catches segments that are still being filled in
+            if magic != self._magic:
+                self.misses += 1
+                return None
+            start = self._header.size
+            payload = bytes(buf[start:start+length])
+            # Mark as recently used for the benefit of the owner
+            self._header.pack_into(buf, 0, magic, length, time.time())
+        finally:
+            shm.close()
+        self.hits += 1
+        return pickle.loads(payload)
+
+    def put(self, key, namespace):
+        """Store *namespace* in a new segment named *key*."""
+        payload = _dumps(namespace)
+        if payload is None:
+            return
+        size = self._header.size + len(payload)
+        if size > self.max_bytes:
+            return
+        try:
+            shm = _create_segment(key, size)
+        except (IOError, OSError):
+            # Another process already stored (or is storing) this file
+            return
+        shm.buf[self._header.size:size] = payload
+        self._header.pack_into(shm.buf, 0, self._magic, len(payload),
+                               time.time())
+        self._owned[key] = (shm, size)
+        self._nbytes += size
+        self._evict()
+
+    def clear(self):
+        """Remove all segments created by this process."""
+        while self._owned:
+            self._unlink(next(iter(self._owned)))
+
+    def _last_access(self, key):
+        """Return when any process last used the segment *key*."""
+        return self._header.unpack_from(self._owned[key][0].buf, 0)[2]
+
+    def _evict(self):
+        """Unlink least recently used segments until under the size cap."""
+        while self._nbytes > self.max_bytes and self._owned:
+            self._unlink(min(self._owned, key=self._last_access))
+
+    def _unlink(self, key):
+        """Remove the owned segment *key*."""
+        shm, size = self._owned.pop(key)
+        self._nbytes -= size
+        shm.close()
+        try:
+            shm.unlink()
+        except (IOError, OSError):
+            pass
+
+
+class DiskCache(object):
+    """\
+    A cache of parsed inputs kept as files in a directory, so that results
+    are kept between runs of a program.
+
+    Results are found by a hash of the contents of the input file and a
+    fingerprint of the key definitions of the reader (every key, its
+    type, default and other options, and the options of the reader
+    itself), so changing an input or a key definition automatically
+    misses the old results.  Changes to the code of
+    :py:meth:`~InputReader.post_process` or of functions used as
+    actions or defaults are not detected; call :py:meth:`clear` after
+    changing those.
+
+    Results that cannot be pickled, such as those holding the match
+    objects of :py:meth:`~InputReader.add_regex_line` keys, are not cached,
+    nor are the results of readers using functions that cannot be found
+    again by name, such as lambdas, nested functions and methods replaced
+    on the reader itself.
+
+    The number of hits and misses are kept in the :py:attr:`hits` and
+    :py:attr:`misses` attributes.
+
+    :argument directory:
+        The directory to keep the results in.  It is created if
+        it does not exist.  ``~`` and shell variables are expanded.
+    :type directory: str
+    """
+
+    def __init__(self, directory):
+        if not isinstance(directory, py23_basestring):
+            raise ValueError('directory must be a str, given '+
+                             repr(directory))
+        self.directory = abs_file_path(directory)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, reader, filename):
+        """Return the path the result for *filename* is stored at."""
+        fingerprint = reader._schema_fingerprint()
+        if fingerprint is None:
+            return None
+        digest = hashlib.sha1()
+        try:
+            with open(filename, 'rb') as fl:
+                for chunk in iter(lambda: fl.read(1 << 20), b''):
+                    digest.update(chunk)
+        except (IOError, OSError):
+            return None
+        digest = digest.hexdigest()
+        # Results for each set of key definitions are kept together so
+        # that stale ones are easy to find, and spread over a few
+        # subdirectories so no directory gets too large
+        return os.path.join(self.directory, fingerprint,
+                            digest[:2], digest+'.pickle')
+
+    def get(self, key):
+        """Return the :py:class:`Namespace` stored at *key*."""
+        try:
+            with open(key, 'rb') as fl:
+                namespace = pickle.load(fl)
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        except Exception:
+            # A corrupt file; get rid of it
+            self.misses += 1
+            self._remove(key)
+            return None
+        self.hits += 1
+        return namespace
+
+    def put(self, key, namespace):
+        """Store *namespace* at *key*."""
+        payload = _dumps(namespace)
+        if payload is None:
+            return
+        dirname = os.path.dirname(key)
+        try:
+            os.makedirs(dirname)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                return
+        # Write to a temporary file and move it into place so that other
+        # processes never see a partially written result
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fl:
+                fl.write(payload)
+            getattr(os, 'replace', os.rename)(tmp, key)
+        except (IOError, OSError):
+            self._remove(tmp)
+
+    def clear(self, reader=None):
+        """\
+        Remove the stored results.
+
+        :argument reader:
+            If given, only remove results that were not stored for the
+            current key definitions of *reader* (i.e. stale results).
+        :type reader: :py:class:`InputReader`, optional
+        """
+        keep = reader._schema_fingerprint() if reader is not None else None
+        try:
+            names = os.listdir(self.directory)
+        except (IOError, OSError):
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            # Only touch what this class made
+            if name != keep and len(name) == 40 and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _remove(self, path):
+        """Remove a file, ignoring errors."""
+        try:
+            os.remove(path)
+        except (IOError, OSError):
+            pass
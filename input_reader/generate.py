@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""Make random valid inputs for an :py:class:`InputReader`."""
+from __future__ import division, print_function, unicode_literals
+
+import random
+import string
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from .helpers import ReaderError, Namespace
+from .key_adder import _KeyAdder
+from .keylevel import BooleanKey, Regex, TableKey
+from .py23compat import py23_basestring, py23_values, py23_chr
+
+__all__ = ['generate_input']
+
+# How many times to try to make a valid line for a key before giving up
+_ATTEMPTS = 25
+
+# The most times a regex repeat without an upper bound is repeated
+_MAX_REPEAT = 4
+
+_WORD = string.ascii_letters + string.digits + '_'
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: string.digits,
+    sre_parse.CATEGORY_WORD: _WORD,
+    sre_parse.CATEGORY_NOT_DIGIT: string.ascii_letters + '_',
+    sre_parse.CATEGORY_NOT_WORD: '-+.,:;/',
+    sre_parse.CATEGORY_NOT_SPACE: _WORD + '-+.',
+}
+
+
+def generate_input(reader, lines=100, seed=None, max_glob=8):
+    """\
+    Make a random input that *reader* can read, of about *lines* lines.
+
+    Every key follows its definition: line keys get values of their
+    types (including choices, regular expressions where a matching value
+    can be made, globs and keywords), blocks are nested and ended,
+    required keys are always given, only one key of each mutually
+    exclusive group is given, and keys that depend on others are only
+    given with them.  Optional keys are given at random, and keys that
+    may be repeated are repeated until the input is about the requested
+    length.  Each line made is checked by parsing it before it is used.
+
+    :argument reader:
+        The reader to make an input for.
+    :type reader: :py:class:`InputReader`
+    :keyword lines:
+        About how many lines the input should have.  It will be shorter
+        if there are not enough repeatable keys to fill it, and may be
+        longer if the required keys need more.  The default is
+        :py:const:`100`.
+    :type lines: int
+    :keyword seed:
+        Seed for the random numbers, so that the same input is made each
+        time.  The default is :py:obj:`None`, meaning a different input
+        each time.
+    :keyword max_glob:
+        The most values given to a glob.  The default is :py:const:`8`.
+    :type max_glob: int
+    :rtype: :py:obj:`list` of :py:obj:`str`: The lines of the input.
+    :exception:
+        :py:exc:`ValueError`: A required key has no valid value that can
+        be made, e.g. its regular expression is too complicated.
+    """
+    if not isinstance(lines, int) or lines < 0:
+        raise ValueError('lines must be a non-negative int, '
+                         'given '+repr(lines))
+    if not isinstance(max_glob, int) or max_glob < 1:
+        raise ValueError('max_glob must be a positive int, '
+                         'given '+repr(max_glob))
+    return _Generator(random.Random(seed), max_glob).level(reader, lines)
+
+
+class _Generator(object):
+    """Makes the lines of each level"""
+
+    def __init__(self, rng, max_glob):
+        self.rng = rng
+        self.max_glob = max_glob
+
+    def level(self, level, budget):
+        """Returns the lines of a level with about *budget* lines"""
+        rng = self.rng
+        chosen = self.choose_keys(level)
+
+        # Give each chosen key once, then repeat the repeatable ones
+        units = []
+        for key in chosen:
+            unit = self.unit(level, key, budget)
+            if unit is not None:
+                units.append(unit)
+            elif key._required:
+                raise ValueError('Cannot make a valid line for the key "'+
+                                 key.name+'"')
+        size = sum([len(u) for u in units])
+        repeats = [k for k in chosen if k._repeat]
+        while repeats and size < budget:
+            key = rng.choice(repeats)
+            unit = self.unit(level, key, budget - size)
+            if unit is None:
+                repeats.remove(key)
+                continue
+            units.append(unit)
+            size += len(unit)
+
+        rng.shuffle(units)
+        return [line for unit in units for line in unit]
+
+    def choose_keys(self, level):
+        """Returns the keys to give for a level"""
+        rng = self.rng
+        keys = list(py23_values(level._keys)())
+        chosen = [k for k in keys if k._required or rng.random() < 0.5]
+        groups = [list(py23_values(meg._keys)()) for meg in level._meg]
+        for meg, members in zip(level._meg, groups):
+            if members and (meg._required or rng.random() < 0.5):
+                chosen.append(rng.choice(members))
+
+        # Add what the chosen keys depend on, or drop the chosen key
+        # if what it depends on cannot be given
+        names = {}
+        for key in keys:
+            names[key._dest if key._dest is not None else key.name] = key
+        for key in list(chosen):
+            depends = getattr(key, '_depends', None)
+            if not depends or depends in [_name(k) for k in chosen]:
+                continue
+            if depends in names:
+                chosen.append(names[depends])
+            elif not key._required:
+                chosen.remove(key)
+
+        # A block with nothing in it cannot be read
+        if not chosen and getattr(level, '_end', None) is not None:
+            candidates = [k for k in keys if not getattr(k, '_depends', None)]
+            candidates.extend([g[0] for g in groups if g])
+            if candidates:
+                chosen.append(rng.choice(candidates))
+        return chosen
+
+    def unit(self, level, key, budget):
+        """\
+        Returns the lines for one appearance of a key, or None
+        if no valid lines could be made for it
+        """
+        if isinstance(key, _KeyAdder):
+            inner = self.level(key, self.rng.randint(0, max(budget // 4, 1)))
+            if not inner:
+                return None
+            return [key.name] + inner + [key._end]
+        elif isinstance(key, TableKey):
+            return [key.name] + self.table(key, budget) + [key._end]
+        for attempt in range(_ATTEMPTS):
+            try:
+                line = self.line(key)
+            except ValueError:
+                continue
+            if _valid(level, key, line):
+                return [line]
+        return None
+
+    def line(self, key):
+        """Returns a random line for a boolean, regex or line key"""
+        if isinstance(key, BooleanKey):
+            return key.name
+        elif isinstance(key, Regex):
+            return self.regex(key._regex)
+
+        tokens = [key.name]
+        if key._range:
+            low = self.rng.randint(-10000, 10000)
+            tokens.extend([str(low), str(low + self.rng.randint(0, 10000))])
+            if self.rng.random() < 0.5:
+                tokens.append(str(self.rng.randint(1, 100)))
+            return ' '.join(tokens)
+        tokens.extend([self.token(t) for t in key._type])
+        if key._glob:
+            n = {'*': (0, self.max_glob), '+': (1, self.max_glob),
+                 '?': (0, 1)}[key._glob['len']]
+            n = self.rng.randint(*n)
+            tokens.extend([self.token(key._glob['type']) for i in range(n)])
+        for name, options in sorted(key._keywords.items()):
+            if self.rng.random() < 0.5:
+                tokens.append(name+'='+self.token(options['type']))
+        return ' '.join(tokens)
+
+    def table(self, key, budget):
+        """Returns the rows of a table block"""
+        rng = self.rng
+        width = key._width or rng.randint(1, self.max_glob)
+        rows = rng.randint(1, max(budget // 4, 1))
+        return [' '.join([self.token(key._type) for j in range(width)])
+                for i in range(rows)]
+
+    def token(self, typ):
+        """Returns a random token of the given type"""
+        rng = self.rng
+        if isinstance(typ, tuple):
+            return self.token(rng.choice(typ))
+        elif typ is str:
+            length = rng.randint(1, 10)
+            return ''.join([rng.choice(string.ascii_lowercase)
+                            for i in range(length)])
+        elif typ is int:
+            return str(rng.randint(-10000, 10000))
+        elif typ is float:
+            return '{0:.6g}'.format(rng.uniform(-1000, 1000))
+        elif typ is None:
+            return 'none'
+        elif isinstance(typ, (py23_basestring, int, float)):
+            return str(typ)
+        else:
+            return self.regex(typ)
+
+    def regex(self, regex):
+        """Returns a random string that the regex matches"""
+        text = ''.join(self.sample(sre_parse.parse(regex.pattern,
+                                                   regex.flags)))
+        if not regex.match(text):
+            raise ValueError('Cannot make a match for '+repr(regex.pattern))
+        return text
+
+    def sample(self, pattern):
+        """Returns the characters of a random match of a parsed regex"""
+        rng = self.rng
+        chars = []
+        for op, av in pattern:
+            if op == sre_parse.LITERAL:
+                chars.append(py23_chr(av))
+            elif op == sre_parse.NOT_LITERAL:
+                chars.append(rng.choice(_WORD.replace(py23_chr(av), '')))
+            elif op == sre_parse.ANY:
+                chars.append(rng.choice(_WORD))
+            elif op == sre_parse.IN:
+                chars.append(self.choose_in(av))
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                low, high, sub = av
+                high = min(high, low + _MAX_REPEAT)
+                for i in range(rng.randint(low, high)):
+                    chars.extend(self.sample(sub))
+            elif op == sre_parse.SUBPATTERN:
+                chars.extend(self.sample(av[-1]))
+            elif op == sre_parse.BRANCH:
+                chars.extend(self.sample(rng.choice(av[1])))
+            elif op == sre_parse.AT:
+                pass
+            else:
+                raise ValueError('Cannot make a match for '+repr(op))
+        return chars
+
+    def choose_in(self, items):
+        """Returns a random character from a character set of a regex"""
+        allowed = []
+        negate = False
+        for op, av in items:
+            if op == sre_parse.NEGATE:
+                negate = True
+            elif op == sre_parse.LITERAL:
+                allowed.append(py23_chr(av))
+            elif op == sre_parse.RANGE:
+                allowed.extend([py23_chr(c) for c in range(av[0], av[1]+1)])
+            elif op == sre_parse.CATEGORY and av in _CATEGORIES:
+                allowed.extend(_CATEGORIES[av])
+            else:
+                raise ValueError('Cannot make a match for '+repr(op))
+        if negate:
+            allowed = [c for c in _WORD if c not in allowed]
+        if not allowed:
+            raise ValueError('Cannot make a match for an empty set')
+        return self.rng.choice(allowed)
+
+
+def _name(key):
+    """The name a key is stored under"""
+    return key._dest if key._dest is not None else key.name
+
+
+def _valid(level, key, line):
+    """Is *line* read as the given key of *level*?"""
+    if level._lookup_key(line) is not key:
+        return False
+    try:
+        key._parse([line], 0, Namespace())
+    except ReaderError:
+        return False
+    return True
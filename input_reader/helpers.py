@@ -1,8 +1,60 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, print_function, unicode_literals
 
+import copy
 import sys
 
+from .py23compat import py23_items, py23_zip, py23_intern
+
+# Key tuples shared between pickled namespaces that have the same keys.
+# Namespaces built from the same key level usually have identical keys,
+# so sharing the tuple lets pickle write it only once per dump.
+_key_tuples = {}
+_MAX_KEY_TUPLES = 1024
+
+
+def _intern_keys(keys):
+    """Return the shared copy of the tuple of keys."""
+    try:
+        return _key_tuples[keys]
+    except KeyError:
+        # Don't let a pathological number of layouts grow forever
+        if len(_key_tuples) >= _MAX_KEY_TUPLES:
+            _key_tuples.clear()
+        keys = tuple([py23_intern(k) for k in keys])
+        _key_tuples[keys] = keys
+        return keys
+
+
+def _rebuild_namespace(cls, keys, values, extra=None, defaults=None):
+    """Recreate a :py:class:`Namespace` from its packed representation."""
+    keys = _intern_keys(keys)
+    namespace = cls.__new__(cls)
+    namespace.__dict__.update(py23_zip(keys, values))
+    if extra:
+        namespace.__dict__.update(extra)
+    namespace._order = list(keys)
+    namespace._defaults = defaults if defaults else {}
+    namespace._taken = _NO_KEYS
+    return namespace
+
+
+# Attributes used by Namespace itself rather than holding a key
+_RESERVED = frozenset(['_order', '_defaults', '_taken'])
+
+# No defaults have been replaced or removed yet
+_NO_KEYS = frozenset()
+
+# Defaults of these types are copied (shallowly) for each namespace
+# when first used; all others are given as they are
+_CONTAINERS = (list, dict, set)
+
+
+def _own(value):
+    """A default as a namespace keeps it, so that changing a container
+    in one namespace does not change it for the others."""
+    return copy.copy(value) if isinstance(value, _CONTAINERS) else value
+
 
 class Namespace(object):
     """A simple class to hold the keys and arguments found from the
@@ -11,11 +63,44 @@ class Namespace(object):
 
     You can populate the :py:class:`Namespace` at initialization with
     a series of key-value pairs.  These are considered the defaults.
+
+    The defaults are not copied onto the :py:class:`Namespace` until
+    they are used or :py:meth:`finalize` is called, so namespaces read
+    from the same block share them.  A :py:class:`list`,
+    :py:class:`dict` or :py:class:`set` default is copied at that time,
+    so changing it does not change it for the other namespaces.  Any
+    other default is given as it is.
     """
 
     def __init__(self, **defaults):
         self._order = []
-        self._defaults = defaults.copy()
+        self._defaults = defaults
+        # Defaults replaced by add or removed, which are not looked up
+        self._taken = _NO_KEYS
+
+    @classmethod
+    def _sharing(cls, defaults):
+        """A namespace whose defaults are *defaults* itself rather than a
+        copy.  The dict must not be changed afterwards."""
+        namespace = cls.__new__(cls)
+        namespace._order = []
+        namespace._defaults = defaults
+        namespace._taken = _NO_KEYS
+        return namespace
+
+    def __getattr__(self, name):
+        # Only called for names not set on this namespace, so look
+        # in the defaults
+        d = self.__dict__
+        try:
+            value = d['_defaults'][name]
+        except KeyError:
+            raise AttributeError(name)
+        if name in d['_taken']:
+            raise AttributeError(name)
+        if isinstance(value, _CONTAINERS):
+            value = d[name] = copy.copy(value)
+        return value
 
     def __repr__(self):
         type_name = type(self).__name__
@@ -32,9 +117,38 @@ class Namespace(object):
 
     def __eq__(self, other):
         try:
-            return vars(self) == vars(other)
-        except TypeError:
-            return vars(self) == other
+            return self._vars() == other._vars()
+        except AttributeError:
+            return self._vars() == other
+
+    __hash__ = None
+
+    def _vars(self):
+        """The attributes of this namespace, including the defaults
+        that have been added by :py:meth:`finalize`."""
+        d = dict([(k, v) for k, v in py23_items(self.__dict__)()
+                  if k not in _RESERVED])
+        for key in self._order:
+            if key not in d:
+                d[key] = getattr(self, key)
+        d['_order'] = self._order
+        d['_defaults'] = self._pending()
+        return d
+
+    def _pending(self):
+        """The defaults not yet added by :py:meth:`finalize`."""
+        if not self._defaults:
+            return {}
+        found = set(self._order)
+        return dict([(k, v) for k, v in py23_items(self._defaults)()
+                     if k not in self._taken and k not in found])
+
+    def _take(self, key):
+        """Stop looking up the default of *key*."""
+        if key in self._defaults:
+            if self._taken is _NO_KEYS:
+                self._taken = set()
+            self._taken.add(key)
 
     def __ne__(self, other):
         return not (self == other)
@@ -49,6 +163,24 @@ class Namespace(object):
     def __len__(self):
         return len(self._order)
 
+    def __reduce__(self):
+        """Pickle as an ordered key tuple plus a value tuple.
+
+        This is considerably smaller than pickling the instance
+        dictionary along with the order list and the defaults dictionary.
+        """
+        keys = _intern_keys(tuple(self._order))
+        values = tuple([getattr(self, k) for k in keys])
+        # Anything set as an attribute without using add (i.e. the
+        # default of a mutually exclusive group) must also be kept
+        extra = dict([(k, v) for k, v in py23_items(self.__dict__)()
+                      if k not in self._order and k not in _RESERVED])
+        args = (type(self), keys, values)
+        defaults = self._pending()
+        if extra or defaults:
+            args += (extra or None, defaults or None)
+        return _rebuild_namespace, args
+
     def add(self, key, val):
         """\
         Add a key-value pair to the :py:class:`Namespace`.
@@ -66,11 +198,8 @@ class Namespace(object):
         # allowed
         if key not in self._order:
             self._order.append(key)
-        # Remove this from the default dict
-        try:
-            del self._defaults[key]
-        except KeyError:
-            pass
+        # Stop using the default for this key
+        self._take(key)
 
     def remove(self, key):
         """\
@@ -88,6 +217,8 @@ class Namespace(object):
             self._order.remove(key)
         except ValueError:
             pass
+        else:
+            self._take(key)
 
     def get(self, key, default=None):
         """\
@@ -138,26 +269,231 @@ class Namespace(object):
         Any defaults not yet added with the :py:meth:`add` are added
         to the :py:class:`Namespace`.
         """
-        while True:
-            try:
-                key, val = self._defaults.popitem()
-            except KeyError:
-                break
-            else:
-                self.add(key, val)
+        if not self._defaults:
+            return
+        d = self.__dict__
+        found = set(self._order)
+        # In the order they used to be popped from the defaults
+        for key in reversed(list(self._defaults)):
+            if key not in self._taken and key not in found:
+                if key not in d:
+                    d[key] = _own(self._defaults[key])
+                self._order.append(key)
+
+    def materialize(self):
+        """\
+        Read every lazy block in this :py:class:`Namespace` and the
+        namespaces inside it now, rather than when they are first used,
+        so that any errors in them are raised here.
+
+        :exception:
+            :py:exc:`ReaderError`: An error was found in a lazy block.
+        """
+        # Read the blocks in order with a stack rather than by recursion,
+        # so that deeply nested results may be read
+        stack = [self]
+        while stack:
+            found = []
+            for value in stack.pop().values():
+                if not isinstance(value, tuple):
+                    value = (value,)
+                found.extend([v for v in value if isinstance(v, Namespace)])
+            stack.extend(reversed(found))
+
+
+class _LazyNamespace(Namespace):
+    """\
+    The :py:class:`Namespace` of a block that is only read when it is
+    first used.  Once read, it becomes an ordinary :py:class:`Namespace`.
+    """
+
+    def __init__(self, block, f, i, parents=()):
+        # Namespace.__init__ is not called: _order, _defaults and _taken
+        # are left unset so that using them (i.e. len, iterating or
+        # pickling) goes through __getattr__ and reads the block first.
+        # *parents* are the levels the block is in, to name them in
+        # the errors found reading it.
+        self._lazy = (block, f, i, parents)
+
+    def __getattr__(self, name):
+        # Only called for attributes not set yet, so not once read
+        try:
+            lazy = self.__dict__.pop('_lazy')
+        except KeyError:
+            raise AttributeError(name)
+        try:
+            namespace = lazy[0]._read_lazily(*lazy[1:])
+        except ReaderError:
+            self._lazy = lazy
+            raise
+        self.__dict__.update(vars(namespace))
+        self.__class__ = Namespace
+        return getattr(self, name)
+
+    def __eq__(self, other):
+        self.materialize()
+        return self == other
+
+    __hash__ = None
+
+
+def _has_lazy(namespace):
+    """Are any of the blocks in *namespace* still to be read?"""
+    stack = [namespace]
+    while stack:
+        for value in list(stack.pop().__dict__.values()):
+            if not isinstance(value, tuple):
+                value = (value,)
+            for v in value:
+                if isinstance(v, _LazyNamespace):
+                    return True
+                elif isinstance(v, Namespace):
+                    stack.append(v)
+    return False
 
 
 class ReaderError(Exception):
     """\
     An exception for the :py:class:`InputReader` class.
+
+    Errors found when reading an input also say what went wrong and
+    where, so that programs need not pick apart the message:
+
+    - :py:attr:`code` is one of the codes below, saying what the
+      error is,
+    - :py:attr:`key` is the key the error is about,
+    - :py:attr:`level` is the block the error was found in (the names of
+      the blocks leading to it joined by dots, or the name of the reader
+      for the top level), and
+    - :py:attr:`line` is the number of the line the error was found on,
+      counting from 1.
+
+    Any of them may be :py:obj:`None` if not known or not relevant.
     """
-    def __init__(self, msg):
+
+    #: The input file could not be read
+    UNREADABLE_FILE = 'unreadable_file'
+    #: A line does not belong to any key
+    UNKNOWN_KEY = 'unknown_key'
+    #: A value is not of the type of the key
+    BAD_VALUE = 'bad_value'
+    #: A key was given the wrong number of arguments
+    BAD_ARGUMENTS = 'bad_arguments'
+    #: A keyword is not defined for the key
+    UNKNOWN_KEYWORD = 'unknown_keyword'
+    #: A keyword argument is not of the form key=value
+    BAD_KEYWORD = 'bad_keyword'
+    #: A key that may not be repeated appears more than once
+    DUPLICATE_KEY = 'duplicate_key'
+    #: A required key, or a key of a required group, is missing
+    MISSING_REQUIRED = 'missing_required'
+    #: More than one key of a mutually exclusive group was given
+    MUTUALLY_EXCLUSIVE = 'mutually_exclusive'
+    #: A key was given without a key it depends on
+    MISSING_DEPENDENCY = 'missing_dependency'
+    #: A block has no end
+    UNTERMINATED_BLOCK = 'unterminated_block'
+    #: A key was defined twice
+    DUPLICATE_DEFINITION = 'duplicate_definition'
+
+    def __init__(self, msg, code=None, key=None, level=None, line=None):
         self.msg = msg
-        
+        self.code = code
+        self.key = key
+        self.level = level
+        self.line = line
+
     def __str__(self):
         return self.msg
 
 
+class _ErrorCollector(object):
+    """Keeps the errors found while reading an input rather
+    than stopping at the first"""
+
+    def __init__(self):
+        self.errors = []
+        # The name and first line of each level being read
+        self._levels = []
+
+    def enter(self, name, line):
+        """Start reading a level"""
+        self._levels.append((name, line))
+
+    def leave(self):
+        """Finish reading a level"""
+        self._levels.pop()
+
+    def add(self, msg, line=None, code=None, key=None):
+        """\
+        Keep an error in the current level.  *msg* is the message as
+        the level would raise it, without the names of the levels.
+        *line* is the index of the line, or None for the whole level.
+        """
+        names = [name for name, start in self._levels]
+        if line is None:
+            line = self._levels[-1][1]
+        level = '.'.join(names[1:]) if len(names) > 1 else names[0]
+        error = ReaderError(': '.join(names)+': '+msg, code, key, level,
+                            None if line is None else line+1)
+        self.errors.append(error)
+
+
+class _Hooks(object):
+    """\
+    Told about each step of reading an input, to profile or trace it.
+    The methods given *run* call it to do the step and return what it
+    returns.  This class only runs the steps; subclasses add to it.
+    """
+
+    def enter(self, level, i):
+        """Starting to read the keys of *level* from line *i*"""
+        pass
+
+    def leave(self, level, i, error=None):
+        """Finished reading *level* on line *i*, or failed with *error*"""
+        pass
+
+    def parse(self, key, run):
+        """Reading a key that is not a block"""
+        return run()
+
+    def post(self, level, namespace, run):
+        """Checking the keys found in *level*"""
+        return run()
+
+    def stage(self, name, run):
+        """A stage of reading other than parsing, one of
+        'read_file', 'preprocess' or 'post_process'"""
+        return run()
+
+
+class _HookPair(_Hooks):
+    """Tells two hooks about each step, the first around the second"""
+
+    def __init__(self, outer, inner):
+        self.outer = outer
+        self.inner = inner
+
+    def enter(self, level, i):
+        self.outer.enter(level, i)
+        self.inner.enter(level, i)
+
+    def leave(self, level, i, error=None):
+        self.inner.leave(level, i, error)
+        self.outer.leave(level, i, error)
+
+    def parse(self, key, run):
+        return self.outer.parse(key, lambda: self.inner.parse(key, run))
+
+    def post(self, level, namespace, run):
+        return self.outer.post(level, namespace,
+                               lambda: self.inner.post(level, namespace, run))
+
+    def stage(self, name, run):
+        return self.outer.stage(name, lambda: self.inner.stage(name, run))
+
+
 class SUPPRESS(object):
     """
     Use this class to indicate that a key should be suppressed
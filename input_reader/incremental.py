@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Re-read an input that changed, parsing only the parts that changed."""
+from __future__ import division, print_function, unicode_literals
+
+from difflib import SequenceMatcher
+
+from .helpers import ReaderError, Namespace
+from .key_adder import BlockKey, _Level
+
+__all__ = ['IncrementalInput']
+
+# Beyond this many changed lines, matching up the unchanged lines
+# between the old and new input costs more than it saves
+_MAX_DIFF_LINES = 20000
+
+
+class IncrementalInput(object):
+    """\
+    Holds the result of reading an input with an :py:class:`InputReader`
+    along with where each top-level key and block was found, so that the
+    input can be read again after it changes by only parsing the
+    top-level keys and blocks whose lines changed.
+
+    Use :py:meth:`InputReader.read_input_incremental` to create one.
+
+    Keys and blocks whose lines are unchanged keep their previous value,
+    including the checks made when their block was read.  The checks of
+    the top level (required keys, mutually exclusive groups, etc.) and
+    :py:meth:`~InputReader.post_process` are always run again.  The values
+    kept are the same objects that are in the previous
+    :py:class:`Namespace`, so changing them (i.e. in
+    :py:meth:`~InputReader.post_process`) changes both.
+
+    :py:attr:`namespace` holds the latest result, and :py:attr:`parsed`
+    and :py:attr:`reused` hold how many top-level keys and blocks were
+    parsed and reused, respectively, by the last read.
+    """
+
+    def __init__(self, reader, filename):
+        self.reader = reader
+        self.filename = filename
+        self.namespace = None
+        self.parsed = 0
+        self.reused = 0
+        # The lines last read, and the (start line, end line, key, value)
+        # of each top-level key found in them
+        self._lines = []
+        self._segments = []
+        self._state = None
+        self.update()
+
+    def update(self, filename=None):
+        """\
+        Read the input again.
+
+        :argument filename:
+            The new input, given in any form accepted by
+            :py:meth:`~InputReader.read_input`.  By default the
+            input last read is read again.
+        :rtype: :py:class:`Namespace`
+        :exception:
+            :py:exc:`ReaderError`: Any known errors will be raised with
+            this custom exception.  The previous result is kept.
+        """
+        if filename is not None:
+            self.filename = filename
+        reader = self.reader
+        if reader.stats is None and not reader._tracers:
+            return self._update()
+        with reader._instrumented('read_input_incremental',
+                                  self.filename) as hooks:
+            return self._update(hooks)
+
+    def _update(self, hooks=None):
+        """Read the input again, reusing the unchanged keys"""
+        reader = self.reader
+        f = reader._read_in_file(self.filename, hooks)
+
+        # Previous values may only be reused if the reader is unchanged
+        state = (reader._generation, reader.__dict__.get('_version', 0))
+        if state == self._state:
+            reuse = self._reusable(f)
+        else:
+            reuse = {}
+
+        self.parsed = self.reused = 0
+        segments = []
+        namespace = self._parse_top_level(f, reuse, segments, hooks)
+
+        reader.input_file = f
+        reader.filename = self.filename
+        reader._post_process(namespace, hooks)
+
+        self._lines = f
+        self._segments = segments
+        self._state = state
+        self.namespace = namespace
+        return namespace
+
+    def _reusable(self, f):
+        """\
+        Returns a dict of where in the new lines each top-level key whose
+        lines did not change now starts, giving its length, key and value.
+        """
+        old = self._lines
+        n = min(len(old), len(f))
+        # Edits are usually in one place, so first skip the
+        # unchanged lines at the start and end
+        head = 0
+        while head < n and old[head] == f[head]:
+            head += 1
+        tail = 0
+        while tail < n - head and old[-1-tail] == f[-1-tail]:
+            tail += 1
+
+        # Runs of unchanged lines as (old start, new start, length)
+        blocks = [(0, 0, head)]
+        oldmid = old[head:len(old)-tail]
+        newmid = f[head:len(f)-tail]
+        if len(oldmid) <= _MAX_DIFF_LINES and len(newmid) <= _MAX_DIFF_LINES:
+            matcher = SequenceMatcher(None, oldmid, newmid, autojunk=False)
+            for a, b, size in matcher.get_matching_blocks():
+                if size:
+                    blocks.append((head+a, head+b, size))
+        blocks.append((len(old)-tail, len(f)-tail, tail))
+
+        # Keep the keys that lie completely inside one run
+        reuse = {}
+        j = 0
+        for start, end, key, val in self._segments:
+            while j < len(blocks) and blocks[j][0] + blocks[j][2] <= start:
+                j += 1
+            if j == len(blocks):
+                break
+            a, b, size = blocks[j]
+            if a <= start and end < a + size:
+                reuse[b + start - a] = (end - start, key, val)
+        return reuse
+
+    def _parse_top_level(self, f, reuse, segments, hooks=None):
+        """\
+        The same as :py:meth:`~InputReader._parse_key_level` for the top
+        level, but taking unchanged keys from *reuse* and recording
+        where each key was found in *segments*.
+        """
+        reader = self.reader
+        namespace = Namespace._sharing(reader._defaults_and_unfind())
+        i = 0
+        while i < len(f):
+            if f[i]:
+                try:
+                    i = self._find_key(f, i, namespace, reuse, segments,
+                                       hooks)
+                except ReaderError as e:
+                    raise reader._level_error(e, i)
+            i += 1
+        if hooks is None:
+            reader._post(namespace)
+        else:
+            hooks.post(reader, namespace, lambda: reader._post(namespace))
+        return namespace
+
+    def _find_key(self, f, i, namespace, reuse, segments, hooks=None):
+        """\
+        The same as :py:meth:`~InputReader._find_key` for the top level,
+        but taking unchanged keys from *reuse*.
+        """
+        try:
+            span, key, val = reuse[i]
+        except KeyError:
+            key = self.reader._lookup_key(f[i])
+            if key is None:
+                # Jump over blocks that belong to other programs
+                end = self.reader._skip_ignored(f, i)
+                if end is not None:
+                    return end
+                # Skip unknown keys if they are ignored
+                if self.reader._ignoreunknown:
+                    return i
+                raise ReaderError(self.reader.name+': Unrecognized key: "'+
+                                  f[i]+'"', ReaderError.UNKNOWN_KEY,
+                                  f[i].split()[0])
+            # Parse into a scratch namespace to get the value of just
+            # this line or block
+            if isinstance(key, BlockKey):
+                # Lazy blocks name the top level in their errors
+                top = (_Level(self.reader, None, None, None),)
+                inew, name, val = key._parse(f, i, Namespace(), None, None,
+                                             top, hooks)
+            elif hooks is not None:
+                inew, name, val = hooks.parse(
+                    key, lambda: key._parse(f, i, Namespace()))
+            else:
+                inew, name, val = key._parse(f, i, Namespace())
+            val = key._one(val)
+            span = inew - i
+            self.parsed += 1
+        else:
+            self.reused += 1
+        inew, name, parsed = key._return_val(i+span, val, namespace)
+        namespace.add(name, parsed)
+        segments.append((i, inew, key, val))
+        return inew
@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, print_function, unicode_literals
 
-from .key_adder import _KeyAdder
-from .helpers import ReaderError, SUPPRESS
-from .py23compat import py23_basestring
+import hashlib
+from contextlib import contextmanager
+
+from .key_adder import _KeyAdder, BlockKey
+from .incremental import IncrementalInput
+from .profiling import ParseStats
+from .tracing import _traced
+from .helpers import (ReaderError, SUPPRESS, _ErrorCollector, _has_lazy,
+                      _HookPair)
+from .keylevel import _Unstable
+from .py23compat import py23_basestring, py23_values
+from ._version import __version__
 
 __all__ = ['InputReader', 'ReaderError', 'SUPPRESS']
 
@@ -35,10 +44,45 @@ class InputReader(_KeyAdder):
     :keyword default:
         The default default that will be given when a
         key is created without a default.  Optional
+    :keyword intern:
+        Intern the values read for line key arguments whose type is
+        :py:obj:`str` or a regular expression, so that the same value
+        read from many input files is one object in memory.  This
+        saves a lot of memory when many results are kept at once.
+        The default is :py:obj:`False`.  Optional
+    :type intern: bool
+    :keyword cache:
+        A cache of previously read files, such as a
+        :py:class:`MemoryCache`, :py:class:`SharedMemoryCache` or
+        :py:class:`DiskCache`.  When a file is found in the cache
+        its stored result is returned instead of reading the file
+        again.  A :py:obj:`tuple` of caches may be given, in which case
+        they are searched in order and a result found in a later
+        cache is also stored in the earlier ones (i.e. put a
+        :py:class:`MemoryCache` in front of a :py:class:`DiskCache`).
+        The default is :py:obj:`None`, meaning no caching.  Optional
+    :keyword profile:
+        Count and time how each key and block is read, storing the
+        results in :py:attr:`stats`.  This is for finding out which
+        keys are slow to read; it makes reading slower, but has no
+        cost when off.  The default is :py:obj:`False`.  Optional
+    :type profile: bool
+    :keyword tracer:
+        An object told when each stage of reading an input starts and
+        finishes, such as a :py:class:`SpanRecorder`.  It must have
+        ``start(span)`` and ``finish(span)`` methods, which are given a
+        :py:class:`Span` for each stage.  A :py:obj:`tuple` of tracers
+        may be given.  The default is :py:obj:`None`.  Optional
     """
 
+    # Attributes that hold state rather than part of the key definition
+    _state_attributes = frozenset(['input_file', 'filename', '_caches',
+                                   '_fingerprint', 'stats', '_tracers',
+                                   '_plan', '_version'])
+
     def __init__(self, comment=['#'], case=False, ignoreunknown=False,
-                 default=None):
+                 default=None, intern=False, cache=None, profile=False,
+                 tracer=None):
         """Initiallize the :py:class:`InputReader` class."""
         super(InputReader, self).__init__(case=case)
 
@@ -67,33 +111,178 @@ class InputReader(_KeyAdder):
         # The default default
         self._default = default
 
-    def read_input(self, filename):
+        # Intern str values?
+        self._intern = intern
+        if not isinstance(self._intern, bool):
+            raise ValueError ('intern value must be a bool, '
+                              'given '+repr(self._intern))
+
+        # Where to look for files that have already been read
+        if cache is None:
+            self._caches = ()
+        elif isinstance(cache, (tuple, list)):
+            self._caches = tuple(cache)
+        else:
+            self._caches = (cache,)
+        for c in self._caches:
+            for method in ('key', 'get', 'put'):
+                if not callable(getattr(c, method, None)):
+                    raise ValueError('cache must define the method "'+method+
+                                     '", given '+repr(c))
+        self._fingerprint = (None, None)
+
+        # Keep statistics of reading?
+        if not isinstance(profile, bool):
+            raise ValueError ('profile value must be a bool, '
+                              'given '+repr(profile))
+        self.stats = ParseStats() if profile else None
+
+        # Who to tell about each stage of reading
+        if tracer is None:
+            self._tracers = ()
+        elif isinstance(tracer, (tuple, list)):
+            self._tracers = tuple(tracer)
+        else:
+            self._tracers = (tracer,)
+        for t in self._tracers:
+            for method in ('start', 'finish'):
+                if not callable(getattr(t, method, None)):
+                    raise ValueError('tracer must define the method "'+
+                                     method+'", given '+repr(t))
+
+    def read_input(self, filename, only=None):
         """\
         Reads in the input from a given file using the supplied rules.
 
         :argument filename:
             The name of the file to read in, :py:mod:`StringIO` of input,
             or list of strings containing the input itself.
+        :keyword only:
+            The keys to read, if not all of them.  Each is given by its
+            path, which is the names of the blocks it is in and its own
+            name (or *dest*) joined by dots (i.e. ``'geometry.charge'``).
+            A block given by itself is read whole.  The other keys are
+            passed over without reading their values, and are not in the
+            result.  Optional.
+        :type only: :py:obj:`list` of :py:obj:`str`
         :rtype: :py:class:`Namespace`: This class contains the read-in data
             each key is stored as members of the class.
         :exception:
             :py:exc:`ReaderError`: Any known errors will be raised with
             this custom exception.
+
+        If a *cache* was given and *filename* is found in it, the cached
+        result is returned.  In that case :py:meth:`post_process` is not
+        called again (its result is what was cached) and
+        :py:attr:`input_file` is set to :py:obj:`None`.
+
+        When *only* is given, the input is still checked for unknown keys
+        and unterminated blocks, but required keys, mutually exclusive
+        groups and dependencies are only checked for the keys asked for.
+        The caches are not used, and :py:meth:`post_process` is given the
+        keys asked for only.
         """
+        if self.stats is None and not self._tracers:
+            return self._read_input(filename, only)
+        with self._instrumented('read_input', filename) as hooks:
+            return self._read_input(filename, only, hooks)
+
+    def _read_input(self, filename, only=None, hooks=None):
+        """Read the input, or get it from the caches"""
+
+        # Part of an input is not what is cached
+        if only is not None:
+            return self._read_and_process(filename, self._projection(only),
+                                          hooks)
+
+        # Return the previous result if this file has already been read
+        keys = []
+        if self._caches and isinstance(filename, py23_basestring):
+            for cache in self._caches:
+                key = cache.key(self, filename)
+                namespace = cache.get(key) if key is not None else None
+                if namespace is not None:
+                    # Give the caches searched first a copy too
+                    for c, k in keys:
+                        if k is not None:
+                            c.put(k, namespace)
+                    self.input_file = None
+                    self.filename = filename
+                    return namespace
+                keys.append((cache, key))
+
+        namespace = self._read_and_process(filename, None, hooks)
+
+        # Storing a result reads its lazy blocks, which is left to the caller
+        if _has_lazy(namespace):
+            return namespace
+        for cache, key in keys:
+            if key is not None:
+                cache.put(key, namespace)
+
+        return namespace
+
+    def _read_and_process(self, filename, only=None, hooks=None):
+        """Read and parse the input, then post-process it"""
 
         # Read in the file, removing comments and extra whitespace/newlines
-        f = self._read_in_file(filename)
+        f = self._read_in_file(filename, hooks)
 
         # Parse this key level, recursively reading lower levels
-        i, namespace = self._parse_key_level(f, 0)
+        i, namespace = self._parse_key_level(f, 0, None, only, hooks)
 
         # If there is any post-processing to do, do it now
         self.input_file = f  # In case the post-processing wants to keep the input
         self.filename = filename
-        self.post_process(namespace)
+        self._post_process(namespace, hooks)
 
         return namespace
 
+    def read_input_incremental(self, filename):
+        """\
+        Reads in the input like :py:meth:`read_input`, but also remembers
+        where each top-level key and block was found so that the input
+        can be read again after it changes by only parsing the parts that
+        changed.  This is useful for editors and for programs that watch
+        their input for changes.
+
+        :argument filename:
+            The name of the file to read in, :py:mod:`StringIO` of input,
+            or list of strings containing the input itself.
+        :rtype: :py:class:`~input_reader.incremental.IncrementalInput`:
+            The result is in its :py:attr:`namespace` attribute.  Call its
+            :py:meth:`~input_reader.incremental.IncrementalInput.update`
+            method to read the input again.
+        :exception:
+            :py:exc:`ReaderError`: Any known errors will be raised with
+            this custom exception.
+        """
+        return IncrementalInput(self, filename)
+
+    def validate_input(self, filename):
+        """\
+        Checks an input for errors, finding all of them in one pass
+        rather than stopping at the first like :py:meth:`read_input`.
+
+        Reading continues past unknown keys, values of the wrong type,
+        keys given twice (the first is kept), missing required keys,
+        mutually exclusive keys given together, and missing keys that
+        others depend on.  :py:meth:`post_process` is not called.
+
+        :argument filename:
+            The name of the file to read in, :py:mod:`StringIO` of input,
+            or list of strings containing the input itself.
+        :rtype: :py:obj:`list` of :py:exc:`ReaderError`: The errors in the
+            order they were found, each with the :py:attr:`level` and
+            :py:attr:`line` it was found on.  Empty if there are none.
+        :exception:
+            :py:exc:`ReaderError`: The file cannot be read.
+        """
+        f = self._read_in_file(filename)
+        errors = _ErrorCollector()
+        self._parse_key_level(f, 0, errors)
+        return errors.errors
+
     def post_process(self, namespace):
         """\
         Perform post-processing of the data collected from the input file.
@@ -103,15 +292,110 @@ class InputReader(_KeyAdder):
         """
         pass
 
-    def _read_in_file(self, filename):
+    def _post_process(self, namespace, hooks=None):
+        """Call :py:meth:`post_process`, telling the hooks"""
+        if hooks is None:
+            self.post_process(namespace)
+        else:
+            hooks.stage('post_process', lambda: self.post_process(namespace))
+
+    @contextmanager
+    def _instrumented(self, name, filename):
+        """Profile and trace the reading of an input.  Gives the
+        hooks to read with."""
+        if self._tracers and self.stats is not None:
+            with _traced(self, name, filename) as outer:
+                with self.stats._instrument(self) as inner:
+                    yield _HookPair(outer, inner)
+        elif self._tracers:
+            with _traced(self, name, filename) as hooks:
+                yield hooks
+        elif self.stats is not None:
+            with self.stats._instrument(self) as hooks:
+                yield hooks
+        else:
+            yield None
+
+    def _projection(self, only):
+        """\
+        Turns the key paths given to :py:meth:`read_input` into a dict of
+        each key asked for to :py:obj:`True`, or for a block of which only
+        some keys are asked for, to the projection of the block.
+        """
+        if isinstance(only, py23_basestring):
+            only = [only]
+        projection = {}
+        for path in only:
+            if not isinstance(path, py23_basestring):
+                raise ValueError('only must be a list of str, '
+                                 'given '+repr(path))
+            level, branch = self, projection
+            names = path.split('.')
+            for n, name in enumerate(names):
+                keys = _keys_named(level, name)
+                if not keys:
+                    raise ValueError('The key "'+path+'" given to only '
+                                     'is not defined')
+                if n == len(names) - 1:
+                    for key in keys:
+                        branch[key] = True
+                    break
+                if len(keys) != 1 or not isinstance(keys[0], BlockKey):
+                    raise ValueError('The key "'+path+'" given to only '
+                                     'is not in a block')
+                level = keys[0]
+                if branch.get(level) is True:
+                    break  # The whole block is asked for already
+                branch = branch.setdefault(level, {})
+        return projection
+
+    def __setattr__(self, name, value):
+        # Changing the reader (i.e. an attribute used by post_process
+        # in a subclass) may change what reading an input gives
+        if name not in self._state_attributes:
+            self.__dict__['_version'] = self.__dict__.get('_version', 0) + 1
+        super(InputReader, self).__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if name not in self._state_attributes:
+            self.__dict__['_version'] = self.__dict__.get('_version', 0) + 1
+        super(InputReader, self).__delattr__(name)
+
+    def _schema_fingerprint(self):
+        """Returns a digest of the key definitions that is the same
+        between runs of the program as long as the keys are the same,
+        or None if the reader uses something that cannot be described
+        the same way between runs (i.e. a lambda)"""
+        state = (self._generation, self.__dict__.get('_version', 0))
+        memo, digest = self._fingerprint
+        if memo != state:
+            cls = type(self)
+            try:
+                text = '\n'.join([__version__, cls.__module__, cls.__name__,
+                                  self._describe()])
+            except _Unstable:
+                digest = None
+            else:
+                digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+            self._fingerprint = (state, digest)
+        return digest
+
+    def _read_in_file(self, filename, hooks=None):
         """Store the filename as a list"""
+        if hooks is None:
+            return self._preprocess(self._read_lines(filename))
+        lines = hooks.stage('read_file', lambda: self._read_lines(filename))
+        return hooks.stage('preprocess', lambda: self._preprocess(lines))
+
+    def _read_lines(self, filename):
+        """Read the lines of the file"""
 
-        f = []
         # Assume a filename was given
         try:
             fl = [x.rstrip() for x in open(filename)]
         except (IOError, OSError) as e:
-            raise ReaderError('Cannot read in file "'+filename+'":'+str(e))
+            raise ReaderError('Cannot read in file "'+filename+'":'+str(e),
+                              ReaderError.UNREADABLE_FILE)
         except TypeError:
             # Assume a StringIO object was given
             try:
@@ -123,7 +407,12 @@ class InputReader(_KeyAdder):
                 except AttributeError:
                     raise ValueError ('Unknown object passed to '
                                       'read_input: '+repr(filename))
+        return fl
 
+    def _preprocess(self, fl):
+        """Remove comments and extra whitespace from the lines"""
+
+        f = []
         # Read in the data
         for line in fl:
             # Remove comments
@@ -135,3 +424,15 @@ class InputReader(_KeyAdder):
 
         return f
 
+
+def _keys_named(level, name):
+    """The keys of a level with the given name or dest, or all the keys of
+    a mutually exclusive group with the given dest."""
+    keyname = name if level._case else name.lower()
+    keys = [k for k in py23_values(level._keys)()
+            if k.name == keyname or k._dest == name]
+    for meg in level._meg:
+        for key in py23_values(meg._keys)():
+            if name in (key._dest, meg._dest) or key.name == keyname:
+                keys.append(key)
+    return keys
@@ -3,15 +3,23 @@ from __future__ import unicode_literals
 
 import re
 
-from .keylevel import _KeyLevel, LineKey, Regex, BooleanKey
-from .helpers import ReaderError, SUPPRESS, Namespace
-from .py23compat import py23_items, py23_values, py23_basestring
+from .keylevel import _KeyLevel, LineKey, Regex, BooleanKey, TableKey
+from .helpers import ReaderError, SUPPRESS, Namespace, _LazyNamespace
+from .py23compat import (py23_items, py23_values, py23_basestring,
+                         py23_intern, py23_range)
 
 
 class _KeyAdder(_KeyLevel):
     """An abstract base class that knows how to add keys to itself
     and check the keys read within it."""
 
+    # Incremented whenever a key or group is added to any level, so that
+    # cached results can tell if the keys have changed since they were read
+    _generation = 0
+
+    # Attributes that hold state rather than part of the key definition
+    _state_attributes = frozenset(['_plan'])
+
     def __init__(self, case=False):
         """Initiallizes the key holders in this class"""
         super(_KeyAdder, self).__init__(case=case)
@@ -22,22 +30,35 @@ class _KeyAdder(_KeyLevel):
         # The mutually exclusive groups
         self._meg = []
 
+        # Blocks belonging to other programs, and how they end
+        self._ignored = {}
+
+        # Intern the values of str-typed arguments?
+        self._intern = False
+
+        # What reading this level needs to know about its keys,
+        # and the generation it was made for
+        self._plan = (None, None)
+
     def _ensure_default_has_a_value(self, kwargs):
         if 'default' not in kwargs:
             kwargs['default'] = self._default
 
     def _check_keyname(self, keyname, strid):
         """Run the given keyname through a few checks"""
+        _KeyAdder._generation += 1
         # Check that the keyname is valid
         if not isinstance(keyname, py23_basestring):
             raise ValueError('{0}: {1} must be str'.format(repr(keyname), strid))
         # Check that the keyname is not defined twice
-        if keyname in self._keys:
-            raise ReaderError('The {0} "{1}" has been defined twice'.format(strid, keyname))
+        if keyname in self._keys or keyname in self._ignored:
+            raise ReaderError('The {0} "{1}" has been defined twice'.format(strid, keyname),
+                              ReaderError.DUPLICATE_DEFINITION, keyname)
         # Adjust keyname if this is case sensitive
         if not self._case:
             keyname = keyname.lower()
-        return keyname
+        # The name is shared by every namespace made at this level
+        return py23_intern(keyname)
 
     def _check_case(self, case, keyname):
         # Use default case if no case is given here
@@ -116,7 +137,8 @@ class _KeyAdder(_KeyLevel):
         return self._keys[keyname]
 
     def add_line_key(self, keyname, type=str, glob={}, keywords={},
-                     case=None, **kwargs):
+                     case=None, memoize=None, memoize_numbers=False,
+                     intern=None, columns=False, **kwargs):
         """Add a line key to the input searcher.
 
         :argument keyname:
@@ -139,6 +161,7 @@ class _KeyAdder(_KeyLevel):
                   :py:obj:`float` (i.e. :py:const:`5.4`) or :py:obj:`str` (i.e.
                   :py:const:`"hello"`)
                 - a compiled regular expression object
+                - :py:obj:`range`, alone (see below)
 
             If you give an explicit :py:obj:`int`, :py:obj:`float` or
             :py:obj:`str`, it is assumed that the
@@ -160,13 +183,20 @@ class _KeyAdder(_KeyLevel):
             *type* is an actual :py:obj:`list` (as opposed to :py:obj:`tuple`)
             because these are treated differently.
 
+            If *type* is :py:obj:`range`, the line is read as
+            ``low high [step]`` of :py:obj:`int` s, and the value is the
+            :py:obj:`range` from *low* to *high*, inclusive.  The range is
+            not expanded, so it takes no more memory for ``1 10000000``
+            than for ``1 10``.  *glob*, *keywords* and *columns* cannot be
+            used with a range.
+
             The default value is :py:obj:`str`.
         :argument glob:
             *glob* is a :py:obj:`dict` giving information on how to read in a
             glob of arguments.  Globs are read in after the positional
             arguments.  If there are no positional arguments, the whole
             line is globbed.  *glob* is not valid with *keywords*.
-            The glob :py:obj:`dict` accepts only four keys:
+            The glob :py:obj:`dict` accepts only five keys:
 
             *len*
                 Must be one of :py:const:`'*'`, :py:const:`'+'`, or
@@ -189,6 +219,13 @@ class _KeyAdder(_KeyLevel):
                 In the case that no glob is given this is what will
                 be put into the *glob*. If there is no default,
                 nothing is put into the *glob*.
+            *array*
+                If :py:obj:`True`, the globbed values are returned as
+                a single NumPy array (or :py:class:`array.array` if NumPy
+                is not installed) after the positional arguments.
+                *type* must be :py:obj:`int` or :py:obj:`float`, and
+                *len* :py:const:`'*'` or :py:const:`'+'`.
+                The default is :py:obj:`False`.
 
             By default this is an empty :py:obj:`dict`.
         :type glob: dict
@@ -212,6 +249,43 @@ class _KeyAdder(_KeyLevel):
             By default, case is determined by the global value set when
             initiallizing the class.
         :type case: bool
+        :argument memoize:
+            Remember the converted value of each token read for each
+            argument, so that a token that appears again is not converted
+            and checked again.  This helps when the same tokens repeat
+            heavily, such as element symbols or choices in a key with
+            *repeat*.  :py:obj:`True` keeps up to 4096 tokens per argument,
+            or give the number of tokens to keep.  Only arguments whose
+            *type* is a choice, regular expression or explicit value are
+            memoized, since :py:obj:`str` needs no conversion.
+            Use :py:meth:`LineKey.memo_stats` on the returned key to see
+            how often the memos are used.
+            The default is :py:obj:`None`, meaning no memoizing.
+        :type memoize: bool or int
+        :argument memoize_numbers:
+            Also memoize arguments whose *type* is :py:obj:`int` or
+            :py:obj:`float`.  The default is :py:obj:`False`.
+        :type memoize_numbers: bool
+        :argument intern:
+            Intern the values read for arguments whose *type* is
+            :py:obj:`str` or a regular expression, so that the same value
+            read many times (i.e. from many input files) is one object
+            in memory.
+            By default, intern is determined by the global value set when
+            initiallizing the class.
+        :type intern: bool
+        :argument columns:
+            For a key with *repeat*, return each argument as a column of
+            all the values read for it, instead of a :py:class:`tuple` of
+            the arguments of each line.  Columns of :py:obj:`int` and
+            :py:obj:`float` are NumPy arrays (:py:class:`numpy.ndarray`)
+            if NumPy is installed, or :py:class:`array.array` otherwise,
+            and columns of :py:obj:`str` are :py:class:`tuple` s.  This
+            takes much less memory for keys repeated many times.  Each
+            *type* must be :py:obj:`int`, :py:obj:`float` or
+            :py:obj:`str`, and *glob* and *keywords* cannot be given.
+            The default is :py:obj:`False`.
+        :type columns: bool
         :argument required:
             Indicates that not inlcuding *keyname* is an error.
             It makes no sense to give a *default* and mark it *required*
@@ -269,12 +343,16 @@ class _KeyAdder(_KeyLevel):
         keyname = self._check_keyname(keyname, 'keyname')
         self._ensure_default_has_a_value(kwargs)
         case = self._check_case(case, keyname)
+        if intern is None:
+            intern = self._intern
         # Store this key
-        self._keys[keyname] = LineKey(keyname, type, glob, keywords, case, **kwargs)
+        self._keys[keyname] = LineKey(keyname, type, glob, keywords, case,
+                                      memoize, memoize_numbers, intern,
+                                      columns, **kwargs)
         return self._keys[keyname]
 
     def add_block_key(self, keyname, end='end', case=None,
-                      ignoreunknown=None, **kwargs):
+                      ignoreunknown=None, lazy=False, **kwargs):
         """Add a block key to the input searcher.
 
         :argument keyname:
@@ -298,6 +376,15 @@ class _KeyAdder(_KeyLevel):
             By default, ignoreunknown is determined by the global value set when
             initiallizing the class.
         :type ignoreunknown: bool
+        :argument lazy:
+            Only find where the block ends when reading the input, and read
+            the keys inside it when the block is first used.  Errors in the
+            keys of the block are raised then, not by
+            :py:meth:`~InputReader.read_input`, unless
+            :py:meth:`Namespace.materialize` is called.  The lines of the
+            input are kept until then.
+            The default is :py:obj:`False`.
+        :type lazy: bool
         :argument required:
             Indicates that not inlcuding *keyname* is an error.
             It makes no sense to give a *default* and mark it *required*
@@ -368,10 +455,16 @@ class _KeyAdder(_KeyLevel):
         if not isinstance(ignoreunknown, bool):
             raise ValueError(keyname+': ignoreunknown must be bool, '
                                         'given '+repr(ignoreunknown))
+        # lazy must be bool
+        if not isinstance(lazy, bool):
+            raise ValueError(keyname+': lazy must be bool, '
+                                        'given '+repr(lazy))
         # Store this key
         self._keys[keyname] = BlockKey(keyname, end, case, ignoreunknown, **kwargs)
+        self._keys[keyname]._lazy = lazy
         # Save the upper default
         self._keys[keyname]._upper_case = self._case
+        self._keys[keyname]._intern = self._intern
         return self._keys[keyname]
 
     def add_regex_line(self, handle, regex, case=None, **kwargs):
@@ -466,6 +559,96 @@ class _KeyAdder(_KeyLevel):
         self._keys[handle] = Regex(handle, regex, **kwargs)
         return self._keys[handle]
 
+    def add_table_block(self, keyname, type=float, width=None, end='end',
+                        case=None, **kwargs):
+        """Add a block holding a table of numbers, one row per line,
+        such as a grid or a matrix.  The lines of the table are read all
+        at once, which is much faster than reading them as line keys.
+        The value is a 2-D NumPy array if NumPy is installed, or
+        otherwise a :py:obj:`tuple` of the rows, each an
+        :py:class:`array.array`.
+
+        :argument keyname:
+            The name of the key to search for.
+        :type keyname: str
+        :argument type:
+            The type of the numbers, :py:obj:`float` or :py:obj:`int`.
+            The default is :py:obj:`float`.
+        :argument width:
+            The number of values on each line.  By default, each line
+            must have as many values as the first.
+        :type width: int
+        :argument end:
+            The :py:obj:`str` used to signify the end of this block.
+            The default is :py:const:`'end'`.
+        :type end: str
+        :argument case:
+            States if *end* is case-sensitive.
+            By default, case is determined by the global value set when
+            initiallizing the class.
+        :type case: bool
+        :argument required:
+            Indicates that not inlcuding *keyname* is an error.
+            The default is :py:obj:`False`.
+        :type required: bool
+        :argument default:
+            The value stored for this key if it does not appear in
+            the input block.  See :py:meth:`add_block_key`.
+        :argument dest:
+            If *dest* is given, *keyname* will be stored in the returned
+            :py:class:`Namespace` as *dest*, not *keyname*.
+        :type dest: str
+        :argument depends:
+            Another key at the same input level that must also appear.
+        :type depends: str
+        :argument repeat:
+            Allow *keyname* to appear several times, returning a
+            :py:obj:`tuple` of the tables.
+            The default is :py:obj:`False`.
+        :type repeat: bool
+        """
+        keyname = self._check_keyname(keyname, 'keyname')
+        self._ensure_default_has_a_value(kwargs)
+        case = self._check_case(case, keyname)
+        # Store this key
+        self._keys[keyname] = TableKey(keyname, type, width, end, case,
+                                       **kwargs)
+        return self._keys[keyname]
+
+    def add_ignored_block(self, keyname, end='end', case=None):
+        """Declare a block that belongs to another program and should be
+        skipped.  Everything from *keyname* to the line that ends the
+        block is passed over in one step, without looking for keys in it.
+        This is much faster than letting *ignoreunknown* ignore each of
+        its lines, and works whether or not *ignoreunknown* is set.
+
+        The block ends at the first line equal to *end*, not counting
+        the ends of blocks nested inside it with the same *keyname*.
+        Any arguments given on the *keyname* line are ignored too.
+
+        :argument keyname:
+            The name of the block to skip.
+        :type keyname: str
+        :argument end:
+            The :py:obj:`str` that ends the block.
+            The default is :py:const:`'end'`.
+        :type end: str
+        :argument case:
+            States if *end* is case-sensitive.
+            By default, case is determined by the global value set when
+            initiallizing the class.
+        :type case: bool
+        """
+        keyname = self._check_keyname(keyname, 'keyname')
+        case = self._check_case(case, keyname)
+
+        # end must be str
+        if not isinstance(end, py23_basestring):
+            raise ValueError(keyname+': end must be str, given '+repr(end))
+        self._validate_string(end)
+
+        self._ignored[keyname] = (end if case else end.lower(), case)
+
     def add_mutually_exclusive_group(self, dest=None, default=None, required=False):
         """Defines a mutually exclusive group.
 
@@ -504,153 +687,357 @@ class _KeyAdder(_KeyLevel):
         if not isinstance(required, bool):
             raise ValueError('required value must be a bool, '
                              'given '+repr(required))
+        if dest is not None:
+            dest = py23_intern(dest)
 
         # Add this group to the list, then return it
+        _KeyAdder._generation += 1
         self._meg.append(MutExGroup(self._case, dest, default, required,
                                     self._ignoreunknown))
+        self._meg[-1]._intern = self._intern
         return self._meg[-1]
 
 
 
-    def _defaults_and_unfind(self):
+    def _defaults_and_unfind(self, only=None):
         """
         Return the defaults for the keys as a dictionary.
         Also unfind all keys in case this is the second time
         we are reading a file with this class.
+        If a projection is given, only its keys are included.
+        The dictionary is shared between calls, so do not change it.
         """
-        defaults = {}
-        for key, val in py23_items(self._keys)():
-            if val._default is not SUPPRESS:
-                name = val._dest if val._dest is not None else val.name
-                defaults[name] = val._default
-        for meg in self._meg:
-            for key, val in py23_items(meg._keys)():
-                if val._default is not SUPPRESS:
-                    name = val._dest if val._dest is not None else val.name
-                    defaults[name] = val._default
-        return defaults
-
-    def _parse_key_level(self, f, i):
+        defaults = self._get_plan().defaults
+        if only is None:
+            return defaults
+        names = set([_stored_name(val) for val in only])
+        return dict([(name, default)
+                     for name, default in py23_items(defaults)()
+                     if name in names])
+
+    def _parse_key_level(self, f, i, errors=None, only=None, hooks=None):
         """Parse the current key level, recursively
-         parsing sublevels if necessary
+         parsing sublevels if necessary.  If an error collector is
+         given, errors are kept in it rather than raised.  If a
+         projection is given, only the keys in it are read.  If hooks
+         are given, they are told about each step of the reading.
         """
 
         # Populate the namespace with the defaults
-        namespace = Namespace(**self._defaults_and_unfind())
+        namespace = Namespace._sharing(self._defaults_and_unfind(only))
 
-        # Populate the namespace with what was found in the input
-        i, namespace = self._find_keys_in_input(f, i, namespace)
-
-        # Post process to make sure that the keys fit the requirements
-        self._post(namespace)
+        if errors is None and hooks is not None:
+            hooks.enter(self, i)
+            try:
+                i, namespace = self._find_keys_in_input(f, i, namespace,
+                                                        None, only, hooks)
+                hooks.post(self, namespace,
+                           lambda: self._post(namespace, None, only))
+            except BaseException as e:
+                hooks.leave(self, i, e)
+                raise
+            hooks.leave(self, i)
+        elif errors is None:
+            # Populate the namespace with what was found in the input
+            i, namespace = self._find_keys_in_input(f, i, namespace,
+                                                    None, only)
+
+            # Post process to make sure that the keys fit the requirements
+            self._post(namespace, None, only)
+        else:
+            # Blocks start on the line before their first key
+            errors.enter(self.name, i-1 if self.name != 'main' else None)
+            try:
+                i, namespace = self._find_keys_in_input(f, i, namespace,
+                                                        errors)
+                self._post(namespace, errors)
+            finally:
+                errors.leave()
 
         return i, namespace
 
-    def _find_keys_in_input(self, f, i, namespace):
-        """Find all the keys in the input block."""
-
-        notend = True
-        while i < len(f) and notend:
+    def _find_keys_in_input(self, f, i, namespace, errors=None, only=None,
+                            hooks=None):
+        """Find all the keys in the input block, and in the blocks inside
+        it.  The blocks are read with a stack rather than by recursion,
+        so they may be nested to any depth.  If the namespace is None,
+        the keys are passed over without reading them to find where the
+        block ends.  The hooks, if given, are told when each block inside
+        is entered and left.
+        """
 
-            # Only search for something if the line is not blank
-            if f[i]:
-                # Find if this line belongs to a key
-                try:
-                    i = self._find_key(f, i, namespace)
-                except ReaderError as e:
-                    # Error on unknown keys
-                    if self._ignoreunknown:
-                        if 'Unrecognized' not in str(e):
-                            raise ReaderError (self.name+': '+str(e))
+        frame = _Level(self, namespace, only, None)
+        stack = [frame]
+        resume = False
+        try:
+            while True:
+                level = frame.level
+                namespace = frame.namespace
+                only = frame.only
+                case = level._case
+                end = getattr(level, '_end', None)
+                if end is not None and not case:
+                    end = end.lower()
+
+                block = None
+                notend = True
+                while True:
+                    if resume:
+                        # Continue after the block that was just read
+                        resume = False
+                    elif i < len(f) and notend:
+                        # Only search for something if the line is not blank
+                        if f[i]:
+                            # Find if this line belongs to a key
+                            try:
+                                i, block = level._find_key(f, i, namespace,
+                                                           errors, only,
+                                                           hooks)
+                            except ReaderError as e:
+                                if errors is None:
+                                    raise _wrap_error(stack, e, i)
+                                errors.add(str(e), i, e.code, e.key)
+                            if block is not None:
+                                break
                     else:
-                        raise ReaderError (self.name+': '+str(e))
+                        break
+
+                    # Increment to the next line
+                    i += 1
+
+                    # If we are in the middle of a block, check if this is
+                    # the end
+                    if i < len(f):
+                        if end is not None and (f[i] if case
+                                                else f[i].lower()) == end:
+                            notend = False
+                    elif i == len(f) and level.name != 'main':
+                        if errors is None:
+                            e = ReaderError (level.name+': Unterminated block.',
+                                             ReaderError.UNTERMINATED_BLOCK,
+                                             level.name, level.name)
+                            raise _wrap_error(stack[:-1], e, frame.start)
+                        errors.add('Unterminated block.', None,
+                                   ReaderError.UNTERMINATED_BLOCK, level.name)
+
+                # Read the block that was found before the rest of this level
+                if block is not None:
+                    stack.append(block)
+                    frame = block
+                    i = block.start + 1
+                    if block.namespace is not None:
+                        if errors is not None:
+                            errors.enter(block.level.name, block.start)
+                        if hooks is not None:
+                            hooks.enter(block.level, i)
+                    continue
 
-            # Increment to the next line
-            i += 1
+                if len(stack) == 1:
+                    return i, namespace
+
+                # This block is done, so give its value to the level it is in
+                if namespace is not None:
+                    try:
+                        if hooks is None:
+                            level._post(namespace, errors, only)
+                        else:
+                            hooks.post(level, namespace, lambda: level._post(
+                                namespace, errors, only))
+                    except ReaderError as e:
+                        raise _wrap_error(stack[:-1], e, frame.start)
+                    if errors is not None:
+                        errors.leave()
+                    if hooks is not None:
+                        hooks.leave(level, i)
+                stack.pop()
+                if namespace is None and frame.lazy:
+                    parents = tuple([_Level(x.level, None, None, x.start)
+                                     for x in stack])
+                    namespace = _LazyNamespace(level, f, frame.start+1,
+                                               parents)
+                child, frame = frame, stack[-1]
+                if namespace is not None and frame.namespace is not None:
+                    try:
+                        i, name, namespace = level._return_val(
+                            i, namespace, frame.namespace)
+                    except ReaderError as e:
+                        if errors is None:
+                            raise _wrap_error(stack, e, child.start)
+                        # Keep the first value of a block that appears twice
+                        errors.add(str(e), child.start, e.code, e.key)
+                        name = level._dest if level._dest is not None else level.name
+                        namespace = getattr(frame.namespace, name)
+                    frame.namespace.add(name, namespace)
+                resume = True
+        except BaseException as e:
+            if hooks is not None:
+                for frame in reversed(stack[1:]):
+                    if frame.namespace is not None:
+                        hooks.leave(frame.level, i, e)
+            raise
+        finally:
+            # Leave the blocks that an error was raised in
+            if errors is not None:
+                for frame in stack[1:]:
+                    if frame.namespace is not None:
+                        errors.leave()
+
+    def _find_key(self, f, i, namespace, errors=None, only=None, hooks=None):
+        """Attempt to find a key in this line.
+        Returns the new current line number, and the block that
+        starts on this line if it is to be read next.
+        Raises a ReaderError if the key in this line is unrecognized,
+        unless unknown keys are ignored.
+        """
 
-            # If we are in the middle of a block, check if this is the end
-            try:
-                if self._case and f[i] == self._end:
-                    notend = False
-                elif not self._case and f[i].lower() == self._end.lower():
-                    notend = False
-            except AttributeError:
-                pass # Not a block, no end attribute
-            except IndexError:
-                if i == len(f) and self.name != 'main':
-                    raise ReaderError (self.name+': Unterminated block.')
+        val = self._lookup_key(f[i])
+        if val is not None:
+            # Pass over the keys that were not asked for
+            want = True if only is None else only.get(val)
+            if isinstance(val, BlockKey):
+                return i, val._level(f, i, errors, want)
+            elif want is None:
+                return val._skip(f, i), None
+            elif hooks is not None:
+                inew, name, parsed = hooks.parse(val, lambda: val._parse(
+                    f, i, namespace, errors))
+            else:
+                inew, name, parsed = val._parse(f, i, namespace, errors)
+            # Add this to the namespace
+            namespace.add(name, parsed)
+            return inew, None
 
-        return i, namespace
+        # If this is a block key, check if this is the end of the block
+        try:
+            e = f[i] if self._upper_case else f[i].lower()
+        except AttributeError:
+            pass
+        else:
+            if e == self._end:
+                return i+1, None
 
-    def _find_key(self, f, i, namespace):
-        """Attempt to find a key in this line.
-        Returns the new current line number.
-        Raises a ReaderError if the key in this line is unrecognized.
-        """
+        # Jump over blocks that belong to other programs
+        if self._ignored:
+            end = self._skip_ignored(f, i)
+            if end is not None:
+                return end, None
 
+        # Skip unknown keys if they are ignored
+        if self._ignoreunknown:
+            return i, None
+
+        # If nothing was found, raise an error
+        raise ReaderError (self.name+': Unrecognized key: "'+f[i]+'"',
+                           ReaderError.UNKNOWN_KEY, f[i].split()[0])
+
+    def _skip_ignored(self, f, i):
+        """If line *i* starts a block added with add_ignored_block,
+        returns the line that ends it, otherwise None."""
         first = f[i].split()[0]
+        if not self._case:
+            first = first.lower()
+        try:
+            end, case = self._ignored[first]
+        except KeyError:
+            return None
+        # Look for the end, counting blocks of the same name inside
+        depth = 0
+        for j in py23_range(i+1, len(f)):
+            line = f[j] if case else f[j].lower()
+            if line == end:
+                if depth == 0:
+                    return j
+                depth -= 1
+            elif line:
+                start = line.split()[0]
+                if start == first or (not self._case and
+                                      start.lower() == first):
+                    depth += 1
+        raise ReaderError (first+': Unterminated block.',
+                           ReaderError.UNTERMINATED_BLOCK, first)
+
+    def _level_error(self, e, i):
+        """Returns the error raised reading line *i* of this level
+        with the name of this level added"""
+        if e.level is None:
+            level = self.name
+        elif self.name == 'main':
+            level = e.level
+        else:
+            level = self.name+'.'+e.level
+        line = e.line if e.line is not None else i+1
+        return ReaderError (self.name+': '+str(e), e.code, e.key, level, line)
+
+    def _lookup_key(self, line):
+        """Returns the key that the given (non-blank) line belongs to,
+        or None if it does not belong to any key at this level."""
+        first = line.split()[0]
         if not self._case:
             first = first.lower()
         # Find in the usual places
         for key, val in py23_items(self._keys)():
             try:
-                if not val._regex.match(f[i]):
+                if not val._regex.match(line):
                     continue
             except AttributeError:
                 if key != first:
                     continue
-            inew, name, parsed = val._parse(f, i, namespace)
-            # Add this to the namespace
-            namespace.add(name, parsed)
-            return inew
+            return val
 
         # Look in the mutually exclusive groups if not in usual places
         for meg in self._meg:
             for key, val in py23_items(meg._keys)():
                 try:
-                    if not val._regex.match(f[i]):
+                    if not val._regex.match(line):
                         continue
                 except AttributeError:
                     if key != first:
                         continue
-                inew, name, parsed = val._parse(f, i, namespace)
-                namespace.add(name, parsed)
-                return inew
-
-        # If this is a block key, check if this is the end of the block
-        try:
-            e = f[i] if self._upper_case else f[i].lower()
-        except AttributeError:
-            pass
-        else:
-            if e == self._end:
-                return i+1
-
-        # If nothing was found, raise an error
-        raise ReaderError (self.name+': Unrecognized key: "'+f[i]+'"')
-
-    def _post(self, namespace):
-        """Post-process the keys."""
+                return val
+
+        return None
+
+    def _get_plan(self):
+        """Returns what reading this level needs to know about its keys,
+        made again only when keys have been added since it was made."""
+        generation, plan = self._plan
+        if generation != _KeyAdder._generation:
+            plan = _Plan(self)
+            self._plan = (_KeyAdder._generation, plan)
+        return plan
+
+    def _post(self, namespace, errors=None, only=None):
+        """Post-process the keys.  If an error collector is given,
+        errors are kept in it rather than raised.  If a projection is
+        given, only the keys in it are checked."""
+        plan = self._get_plan()
+
+        # Give the keys read into columns their final form
+        for name, key in plan.columns:
+            if name in namespace:
+                setattr(namespace, name,
+                        key._finish_columns(getattr(namespace, name)))
 
         # Process the mutually exclusive groups separately
-        for meg in self._meg:
-            nkeys = 0
-            # Loop over each key in this group and count the
-            # number in the namespace
-            for key, val in py23_items(meg._keys)():
-                name = val._dest if val._dest is not None else val.name
-                if name in namespace:
-                    nkeys += 1
-                    thekey = [name, getattr(namespace, name)]
+        for meg, names in plan.groups:
+            if only is not None and not [k for k in py23_values(meg._keys)()
+                                         if k in only]:
+                continue
+            # Count the number of keys in this group in the namespace
+            found = [name for name in names if name in namespace]
+            nkeys = len(found)
+            if nkeys:
+                thekey = [found[-1], getattr(namespace, found[-1])]
             # If none of the keys in the group were found
             if nkeys == 0:
                 # Alert the user if a required key group was not found
                 if meg._required:
                     keys = sorted(meg._keys)
-                    msg = ': One and only one of '
+                    msg = 'One and only one of '
                     msg += ', '.join([repr(x) for x in keys[:-1]])
                     msg += ', or '+repr(keys[-1])+' must be included.'
-                    raise ReaderError (self.name+msg)
+                    self._post_error(msg, errors,
+                                     ReaderError.MISSING_REQUIRED, keys[0])
                 # Set the dest to the default if not suppressing
                 elif meg._dest:
                     if meg._default is not SUPPRESS:
@@ -662,10 +1049,11 @@ class _KeyAdder(_KeyLevel):
             # If more than one key was given raise an error
             elif nkeys > 1:
                 keys = sorted(meg._keys)
-                msg = ': Only one of '
+                msg = 'Only one of '
                 msg += ', '.join([repr(x) for x in keys[:-1]])
                 msg += ', or '+repr(keys[-1])+' may be included.'
-                raise ReaderError (self.name+msg)
+                self._post_error(msg, errors, ReaderError.MUTUALLY_EXCLUSIVE,
+                                 thekey[0])
             # Otherwise this meg is good to go
             else:
                 # If there is a dest the prosses the keys
@@ -676,44 +1064,48 @@ class _KeyAdder(_KeyLevel):
                     indx = namespace._order.index(thekey[0])
                     namespace._order[indx] = meg._dest
                     # Delete the keys in the group from the namespace defaults
-                    for val in py23_values(meg._keys)():
-                        name = val._dest if val._dest is not None else val.name
+                    for name in names:
                         namespace.remove(name)
-                        try:
-                            del namespace._defaults[name]
-                        except KeyError:
-                            pass
+                        namespace._take(name)
 
-        # Loop over the non-grouped keys and check key requirements
-        for key, val in py23_items(self._keys)():
-            name = val._dest if val._dest is not None else val.name
+        # Check the non-grouped keys that are required
+        for key, val, name in plan.required:
+            if only is not None and val not in only:
+                continue
             # Identify missing required keys and raise error if not found
-            if val._required and name not in namespace:
-                msg = ': The key "'+key+'" is required but not found'
-                raise ReaderError (self.name+msg)
+            if name not in namespace:
+                msg = 'The key "'+key+'" is required but not found'
+                self._post_error(msg, errors, ReaderError.MISSING_REQUIRED,
+                                 key)
 
         # Loop over the keys that were found and see if there are any
         # dependencies that were not filled.
-        for key in namespace:
-            # Check if this key has any dependencies,
-            # and if so, they are given as well.
-            for val in py23_values(self._keys)():
-                name = val._dest if val._dest is not None else val.name
-                if key == name:
-                    depends = getattr(val, '_depends', None)
-                    break
-            else:
-                depends = None
-            # Raise an error if the depending key is not found
-            if depends and depends not in namespace:
-            #if depends and depends not in namespace._order:
-                msg = ': The key "'+key+'" requires that "'+depends
-                msg += '" is also present, but it is not'
-                raise ReaderError (self.name+msg)
+        if plan.depends:
+            for key in namespace:
+                # Check if this key has any dependencies,
+                # and if so, they are given as well.
+                depends = plan.depends.get(key)
+                # A key not asked for in a projection is not looked for
+                if depends and only is not None and not [
+                        k for k in only if depends in (k.name, k._dest)]:
+                    depends = None
+                # Raise an error if the depending key is not found
+                if depends and depends not in namespace:
+                    msg = 'The key "'+key+'" requires that "'+depends
+                    msg += '" is also present, but it is not'
+                    self._post_error(msg, errors,
+                                     ReaderError.MISSING_DEPENDENCY, key)
 
         # Finalize the namespace
         namespace.finalize()
 
+    def _post_error(self, msg, errors, code, key):
+        """Raise an error found when post-processing the keys,
+        or keep it if an error collector is given."""
+        if errors is None:
+            raise ReaderError (self.name+': '+msg, code, key, self.name)
+        errors.add(msg, None, code, key)
+
 
 class MutExGroup(_KeyAdder):
     """A class to hold a mutually exclusive group"""
@@ -749,15 +1141,145 @@ class BlockKey(_KeyAdder):
         self._validate_string(self._dest)
         self._validate_string(self._end)
 
-    def _parse(self, f, i, namespace):
+    def _parse(self, f, i, namespace, errors=None, only=None, parents=(),
+               hooks=None):
         """Parses the current line for the key.  Returns the line that
-        we read from and the value"""
+        we read from and the value.  If a projection is given, only the
+        keys of the block in it are read.  *parents* are the levels the
+        block is in, used to name them in the errors of a lazy block."""
 
         # Parse this block
-        n = len(f[i].split())
-        if n == 1:
-            i, val = self._parse_key_level(f, i+1)
+        self._check_arguments(f, i, errors)
+        if errors is None:
+            if self._lazy and only is None:
+                # Find the end now, but read the keys when first used
+                end = self._skip(f, i)
+                lazy = _LazyNamespace(self, f, i+1, parents)
+                return self._return_val(end, lazy, namespace)
+            i, val = self._parse_key_level(f, i+1, None, only, hooks)
             return self._return_val(i, val, namespace)
-        else:
-            raise ReaderError ('The block "'+self.name+'" was given '
-                               'arguments, this is illegal')
\ No newline at end of file
+
+        # When keeping errors, read the block even if it is wrong so
+        # that its lines are not mistaken for keys of this level
+        start = i
+        i, val = self._parse_key_level(f, i+1, errors)
+        try:
+            return self._return_val(i, val, namespace)
+        except ReaderError as e:
+            # Keep the first value of a block that appears twice
+            errors.add(str(e), start, e.code, e.key)
+            name = self._dest if self._dest is not None else self.name
+            return i, name, getattr(namespace, name)
+
+    def _read_lazily(self, f, i, parents):
+        """Reads the keys of a lazy block from line *i*, the first line
+        after the block key.  Errors are raised as if the block had been
+        read with the levels *parents* it is in."""
+        try:
+            return self._parse_key_level(f, i)[1]
+        except ReaderError as e:
+            raise _wrap_error(parents, e, i-1)
+
+    def _skip(self, f, i):
+        """Returns the line that ends this block without reading its
+        keys, for blocks that are not asked for in a projection."""
+        return self._find_keys_in_input(f, i+1, None, None, {})[0]
+
+    def _check_arguments(self, f, i, errors):
+        """Blocks are not given arguments.  When keeping errors, the
+        block is read anyway so that its lines are not mistaken for
+        keys of the level it is in."""
+        if len(f[i].split()) != 1:
+            msg = 'The block "'+self.name+'" was given arguments, this is illegal'
+            if errors is None:
+                raise ReaderError (msg, ReaderError.BAD_ARGUMENTS, self.name)
+            errors.add(msg, i, ReaderError.BAD_ARGUMENTS, self.name)
+
+    def _level(self, f, i, errors, want):
+        """Returns how to read the block starting on line *i* as part of
+        the stack of blocks in _find_keys_in_input.  *want* is what
+        part of the block is asked for in a projection."""
+        if want is None:
+            return _Level(self, None, {}, i)
+        self._check_arguments(f, i, errors)
+        if errors is not None:
+            defaults = self._defaults_and_unfind()
+            return _Level(self, Namespace._sharing(defaults), None, i)
+        elif self._lazy and want is True:
+            return _Level(self, None, {}, i, True)
+        only = None if want is True else want
+        defaults = self._defaults_and_unfind(only)
+        return _Level(self, Namespace._sharing(defaults), only, i)
+
+
+class _Plan(object):
+    """What reading a level needs to know about its keys, worked out
+    once rather than every time the level is read"""
+
+    __slots__ = ('defaults', 'groups', 'required', 'depends', 'columns')
+
+    def __init__(self, level):
+        # The defaults of the keys, by the name they are stored under
+        self.defaults = {}
+        for val in py23_values(level._keys)():
+            if val._default is not SUPPRESS:
+                self.defaults[_stored_name(val)] = val._default
+        for meg in level._meg:
+            for val in py23_values(meg._keys)():
+                if val._default is not SUPPRESS:
+                    self.defaults[_stored_name(val)] = val._default
+
+        # Each mutually exclusive group with the names of its keys
+        self.groups = [(meg, [_stored_name(v)
+                              for v in py23_values(meg._keys)()])
+                       for meg in level._meg]
+
+        # The required keys that are not in a group, as
+        # (key name, key, stored name)
+        self.required = [(key, val, _stored_name(val))
+                         for key, val in py23_items(level._keys)()
+                         if val._required]
+
+        # What the keys that are not in a group depend on, by stored name
+        self.depends = {}
+        for val in py23_values(level._keys)():
+            self.depends.setdefault(_stored_name(val),
+                                    getattr(val, '_depends', None))
+        if not [d for d in py23_values(self.depends)() if d]:
+            self.depends = {}
+
+        # The keys read into columns, with their stored names
+        keys = list(py23_values(level._keys)())
+        for meg in level._meg:
+            keys.extend(py23_values(meg._keys)())
+        self.columns = [(_stored_name(k), k) for k in keys
+                        if getattr(k, '_columns', None)]
+
+
+def _stored_name(key):
+    """The name a key is stored under in the namespace"""
+    return key._dest if key._dest is not None else key.name
+
+
+class _Level(object):
+    """A level being read by _KeyAdder._find_keys_in_input"""
+
+    __slots__ = ('level', 'namespace', 'only', 'start', 'lazy')
+
+    def __init__(self, level, namespace, only, start, lazy=False):
+        self.level = level
+        # None if the keys are only passed over
+        self.namespace = namespace
+        self.only = only
+        # The line the block starts on, or None for the first level
+        self.start = start
+        self.lazy = lazy
+
+
+def _wrap_error(stack, e, i):
+    """Returns the error raised on line *i* of the innermost level of
+    the stack, with the name of each level on the stack added."""
+    for frame in reversed(stack):
+        e = frame.level._level_error(e, i)
+        i = frame.start
+    return e
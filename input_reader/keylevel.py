@@ -1,14 +1,135 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, print_function, unicode_literals
 
+import array
+import re
+import sys
+
 from .helpers import  ReaderError, SUPPRESS
-from .py23compat import py23_str, py23_basestring
+from .py23compat import (py23_str, py23_basestring, py23_items, py23_intern,
+                         py23_range)
+
+
+def _stable_repr(value):
+    """Returns a representation of a value used in a key definition
+    that does not change between runs of the program.  The values in it
+    are described with a stack rather than by recursion, so blocks may
+    be nested to any depth."""
+    work = [value]
+    done = []
+    while work:
+        item = work.pop()
+        if isinstance(item, _Join):
+            parts = done[len(done)-item.count:]
+            del done[len(done)-item.count:]
+            done.append(item.join(parts))
+            continue
+        parts, join = _stable_parts(item)
+        if parts is None:
+            done.append(join)
+        else:
+            work.append(_Join(len(parts), join))
+            work.extend(reversed(parts))
+    return done[0]
+
+
+class _Join(object):
+    """Joins the representations of the last *count* values described"""
+
+    def __init__(self, count, join):
+        self.count = count
+        self.join = join
+
+
+def _stable_parts(value):
+    """Returns the values that the representation of *value* is made
+    from and a function that joins their representations, or None and
+    the representation if it is not made from other values."""
+    if isinstance(value, _KeyLevel):
+        names, values = value._definition()
+        return values, lambda parts: '{0}({1})'.format(
+            type(value).__name__,
+            ', '.join(['{0}={1}'.format(k, v) for k, v in zip(names, parts)]))
+    elif isinstance(value, dict):
+        items = [x for item in py23_items(value)() for x in item]
+        return items, lambda parts: '{'+', '.join(sorted(
+            [k+': '+v for k, v in zip(parts[::2], parts[1::2])]))+'}'
+    elif isinstance(value, (list, tuple)):
+        return list(value), lambda parts: (type(value).__name__+'('+
+                                           ', '.join(parts)+')')
+    elif hasattr(value, 'pattern'):
+        return None, 'regex({0!r}, {1})'.format(value.pattern, value.flags)
+    elif isinstance(value, type) or callable(value):
+        # Types and functions would otherwise include their address
+        return None, _stable_name(value)
+    text = repr(value)
+    if _ADDRESS.search(text):
+        # The default repr of an object, which changes between runs
+        raise _Unstable(value)
+    return None, text
+
+
+# An object address, as in the default repr of an object
+_ADDRESS = re.compile(r' at 0x[0-9a-fA-F]+')
+
+
+class _Unstable(Exception):
+    """Raised for a value with no description that is the same
+    between runs of the program"""
+
+
+def _stable_name(value):
+    """Returns the module and name of a function or class, if it can be
+    found again by that name.  Otherwise (i.e. lambdas, closures and bound
+    methods), raises :py:exc:`_Unstable`."""
+    module = getattr(value, '__module__', None)
+    if module is None:
+        # Methods of builtin types
+        module = getattr(getattr(value, '__objclass__', None),
+                         '__module__', None)
+    name = getattr(value, '__qualname__', getattr(value, '__name__', None))
+    if module is None or name is None or '<' in name:
+        raise _Unstable(value)
+    if getattr(value, '__closure__', None):
+        raise _Unstable(value)
+    found = sys.modules.get(module)
+    for part in name.split('.'):
+        found = getattr(found, part, None)
+    if found is not value and found != value:
+        raise _Unstable(value)
+    return '{0}.{1}'.format(module, name)
+
+
+# The array type code of each type that may be kept in columns,
+# with None for the types kept in a list
+_TYPECODES = {int: 'q' if 'q' in getattr(array, 'typecodes', '') else 'l',
+              float: 'd', str: None}
+if py23_str is not str:
+    _TYPECODES[py23_str] = None
+
+# NumPy, if it is installed and has been needed
+_numpy_module = []
+
+
+def _numpy():
+    """Returns NumPy, or None if it is not installed.  It is imported
+    when first needed since importing it is slow."""
+    if not _numpy_module:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy_module.append(numpy)
+    return _numpy_module[0]
 
 
 class _KeyLevel(object):
     """An abstract base class that provides functionality essential
     for a key"""
 
+    # Attributes that hold state rather than part of the key definition
+    _state_attributes = frozenset()
+
     def __init__(self, case=False):
         """Init the KeyLevel class"""
 
@@ -18,6 +139,25 @@ class _KeyLevel(object):
             raise ValueError('case must be bool, '
                               'given '+repr(self._case))
 
+    def _describe(self):
+        """Returns a description of the definition of this key
+        that does not change between runs of the program."""
+        return _stable_repr(self)
+
+    def _definition(self):
+        """Returns the names and values of the attributes that define
+        this key."""
+        names, values = [], []
+        for k, v in sorted(py23_items(vars(self))()):
+            if k in self._state_attributes:
+                continue
+            if callable(v) and callable(getattr(type(self), k, None)):
+                # A method replaced on this object
+                raise _Unstable(v)
+            names.append(k)
+            values.append(v)
+        return names, values
+
     def _validate_string(self, string):
         """Make sure a string has no spaces"""
         if string is None:
@@ -58,11 +198,22 @@ class _KeyLevel(object):
         else:
             # If the keyname has already been found it is an error,
             if name in namespace:
-                raise ReaderError(self.name+': The key "'+name+'" appears twice')
+                raise ReaderError(self.name+': The key "'+name+'" appears twice',
+                                  ReaderError.DUPLICATE_KEY, self.name)
             # If the key has not been found, simply return
             else:
                 return i, name, val
 
+    def _skip(self, f, i):
+        """Returns the last line of this key without reading it, for
+        keys that are not asked for in a projection."""
+        return i
+
+    def _one(self, val):
+        """The value of one appearance of this key, from what
+        :py:meth:`_parse` returns when it is the only one."""
+        return val[0] if self._repeat else val
+
     def _add_kwargs(self, **kwargs):
         """Generic keyword arguments common to many methods"""
 
@@ -89,6 +240,8 @@ class _KeyLevel(object):
             self._dest = kwargs.pop('dest', None)
         if self._dest is not None and not isinstance(self._dest, py23_basestring):
             raise ValueError('dest value '+repr(self._dest)+' must be a str')
+        if self._dest is not None:
+            self._dest = py23_intern(self._dest)
 
         # Depends
         self._depends = kwargs.pop('depends', None)
@@ -114,7 +267,7 @@ class BooleanKey(_KeyLevel):
         self._validate_string(self.name)
         self._validate_string(self._dest)
 
-    def _parse(self, f, i, namespace):
+    def _parse(self, f, i, namespace, errors=None):
         """Parses the current line for the key.  Returns the line that
         we read from and the value"""
         n = len(f[i].split())
@@ -122,7 +275,8 @@ class BooleanKey(_KeyLevel):
             return self._return_val(i, self._action, namespace)
         else:
             raise ReaderError('The boolean "'+self.name+'" was given '
-                               'arguments, this is illegal')
+                               'arguments, this is illegal',
+                              ReaderError.BAD_ARGUMENTS, self.name)
 
 
 class Regex(_KeyLevel):
@@ -140,7 +294,7 @@ class Regex(_KeyLevel):
         self._validate_string(self.name)
         self._validate_string(self._dest)
 
-    def _parse(self, f, i, namespace):
+    def _parse(self, f, i, namespace, errors=None):
         """Parses the current line for the regex.  Returns the match objext
         for the line."""
 
@@ -149,14 +303,52 @@ class Regex(_KeyLevel):
         return self._return_val(i, val, namespace)
 
 
+class _TokenMemo(object):
+    """A bounded memo of the converted values of the tokens
+    read for one argument of a line key"""
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+
+    def convert(self, key, token, typ):
+        """Returns the converted value of the token, converting it
+        with the key only if it has not been seen before"""
+        try:
+            value = self._values[token]
+        except KeyError:
+            self.misses += 1
+            value = key._check_type_of_value(token, typ, key._case)
+            # Once full, keep what is there rather than churn
+            if len(self._values) < self.size:
+                self._values[token] = value
+            return value
+        self.hits += 1
+        return value
+
+
 class LineKey(_KeyLevel):
     """A class to store data on a line key"""
 
-    def __init__(self, keyname, type, glob, keywords, case, **kwargs):
+    # The memos of converted tokens fill up as input is read
+    _state_attributes = frozenset(['_memos'])
+
+    # Size of each memo if memoize=True
+    _default_memo_size = 4096
+
+    def __init__(self, keyname, type, glob, keywords, case, memoize=None,
+                 memoize_numbers=False, intern=False, columns=False,
+                 **kwargs):
         """Defines a line key."""
         super(LineKey, self).__init__(case=case)
         # Fill in the values
         self.name = keyname
+        self._intern = intern
+        if not isinstance(intern, bool):
+            raise ValueError(self.name+': intern must be bool, '
+                             'given '+repr(intern))
         # Add the generic keyword arguments
         self._add_kwargs(**kwargs)
         # Check strings
@@ -166,6 +358,13 @@ class LineKey(_KeyLevel):
         if glob and keywords:
             msg = ': Cannot define both glob and keywords'
             raise TypeError(self.name+msg)
+        # A range is read from its own two or three arguments
+        self._range = type is range or type is py23_range
+        if self._range:
+            if glob or keywords:
+                raise TypeError(self.name+': Cannot define glob or keywords '
+                                'with a range type')
+            type = int
         # Validate type
         # type given as a list
         if isinstance(type, list):
@@ -201,11 +400,20 @@ class LineKey(_KeyLevel):
             if glob['join'] and glob['len'] == '?':
                 msg = ': "join=True" makes no sense for "len=?"'
                 raise ValueError(self.name+msg)
-            if set(glob.keys()) != set(['len', 'type', 'join']):
-                if set(glob.keys()) != set(['len', 'type', 'join', 'default']):
-                    raise TypeError(self.name+': Unknown key in glob')
+            if not set(glob.keys()) <= set(['len', 'type', 'join',
+                                            'default', 'array']):
+                raise TypeError(self.name+': Unknown key in glob')
             if not isinstance(glob['join'], bool):
                 raise ValueError(self.name+': "join" must be a bool in glob')
+            if not isinstance(glob.get('array', False), bool):
+                raise ValueError(self.name+': "array" must be a bool in glob')
+            if glob.get('array'):
+                if glob['type'] not in (int, float):
+                    raise ValueError(self.name+': "array" requires the type '
+                                     'in glob to be int or float')
+                if glob['join'] or glob['len'] == '?':
+                    raise ValueError(self.name+': "array" cannot be used '
+                                     'with "join" or a "len" of "?" in glob')
             # Make the result is only a string when there is no positionals
             if not self._type and (glob['join'] or glob['len'] == '?'):
                 self._nolist = True
@@ -256,7 +464,71 @@ class LineKey(_KeyLevel):
             msg = ': type, glob and keywords cannot all be empty'
             raise ValueError(self.name+msg)
 
-    def _parse(self, f, i, namespace):
+        # Keep each argument of a repeated key in its own column
+        if not isinstance(columns, bool):
+            raise ValueError(self.name+': columns must be a bool, '
+                             'given '+repr(columns))
+        self._columns = ()
+        if columns:
+            if not self._repeat:
+                raise ValueError(self.name+': columns requires repeat=True')
+            if self._glob or self._keywords or self._range:
+                raise ValueError(self.name+': columns cannot be used with '
+                                 'glob, keywords or a range type')
+            for typ in self._type:
+                if typ not in _TYPECODES:
+                    raise ValueError(self.name+': columns requires each type '
+                                     'to be int, float or str, '
+                                     'given '+repr(typ))
+            self._columns = tuple([_TYPECODES[t] for t in self._type])
+
+        # Memoize the conversion of repeated tokens
+        if not isinstance(memoize_numbers, bool):
+            raise ValueError(self.name+': memoize_numbers must be a bool, '
+                             'given '+repr(memoize_numbers))
+        if memoize is None or memoize is False:
+            size = 0
+        elif memoize is True:
+            size = self._default_memo_size
+        elif isinstance(memoize, int) and memoize > 0:
+            size = memoize
+        else:
+            msg = ': memoize must be a bool or a positive int, given '
+            raise ValueError(self.name+msg+repr(memoize))
+        self._memos = {}
+        if size and not self._range:
+            slots = list(enumerate(self._type))
+            if self._glob:
+                slots.append(('glob', self._glob['type']))
+            for key in self._keywords:
+                slots.append((key, self._keywords[key]['type']))
+            for slot, typ in slots:
+                if self._worth_memoizing(typ, memoize_numbers):
+                    self._memos[slot] = _TokenMemo(size)
+
+    def _worth_memoizing(self, typ, numbers):
+        """Is converting a value of this type slow enough to memoize?"""
+        if typ is str:
+            return False
+        elif typ is int or typ is float:
+            return numbers
+        else:
+            # Choices, regular expressions, explicit values and None
+            return True
+
+    def memo_stats(self):
+        """\
+        Returns the hits and misses of the memos of converted tokens
+        for each memoized argument.
+
+        :rtype: :py:obj:`dict` of (hits, misses) :py:obj:`tuple` s:
+            Positional arguments are given by their index, the glob by
+            :py:const:`'glob'`, and keywords by their name.
+        """
+        return dict([(slot, (memo.hits, memo.misses))
+                     for slot, memo in py23_items(self._memos)()])
+
+    def _parse(self, f, i, namespace, errors=None):
         """Parses the current line for the key.  Returns the line that
         we read from and the value"""
 
@@ -266,6 +538,9 @@ class LineKey(_KeyLevel):
         else:
             args = f[i].lower().split()[1:]
 
+        if self._range:
+            return self._return_val(i, self._read_range(args), namespace)
+
         # Check that the length of args matches the type length
         if len(args) == len(self._type):
             if not self._glob and not self._keywords:
@@ -273,7 +548,8 @@ class LineKey(_KeyLevel):
             elif self._glob.get('len') == '+':
                 msg = ': expected at least '+str(len(self._type)+1)
                 msg += ' arguments, got '+str(len(args))
-                raise ReaderError(self.name+msg)
+                raise ReaderError(self.name+msg, ReaderError.BAD_ARGUMENTS,
+                                  self.name)
             # Checking keywords will be done later
 
         # If the # args is less than the positional
@@ -283,7 +559,8 @@ class LineKey(_KeyLevel):
             else:
                 msg = ': expected '+str(len(self._type))
             msg += ' arguments, got '+str(len(args))
-            raise ReaderError(self.name+msg)
+            raise ReaderError(self.name+msg, ReaderError.BAD_ARGUMENTS,
+                              self.name)
 
         # If there are too many arguments
         elif len(args) > len(self._type):
@@ -300,12 +577,17 @@ class LineKey(_KeyLevel):
                     msg =': expected '+str(n)
                 if len(args) != n:
                     msg += ' arguments, got '+str(len(args))
-                    raise ReaderError(self.name+msg)
+                    raise ReaderError(self.name+msg,
+                                      ReaderError.BAD_ARGUMENTS, self.name)
 
         # Read in the arguments, making sure they match the types and choices
         val = []
-        for a, t in zip(args[:len(self._type)], self._type):
-            val.append(self._check_type_of_value(a, t, self._case))
+        memos = self._memos
+        for n, (a, t) in enumerate(zip(args[:len(self._type)], self._type)):
+            if n in memos:
+                val.append(memos[n].convert(self, a, t))
+            else:
+                val.append(self._check_type_of_value(a, t, self._case))
 
         # Remove the arguments that were just read in
         try:
@@ -318,10 +600,24 @@ class LineKey(_KeyLevel):
         kw = {}
         if self._glob:
             t = self._glob['type']
-            for a in args:
-                glob.append(self._check_type_of_value(a, t, self._case))
+            memo = memos.get('glob')
+            if self._glob.get('array'):
+                glob = self._numbers(args, t, True)
+            elif memo is None and (t is float or t is int):
+                # Convert all the numbers at once
+                glob = self._numbers(args, t)
+            else:
+                for a in args:
+                    if memo is not None:
+                        glob.append(memo.convert(self, a, t))
+                    else:
+                        glob.append(self._check_type_of_value(a, t,
+                                                              self._case))
             # Assign the default if there was nothing
-            if self._glob['join']:
+            if self._glob.get('array'):
+                if not args and 'default' in self._glob:
+                    glob = self._glob['default']
+            elif self._glob['join']:
                 if not glob:
                     try:
                         glob = self._glob['default']
@@ -338,7 +634,10 @@ class LineKey(_KeyLevel):
                 except KeyError:
                     pass
             # Tag onto the end of val and prep val
-            if not val:
+            if self._glob.get('array'):
+                val.append(glob)
+                val = val[0] if len(val) == 1 else tuple(val)
+            elif not val:
                 if self._nolist:
                     if isinstance(glob, py23_basestring):
                         val = glob
@@ -367,18 +666,23 @@ class LineKey(_KeyLevel):
                     key, value = kvpair.split('=')
                 except ValueError:
                     msg = ': Error reading keyword argument "'+kvpair+'"'
-                    raise ReaderError(self.name+msg)
+                    raise ReaderError(self.name+msg, ReaderError.BAD_KEYWORD,
+                                      self.name)
                 # Make sure the keyword is good
                 if not self._case:
                     key = key.lower()
                 if key not in self._keywords:
-                    raise ReaderError(self.name+': Unknown keyword: "'+key+'"')
+                    raise ReaderError(self.name+': Unknown keyword: "'+key+'"',
+                                      ReaderError.UNKNOWN_KEYWORD, self.name)
                 # Assign this keyword
                 try:
                     t = self._keywords[key]['type']
                 except KeyError:
                     t = str # Default to string if not given
-                kw[key] = self._check_type_of_value(value, t, self._case)
+                if key in memos:
+                    kw[key] = memos[key].convert(self, value, t)
+                else:
+                    kw[key] = self._check_type_of_value(value, t, self._case)
             # Assign the defaults
             for key in self._keywords:
                 try:
@@ -410,6 +714,107 @@ class LineKey(_KeyLevel):
 
         return self._return_val(i, val, namespace)
 
+    def _read_range(self, args):
+        """Returns the range given by *low* *high* [*step*], including
+        *high*, without expanding it."""
+        if len(args) not in (2, 3):
+            msg = ': expected 2 or 3 arguments, got '+str(len(args))
+            raise ReaderError(self.name+msg, ReaderError.BAD_ARGUMENTS,
+                              self.name)
+        bounds = [self._check_type_of_value(a, int, self._case)
+                  for a in args]
+        low, high = bounds[:2]
+        step = bounds[2] if len(bounds) == 3 else 1
+        if step < 1:
+            msg = ': the step of a range must be positive, got '+str(step)
+            raise ReaderError(self.name+msg, ReaderError.BAD_VALUE,
+                              self.name)
+        if low > high:
+            msg = ': the low of a range must not be above the high, got '
+            raise ReaderError(self.name+msg+'{0} {1}'.format(low, high),
+                              ReaderError.BAD_VALUE, self.name)
+        return py23_range(low, high+1, step)
+
+    def _numbers(self, args, typ, as_array=False):
+        """Converts all the tokens to *typ* (int or float) in one go.
+        Returns a list, or if *as_array* a NumPy array (or array.array
+        if NumPy is not installed).  If a token is not a number, the
+        error is raised for the first such token."""
+        code = _TYPECODES[typ]
+        try:
+            if not as_array:
+                return list(map(typ, args))
+            data = array.array(code, map(typ, args))
+        except (ValueError, OverflowError):
+            for a in args:
+                try:
+                    if as_array:
+                        array.array(code, [typ(a)])
+                    else:
+                        typ(a)
+                except (ValueError, OverflowError):
+                    msg = self.name+': expected {0}, got "{1}"'
+                    raise ReaderError(msg.format(typ.__name__, a),
+                                      ReaderError.BAD_VALUE, self.name)
+            raise
+        numpy = _numpy()
+        if numpy is not None:
+            return numpy.frombuffer(data, dtype=code)
+        return data
+
+    def _return_val(self, i, val, namespace):
+        """Returns the result like :py:meth:`_KeyLevel._return_val`, but
+        adding the value to the columns read so far if using columns."""
+        if not self._columns:
+            return super(LineKey, self)._return_val(i, val, namespace)
+
+        name = self._dest if self._dest is not None else self.name
+        row = (val,) if self._nolist else val
+        if name in namespace:
+            columns = getattr(namespace, name)
+            if self._nolist:
+                columns = (columns,)
+        else:
+            columns = tuple([[] if code is None else array.array(code)
+                             for code in self._columns])
+        for n, (column, v) in enumerate(zip(columns, row)):
+            try:
+                column.append(v)
+            except OverflowError:
+                # Leave the columns the same length
+                for column in columns[:n]:
+                    column.pop()
+                raise ReaderError(self.name+': The value '+repr(v)+
+                                  ' is too large', ReaderError.BAD_VALUE,
+                                  self.name)
+        return i, name, columns[0] if self._nolist else columns
+
+    def _one(self, val):
+        """The value of one appearance of this key, from what
+        :py:meth:`_parse` returns when it is the only one."""
+        if not self._columns:
+            return super(LineKey, self)._one(val)
+        elif self._nolist:
+            return val[0]
+        return tuple([column[0] for column in val])
+
+    def _finish_columns(self, columns):
+        """Returns the columns read for this key as they are given in
+        the namespace: NumPy arrays if NumPy is installed or
+        :py:class:`array.array` otherwise, or a :py:class:`tuple` for
+        :py:obj:`str` arguments."""
+        numpy = _numpy()
+        if self._nolist:
+            columns = (columns,)
+        finished = []
+        for column in columns:
+            if isinstance(column, list):
+                column = tuple(column)
+            elif numpy is not None:
+                column = numpy.frombuffer(column, dtype=column.typecode)
+            finished.append(column)
+        return finished[0] if self._nolist else tuple(finished)
+
     def _check_types_in_list(self, typ):
         """Make sure each type in a list is legal.  The function is recursive"""
         for t in typ:
@@ -444,7 +849,9 @@ class LineKey(_KeyLevel):
             except AttributeError:
                 pass
         # One of the core datatypes
-        if typ is float or typ is int or typ is str:
+        if typ is str:
+            return py23_intern(typ(val)) if self._intern else typ(val)
+        elif typ is float or typ is int:
             return typ(val)
         # Explicit None
         elif typ is None:
@@ -452,17 +859,18 @@ class LineKey(_KeyLevel):
                 return None
             else:
                 raise ValueError
-        # Explicit choices
+        # Explicit choices.  Return the choice itself so that every
+        # value read for this choice is the same object.
         elif (isinstance(typ, py23_basestring) or isinstance(typ, int) or
               isinstance(typ, float)):
             if type(typ)(val) == typ:
-                return type(typ)(val)
+                return typ
             else:
                 raise ValueError
         # Regular expression
         else:
             if typ.match(val):
-                return val
+                return py23_intern(val) if self._intern else val
             else:
                 raise ValueError
 
@@ -479,13 +887,15 @@ class LineKey(_KeyLevel):
                 msg = self.name+': expected one of {0}, got "{1}"'
                 t = sorted([self._make_value_readable(x) for x in typ])
                 t = ', '.join(t[:-1])+' or '+t[-1]
-                raise ReaderError(msg.format(t, val))
+                raise ReaderError(msg.format(t, val), ReaderError.BAD_VALUE,
+                                  self.name)
         else:
             try:
                 return self._validate_given_value(val, typ, case)
             except ValueError:
                 msg = self.name+': expected {0}, got "{1}"'
-                raise ReaderError(msg.format(self._make_value_readable(typ), val))
+                raise ReaderError(msg.format(self._make_value_readable(typ), val),
+                                  ReaderError.BAD_VALUE, self.name)
 
     def _make_value_readable(self, val):
         """Returns a a string version of the input value."""
@@ -501,3 +911,118 @@ class LineKey(_KeyLevel):
             except AttributeError:
                 return str(val).split()[1].strip("'><")
 
+
+class TableKey(_KeyLevel):
+    """A class to store a table of numbers read from a block"""
+
+    def __init__(self, keyname, type, width, end, case, **kwargs):
+        """Defines a table block."""
+        super(TableKey, self).__init__(case=case)
+        # Fill in the values
+        self.name = keyname
+        if type not in (int, float):
+            raise ValueError(self.name+': type must be int or float, '
+                             'given '+repr(type))
+        self._type = type
+        if width is not None and (not isinstance(width, int) or width < 1):
+            raise ValueError(self.name+': width must be a positive int, '
+                             'given '+repr(width))
+        self._width = width
+        if not isinstance(end, py23_basestring):
+            raise ValueError(self.name+': end must be str, given '+repr(end))
+        self._end = end if self._case else end.lower()
+        # Add the generic keyword arguments
+        self._add_kwargs(**kwargs)
+        # Check strings
+        self._validate_string(self.name)
+        self._validate_string(self._dest)
+        self._validate_string(self._end)
+
+    def _find_end(self, f, i):
+        """Returns the line that ends the table starting on line *i*"""
+        end = self._end
+        if self._case:
+            try:
+                return f.index(end, i+1)
+            except ValueError:
+                pass
+        else:
+            for j in py23_range(i+1, len(f)):
+                if f[j].lower() == end:
+                    return j
+        raise ReaderError(self.name+': Unterminated block.',
+                          ReaderError.UNTERMINATED_BLOCK, self.name,
+                          self.name)
+
+    def _skip(self, f, i):
+        """Returns the line that ends this table without reading it."""
+        return self._find_end(f, i)
+
+    def _parse(self, f, i, namespace, errors=None):
+        """Parses the lines of the table all at once.  Returns the line
+        that ends the table and the value."""
+
+        # When keeping errors, go on after the table (or to the end of
+        # the input) so that its rows are not mistaken for keys
+        if len(f[i].split()) != 1:
+            msg = 'The block "'+self.name+'" was given arguments, this is illegal'
+            if errors is None:
+                raise ReaderError(msg, ReaderError.BAD_ARGUMENTS, self.name)
+            errors.add(msg, i, ReaderError.BAD_ARGUMENTS, self.name)
+        try:
+            end = self._find_end(f, i)
+        except ReaderError as e:
+            if errors is None:
+                raise
+            errors.add(str(e), i, e.code, e.key)
+            return self._return_val(len(f) - 1, None, namespace)
+        rows = [x for x in f[i+1:end] if x]
+        try:
+            val = self._convert(f, i, end, rows)
+        except ReaderError as e:
+            if errors is None:
+                raise
+            # Keep the error, and go on after the table
+            errors.add(str(e), e.line-1, e.code, e.key)
+            val = None
+        return self._return_val(end, val, namespace)
+
+    def _convert(self, f, i, end, rows):
+        """Returns the numbers of the rows as a 2-D NumPy array, or if
+        NumPy is not installed a tuple of array.array rows."""
+        code = _TYPECODES[self._type]
+        width = self._width
+        if width is None:
+            width = len(rows[0].split()) if rows else 0
+        tokens = ' '.join(rows).split()
+        try:
+            if len(tokens) != width * len(rows):
+                raise ValueError
+            data = array.array(code, map(self._type, tokens))
+        except (ValueError, OverflowError):
+            # Find the line with the problem to report it
+            for j in py23_range(i+1, end):
+                if not f[j]:
+                    continue
+                values = f[j].split()
+                if len(values) != width:
+                    msg = ': expected {0} values on each line, got {1}'
+                    raise ReaderError(self.name+msg.format(width, len(values)),
+                                      ReaderError.BAD_VALUE, self.name,
+                                      None, j+1)
+                for v in values:
+                    try:
+                        array.array(code, [self._type(v)])
+                    except (ValueError, OverflowError):
+                        msg = ': expected {0}, got "{1}"'
+                        raise ReaderError(self.name+msg.format(
+                                          self._type.__name__, v),
+                                          ReaderError.BAD_VALUE, self.name,
+                                          None, j+1)
+            raise
+        numpy = _numpy()
+        if numpy is not None:
+            return numpy.frombuffer(data, dtype=code).reshape(len(rows),
+                                                              width)
+        return tuple([data[n:n+width]
+                      for n in py23_range(0, len(data), width)])
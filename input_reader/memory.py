@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""Find how much memory the result of reading an input takes."""
+from __future__ import division, print_function, unicode_literals
+
+import os
+import sys
+
+from .helpers import Namespace, _RESERVED
+from .py23compat import py23_basestring, py23_items
+
+__all__ = ['memory_report', 'MemoryReport', 'MemoryUsage']
+
+
+class MemoryUsage(object):
+    """\
+    The memory taken by a value and everything it holds, in bytes.
+
+    .. py:attribute:: total
+
+        All the bytes.
+
+    .. py:attribute:: containers
+
+        The bytes taken by the containers holding the values: tuples,
+        lists, dicts and :py:class:`Namespace` s (including the names of
+        their keys).
+
+    .. py:attribute:: objects
+
+        The number of objects.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.containers = 0
+        self.objects = 0
+
+    def __repr__(self):
+        return '{0}(total={1}, containers={2}, objects={3})'.format(
+            type(self).__name__, self.total, self.containers, self.objects)
+
+    @property
+    def values(self):
+        """The bytes taken by the values themselves."""
+        return self.total - self.containers
+
+    def add(self, size, container=False):
+        """Count one object of *size* bytes."""
+        self.total += size
+        self.objects += 1
+        if container:
+            self.containers += size
+
+    def merge(self, other):
+        """Add the bytes and objects of another :py:class:`MemoryUsage`."""
+        self.total += other.total
+        self.containers += other.containers
+        self.objects += other.objects
+
+
+class MemoryReport(object):
+    """\
+    The memory taken by a :py:class:`Namespace` returned by
+    :py:meth:`~InputReader.read_input`, broken down by key and by block.
+    Make one with :py:func:`memory_report`.
+
+    Keys and blocks are identified by their path, which is the names of
+    the blocks they are in and their own name joined by dots (i.e.
+    ``'geometry.charge'``).  The usage of a key or block in a repeated
+    block is summed over every time the block appears.  An object held
+    in more than one place (such as an interned string) is counted once,
+    for the first key it is found in.
+
+    .. py:attribute:: keys
+
+        A :py:class:`dict` of each key path to the :py:class:`MemoryUsage`
+        of its value, including everything inside it.
+
+    .. py:attribute:: blocks
+
+        A :py:class:`dict` of each block path to the
+        :py:class:`MemoryUsage` of the :py:class:`Namespace` s read for
+        it, including their keys.
+
+    .. py:attribute:: total
+
+        The :py:class:`MemoryUsage` of everything.
+
+    .. py:attribute:: input_size
+
+        The size of the input in bytes, or :py:obj:`None` if not known.
+    """
+
+    def __init__(self, input_size=None):
+        self.keys = {}
+        self.blocks = {}
+        self.total = MemoryUsage()
+        self.input_size = input_size
+
+    @property
+    def ratio(self):
+        """\
+        How many times larger the result is than the input,
+        or :py:obj:`None` if the input size is not known.
+        """
+        if not self.input_size:
+            return None
+        return self.total.total / self.input_size
+
+    def report(self, n=20):
+        """\
+        Return a table of the *n* keys taking the most memory, and the
+        total compared with the size of the input.
+
+        :keyword n:
+            The number of keys to show.  :py:obj:`None` shows all.
+            The default is :py:const:`20`.
+        :rtype: str
+        """
+        fmt = '{0:<40} {1:>12} {2:>12} {3:>10}'
+        lines = [fmt.format('key', 'bytes', 'containers', 'objects')]
+        rows = sorted(py23_items(self.keys)(), key=lambda x: -x[1].total)
+        for path, usage in rows[:n]:
+            lines.append(fmt.format(path, usage.total, usage.containers,
+                                    usage.objects))
+        lines.append('')
+        lines.append(fmt.format('total', self.total.total,
+                                self.total.containers, self.total.objects))
+        if self.input_size is not None:
+            lines.append(fmt.format('input', self.input_size, '', ''))
+        if self.ratio is not None:
+            lines.append('{0:<40} {1:>12.2f}'.format('ratio', self.ratio))
+        return '\n'.join(lines)
+
+
+def memory_report(namespace, input_size=None):
+    """\
+    Find how much memory a :py:class:`Namespace` returned by
+    :py:meth:`~InputReader.read_input` takes, key by key and block by
+    block, including the containers holding the values.
+
+    :argument namespace:
+        The result of reading an input.
+    :type namespace: :py:class:`Namespace`
+    :keyword input_size:
+        The input, to compare the sizes with.  May be the name of the
+        file, the list of lines read, or the size in bytes.  Optional.
+    :rtype: :py:class:`MemoryReport`
+    """
+    if input_size is None or isinstance(input_size, int):
+        size = input_size
+    elif isinstance(input_size, py23_basestring):
+        size = os.path.getsize(input_size)
+    else:
+        size = sum([len(x.encode('utf-8')) + 1 for x in input_size])
+    report = MemoryReport(size)
+    report.total = _Walker(report).walk(namespace)
+    return report
+
+
+class _Walker(object):
+    """\
+    Adds up the memory of a tree of namespaces.  The namespaces are
+    walked with a stack of frames rather than by recursion, so results
+    nested to any depth may be walked.
+    """
+
+    def __init__(self, report):
+        self.report = report
+        self.seen = set()
+
+    def walk(self, namespace):
+        """Returns the usage of a namespace and everything in it"""
+        frames = [_NamespaceFrame(self, namespace, ())]
+        usage = None
+        while True:
+            # Carry on with the innermost frame, giving it the usage
+            # of the frame it was waiting for
+            frame = frames[-1]
+            inner = frame.resume(usage)
+            if inner is not None:
+                frames.append(inner)
+                usage = None
+                continue
+            frames.pop()
+            usage = frame.usage
+            if not frames:
+                return usage
+
+    def count(self, obj, usage, container):
+        """Count the object itself if it has not been seen"""
+        if id(obj) not in self.seen:
+            self.seen.add(id(obj))
+            usage.add(sys.getsizeof(obj), container)
+
+
+class _NamespaceFrame(object):
+    """Walks a namespace, adding up the usage of each of its keys"""
+
+    def __init__(self, walker, namespace, path):
+        self.walker = walker
+        self.namespace = namespace
+        self.path = path
+        self.usage = MemoryUsage()
+        for obj in (namespace, vars(namespace), namespace._order,
+                    namespace._defaults, namespace._taken):
+            walker.count(obj, self.usage, True)
+        self.items = list(py23_items(vars(namespace))())
+        self.next = 0
+        # The key whose value is being walked, and if the defaults
+        # have been walked
+        self.keypath = None
+        self.defaults = False
+
+    def resume(self, inner):
+        """\
+        Carry on walking, given the usage of the last value walked.
+        Returns the frame to walk the next value, or None when done.
+        """
+        walker = self.walker
+        if inner is not None:
+            if self.keypath is not None:
+                key = '.'.join(self.keypath)
+                walker.report.keys.setdefault(key, MemoryUsage()).merge(inner)
+                self.keypath = None
+            self.usage.merge(inner)
+        while self.next < len(self.items):
+            name, value = self.items[self.next]
+            self.next += 1
+            walker.count(name, self.usage, True)
+            if name in _RESERVED:
+                continue
+            self.keypath = self.path + (name,)
+            return _DeepFrame(walker, value, self.keypath)
+        if not self.defaults:
+            self.defaults = True
+            return _DeepFrame(walker, self.namespace._defaults, self.path)
+        if self.path:
+            key = '.'.join(self.path)
+            walker.report.blocks.setdefault(key, MemoryUsage()).merge(
+                self.usage)
+        return None
+
+
+class _DeepFrame(object):
+    """Walks an object and everything it holds"""
+
+    def __init__(self, walker, obj, path):
+        self.walker = walker
+        self.path = path
+        self.usage = MemoryUsage()
+        self.stack = [obj]
+
+    def resume(self, inner):
+        """\
+        Carry on walking, given the usage of the last namespace walked.
+        Returns the frame to walk the next namespace, or None when done.
+        """
+        walker = self.walker
+        if inner is not None:
+            self.usage.merge(inner)
+        stack = self.stack
+        while stack:
+            obj = stack.pop()
+            if id(obj) in walker.seen:
+                continue
+            if isinstance(obj, Namespace):
+                return _NamespaceFrame(walker, obj, self.path)
+            container = True
+            if isinstance(obj, (tuple, list, set, frozenset)):
+                stack.extend(obj)
+            elif isinstance(obj, dict):
+                stack.extend(obj)
+                stack.extend(obj.values())
+            else:
+                container = False
+                # The line a regex match was made on is kept with it
+                string = getattr(obj, 'string', None)
+                if string is not None and hasattr(obj, 'group'):
+                    stack.append(string)
+            walker.count(obj, self.usage, container)
+        return None
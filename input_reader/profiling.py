@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""Count and time how each key and block is read."""
+from __future__ import division, print_function, unicode_literals
+
+import time
+from contextlib import contextmanager
+
+from .helpers import _Hooks
+from .py23compat import py23_items, py23_values
+
+__all__ = ['ParseStats', 'TimingStats']
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class TimingStats(object):
+    """\
+    How many times something was done, how many of those times it
+    failed, and how long it took in total and at most, in seconds.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def __repr__(self):
+        return ('{0}(calls={1}, errors={2}, total={3:.6f}, max={4:.6f})'
+                .format(type(self).__name__, self.calls, self.errors,
+                        self.total, self.max))
+
+    @property
+    def mean(self):
+        """The average time taken, or 0.0 if never called."""
+        return self.total / self.calls if self.calls else 0.0
+
+    def add(self, elapsed, failed=False):
+        """Record one call that took *elapsed* seconds."""
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        if failed:
+            self.errors += 1
+
+    def merge(self, other):
+        """Add the counts and times of another :py:class:`TimingStats`."""
+        self.calls += other.calls
+        self.errors += other.errors
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+
+class ParseStats(object):
+    """\
+    Statistics of how the keys of an :py:class:`InputReader` were read,
+    summed over every call to :py:meth:`~InputReader.read_input` since
+    profiling was turned on or :py:meth:`reset` was called.
+
+    Keys are identified by their path, which is the names of the blocks
+    they are in and their own name joined by dots (i.e.
+    ``'geometry.charge'``).  Levels are identified by the path of their
+    block key, and the top level by the name of the reader (``'main'``).
+    All times are in seconds.
+
+    .. py:attribute:: keys
+
+        A :py:class:`dict` of each key path to a :py:class:`TimingStats`
+        of the calls to the key's parser.  The calls are how many times
+        the key was found, and the errors how many times the parser
+        raised an error (i.e. a value of the wrong type).
+        The times of a block key include the keys inside it.
+
+    .. py:attribute:: levels
+
+        A :py:class:`dict` of each level path to a :py:class:`TimingStats`
+        of the checks made after the level is read (required keys,
+        dependencies, mutually exclusive groups).
+
+    .. py:attribute:: post_process
+
+        A :py:class:`TimingStats` of :py:meth:`~InputReader.post_process`.
+
+    .. py:attribute:: reads
+
+        A :py:class:`TimingStats` of reading each input, from reading
+        the file through :py:meth:`~InputReader.post_process`.
+    """
+
+    def __init__(self):
+        self.reset()
+        # How many reads are in progress (i.e. from post_process),
+        # and the hooks they read with
+        self._active = 0
+        self._hooks = None
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        self.keys = {}
+        self.levels = {}
+        self.post_process = TimingStats()
+        self.reads = TimingStats()
+
+    def merge(self, other):
+        """\
+        Add the statistics of another :py:class:`ParseStats` to these,
+        i.e. to combine those of several readers or processes.
+        """
+        for mine, theirs in ((self.keys, other.keys),
+                             (self.levels, other.levels)):
+            for path, stats in py23_items(theirs)():
+                mine.setdefault(path, TimingStats()).merge(stats)
+        self.post_process.merge(other.post_process)
+        self.reads.merge(other.reads)
+
+    def report(self, n=20):
+        """\
+        Return a table of the *n* keys that took the longest in total,
+        followed by the levels whose checks took the longest.
+
+        :keyword n:
+            The number of keys and levels to show.  :py:obj:`None`
+            shows all.  The default is :py:const:`20`.
+        :rtype: str
+        """
+        fmt = '{0:<40} {1:>8} {2:>6} {3:>12} {4:>12}'
+        lines = [fmt.format('key', 'calls', 'errors', 'total', 'max')]
+        for title, table in (('key', self.keys), ('level', self.levels)):
+            if title == 'level':
+                lines.append('')
+                lines.append(fmt.format(title, 'calls', 'errors',
+                                        'total', 'max'))
+            rows = sorted(py23_items(table)(), key=lambda x: -x[1].total)
+            for path, stats in rows[:n]:
+                lines.append(fmt.format(path, stats.calls, stats.errors,
+                                        '{0:.6f}'.format(stats.total),
+                                        '{0:.6f}'.format(stats.max)))
+        lines.append('')
+        for title, stats in (('post_process', self.post_process),
+                             ('read_input', self.reads)):
+            lines.append(fmt.format(title, stats.calls, stats.errors,
+                                    '{0:.6f}'.format(stats.total),
+                                    '{0:.6f}'.format(stats.max)))
+        return '\n'.join(lines)
+
+    @contextmanager
+    def _instrument(self, reader):
+        """\
+        Record statistics of everything *reader* parses inside this
+        context, which gives the hooks to read with.  Nothing is
+        recorded, or slowed down, when reading without them.
+        """
+        if self._active:
+            # A read from post_process is part of the read in progress
+            self._active += 1
+            try:
+                yield self._hooks
+            finally:
+                self._active -= 1
+            return
+
+        self._hooks = _ProfileHooks(self, reader)
+        self._active += 1
+        start = _clock()
+        failed = True
+        try:
+            yield self._hooks
+            failed = False
+        finally:
+            self.reads.add(_clock() - start, failed)
+            self._active -= 1
+            self._hooks = None
+
+
+class _ProfileHooks(_Hooks):
+    """Times each key, block and level of a reader as it is read"""
+
+    def __init__(self, stats, reader):
+        self.stats = stats
+        # The statistics of each key and level, made now so that
+        # keys that are never found are listed too
+        self.keys = {}
+        self.levels = {}
+        for blocks, level in _levels(reader, ()):
+            path = '.'.join(blocks) if blocks else reader.name
+            self.levels[level] = stats.levels.setdefault(path, TimingStats())
+            for key in _keys_of(level):
+                name = '.'.join(blocks + (key.name,))
+                self.keys[key] = stats.keys.setdefault(name, TimingStats())
+        # When each block being read was entered
+        self.starts = []
+
+    def enter(self, level, i):
+        self.starts.append(_clock())
+
+    def leave(self, level, i, error=None):
+        elapsed = _clock() - self.starts.pop()
+        # Block times include the keys in them
+        if level in self.keys:
+            self.keys[level].add(elapsed, error is not None)
+
+    def parse(self, key, run):
+        return _timed(run, self.keys.get(key))
+
+    def post(self, level, namespace, run):
+        return _timed(run, self.levels.get(level))
+
+    def stage(self, name, run):
+        if name == 'post_process':
+            return _timed(run, self.stats.post_process)
+        return run()
+
+
+def _keys_of(level):
+    """All the keys of a level, including those in mutually exclusive groups."""
+    keys = list(py23_values(level._keys)())
+    for meg in level._meg:
+        keys.extend(py23_values(meg._keys)())
+    return keys
+
+
+def _levels(level, blocks):
+    """\
+    Returns *level* and all the blocks below it, each with the
+    names of the blocks leading to it.
+    """
+    levels = []
+    stack = [(blocks, level)]
+    while stack:
+        blocks, level = stack.pop()
+        levels.append((blocks, level))
+        for key in reversed(_keys_of(level)):
+            if hasattr(key, '_meg'):
+                stack.append((blocks + (key.name,), key))
+    return levels
+
+
+def _timed(run, stats):
+    """Runs *run*, adding the time it took to *stats* if given."""
+    if stats is None:
+        return run()
+    start = _clock()
+    failed = True
+    try:
+        result = run()
+        failed = False
+        return result
+    finally:
+        stats.add(_clock() - start, failed)
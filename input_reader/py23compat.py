@@ -17,9 +17,15 @@ py23_range = range if sys.version[0] == '3' else xrange
 # Uniform base string type
 py23_basestring = str if sys.version[0] == '3' else basestring
 
+# Character from a code point
+py23_chr = chr if sys.version[0] == '3' else unichr
+
 # Proper input function
 py23_input = input if sys.version[0] == '3' else raw_input
 
+# Raised when the recursion limit is passed
+py23_RecursionError = RecursionError if sys.version[0] == '3' else RuntimeError
+
 # zip as an iterator
 if sys.version[0] == '3':
     py23_zip = zip
@@ -40,6 +46,14 @@ else:
     py23_values = lambda x : getattr(x, 'itervalues')
 
 
+# Intern a string (the builtin in Python 2 does not accept unicode)
+if sys.version[0] == '3':
+    py23_intern = sys.intern
+else:
+    _interned = {}
+    py23_intern = lambda x : _interned.setdefault(x, x)
+
+
 # This function is intended to decorate other functions that will modify
 # either a string directly, or a function's docstring.
 def _modify_str_or_docstring(str_change_func):
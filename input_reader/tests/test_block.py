@@ -3,6 +3,11 @@ from input_reader import InputReader, ReaderError, SUPPRESS, Namespace
 from pytest import raises, fixture
 from re import search
 
+try:
+    import numpy as _numpy
+except ImportError:
+    _numpy = None
+
 def test_block_missing_keyname():
     r = InputReader()
     with raises(TypeError):
@@ -148,3 +153,201 @@ def test_block_read_subblocks():
     d.add_boolean_key('egg')
     inp = r.read_input(['pink', 'blue', 'egg', 'subend', 'end'])
     assert inp.pink.blue.egg
+
+def test_ignored_block():
+    r = InputReader()
+    r.add_line_key('red', type=int)
+    r.add_ignored_block('scf')
+    r.add_ignored_block('basis', end='STOP', case=True)
+    inp = r.read_input(['scf 3', 'maxiter 10', 'scf', 'nested', 'end',
+                        'red 4 5 6', 'end',
+                        'red 4',
+                        'basis', 'end', 'stop', 'STOP'])
+    assert inp.red == 4
+    assert 'scf' not in inp
+    # Unknown lines outside ignored blocks are still errors
+    with raises(ReaderError) as e:
+        r.read_input(['scf', 'end', 'blue'])
+    assert e.value.code == ReaderError.UNKNOWN_KEY
+    with raises(ReaderError) as e:
+        r.read_input(['red 1', 'scf', 'maxiter 10'])
+    assert e.value.code == ReaderError.UNTERMINATED_BLOCK
+    assert (e.value.key, e.value.line) == ('scf', 2)
+    with raises(ReaderError):
+        r.add_ignored_block('red')
+    with raises(ValueError):
+        r.add_ignored_block('green', end=5)
+    # Also inside blocks
+    b = r.add_block_key('blue')
+    b.add_ignored_block('foreign')
+    b.add_boolean_key('egg')
+    inp = r.read_input(['blue', 'foreign', 'egg', 'end', 'egg', 'end'])
+    assert inp.blue.egg
+
+def test_lazy_block():
+    r = InputReader()
+    r.add_boolean_key('red')
+    b = r.add_block_key('blue', lazy=True, repeat=True)
+    b.add_line_key('egg', type=int)
+    inner = b.add_block_key('inner', lazy=True)
+    inner.add_boolean_key('ham')
+    lines = ['blue', 'egg 1', 'inner', 'ham', 'end', 'end',
+             'red', 'blue', 'egg x', 'end']
+    inp = r.read_input(lines)
+    assert inp.red
+    first, second = inp.blue
+    assert type(first) is not Namespace
+    assert first.egg == 1
+    assert type(first) is Namespace
+    assert first.inner.ham
+    # Errors inside the block are raised when it is used
+    with raises(ReaderError) as e:
+        second.egg
+    assert e.value.code == ReaderError.BAD_VALUE
+    with raises(ReaderError):
+        inp.materialize()
+    # The structure is still checked when reading
+    with raises(ReaderError) as e:
+        r.read_input(['blue', 'egg 1'])
+    assert e.value.code == ReaderError.UNTERMINATED_BLOCK
+    with raises(ReaderError) as e:
+        r.read_input(['blue', 'bacon', 'end'])
+    assert e.value.code == ReaderError.UNKNOWN_KEY
+    # Lazy namespaces compare and pickle like the ones read at once
+    import pickle
+    eager = InputReader()
+    eager.add_boolean_key('red')
+    b = eager.add_block_key('blue', repeat=True)
+    b.add_line_key('egg', type=int)
+    b.add_block_key('inner').add_boolean_key('ham')
+    lines = lines[:-2] + ['egg 2', 'end']
+    assert eager.read_input(lines) == r.read_input(lines)
+    assert pickle.loads(pickle.dumps(r.read_input(lines))) == \
+        eager.read_input(lines)
+    with raises(ValueError):
+        r.add_block_key('green', lazy=1)
+
+def test_lazy_block_errors(tmpdir):
+    from input_reader import MemoryCache
+    def make_reader(lazy):
+        r = InputReader(cache=MemoryCache())
+        b = r.add_block_key('outer').add_block_key('b', lazy=lazy)
+        b.add_line_key('x', type=int)
+        b.add_line_key('y', type=int, required=True)
+        return r
+    def errors_of(r):
+        errors = []
+        for lines in (['outer', 'b', 'x notint', 'y 1', 'end', 'end'],
+                      ['outer', 'b', 'x 1', 'end', 'end']):
+            with raises(ReaderError) as e:
+                r.read_input(lines).outer.b.x
+            errors.append((str(e.value), e.value.level, e.value.line))
+        return errors
+    eager = errors_of(make_reader(False))
+    r = make_reader(True)
+    # Named the same as when read at once
+    assert errors_of(r) == eager
+    # Results with blocks not read yet are not cached
+    filename = str(tmpdir.join('input'))
+    with open(filename, 'w') as fl:
+        fl.write('outer\nb\nx notint\nend\nend\n')
+    inp = r.read_input(filename)
+    assert len(r._caches[0]) == 0
+    with raises(ReaderError):
+        inp.materialize()
+
+def test_deep_nesting():
+    import sys
+    depth = sys.getrecursionlimit() + 100
+    r = InputReader()
+    level = r
+    for n in range(depth):
+        level = level.add_block_key('b')
+    level.add_line_key('x', type=int)
+    inp = r.read_input(['b'] * depth + ['x 1'] + ['end'] * depth)
+    for n in range(depth):
+        inp = inp.b
+    assert inp.x == 1
+    # Materializing goes through every level too
+    r = InputReader()
+    level = r
+    for n in range(depth):
+        level = level.add_block_key('b', lazy=True)
+    level.add_line_key('x', type=int)
+    inp = r.read_input(['b'] * depth + ['x 1'] + ['end'] * depth)
+    inp.materialize()
+
+def test_nested_errors_match_recursive_reading():
+    # Reading with the profiling hooks gives the same errors
+    def reader(**kwargs):
+        r = InputReader(**kwargs)
+        b = r.add_block_key('b')
+        c = b.add_block_key('c', repeat=True)
+        c.add_line_key('x', type=int, required=True)
+        c.add_block_key('d').add_boolean_key('y')
+        return r
+    for lines in (['b', 'c', 'x y', 'end', 'end'],
+                  ['b', 'c', 'd', 'y', 'end', 'end', 'end'],
+                  ['b', 'c', 'x 1', 'd', 'y', 'end', 'd', 'y', 'end', 'end',
+                   'end'],
+                  ['b', 'c', 'x 1', 'd 4', 'y', 'end', 'end', 'end'],
+                  ['b', 'c', 'x 1', 'd', 'y'],
+                  ['b', 'c', 'x 1', 'z', 'end', 'end']):
+        errors = []
+        for r in (reader(), reader(profile=True)):
+            with raises(ReaderError) as e:
+                r.read_input(lines)
+            errors.append((str(e.value), e.value.code, e.value.key,
+                           e.value.level, e.value.line))
+        assert errors[0] == errors[1]
+
+def test_table_block():
+    from array import array
+    r = InputReader()
+    r.add_table_block('grid')
+    r.add_table_block('ints', type=int, width=2, repeat=True)
+    r.add_boolean_key('red')
+    inp = r.read_input(['grid', '1 2.5 3', '', '4 5 6e1', 'END', 'red',
+                        'ints', '1 2', 'end', 'ints', 'end'])
+    assert inp.red
+    if _numpy is None:
+        assert inp.grid == (array('d', [1, 2.5, 3]), array('d', [4, 5, 60]))
+        assert [list(x) for x in inp.ints[0]] == [[1, 2]]
+        assert inp.ints[1] == ()
+    else:
+        assert inp.grid.shape == (2, 3)
+        assert inp.grid.tolist() == [[1, 2.5, 3], [4, 5, 60]]
+        assert inp.ints[0].tolist() == [[1, 2]]
+        assert inp.ints[1].shape == (0, 2)
+
+    # Errors
+    for lines, code, line in ((['grid', '1 2', '3', 'end'],
+                               ReaderError.BAD_VALUE, 3),
+                              (['grid', '1 2', '3 x', 'end'],
+                               ReaderError.BAD_VALUE, 3),
+                              (['ints', '1 2.5', 'end'],
+                               ReaderError.BAD_VALUE, 2),
+                              (['grid', '1 2'],
+                               ReaderError.UNTERMINATED_BLOCK, 1),
+                              (['grid 4', '1 2', 'end'],
+                               ReaderError.BAD_ARGUMENTS, 1)):
+        with raises(ReaderError) as e:
+            r.read_input(lines)
+        assert (e.value.code, e.value.line) == (code, line)
+    errors = r.validate_input(['grid', '1 x', 'end', 'red', 'blue'])
+    assert [(e.code, e.line) for e in errors] == [
+        (ReaderError.BAD_VALUE, 2), (ReaderError.UNKNOWN_KEY, 5)]
+    # The rows of a table in error are not taken for keys
+    errors = r.validate_input(['grid 4', '1 2', 'end', 'red', 'blue'])
+    assert [(e.code, e.line) for e in errors] == [
+        (ReaderError.BAD_ARGUMENTS, 1), (ReaderError.UNKNOWN_KEY, 5)]
+    errors = r.validate_input(['red', 'grid', '1 2', '3 4'])
+    assert [(e.code, e.line) for e in errors] == [
+        (ReaderError.UNTERMINATED_BLOCK, 2)]
+    # Projection passes over tables
+    assert 'grid' not in r.read_input(['grid', '1 x', 'end', 'red'],
+                                      only=['red'])
+    with raises(ValueError):
+        r.add_table_block('strs', type=str)
+    with raises(ValueError):
+        r.add_table_block('zero', width=0)
@@ -0,0 +1,287 @@
+from __future__ import print_function, unicode_literals
+from input_reader import InputReader, MemoryCache, SharedMemoryCache, DiskCache
+from input_reader import abs_file_path
+from pytest import raises, fixture, skip
+from os import getpid, remove, listdir
+from os.path import exists
+from shutil import rmtree
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+@fixture
+def setup(request):
+    with open('TEMP_INPUT', 'w') as fl:
+        print('red 1', file=fl)
+        print('blue', file=fl)
+    request.addfinalizer(lambda: remove('TEMP_INPUT'))
+
+def make_reader(cache):
+    r = InputReader(cache=cache)
+    r.add_line_key('red', type=int)
+    r.add_boolean_key('blue')
+    return r
+
+def test_cache_definition():
+    with raises(ValueError) as e:
+        InputReader(cache={})
+    assert 'cache must define the method' in str(e.value)
+
+def test_shared_memory_cache(setup):
+    if shared_memory is None:
+        skip('multiprocessing.shared_memory is not available')
+    # Two caches with the same prefix behave like two sibling processes
+    prefix = 'irt{0}'.format(getpid())
+    c1 = SharedMemoryCache(prefix=prefix)
+    c2 = SharedMemoryCache(prefix=prefix)
+    try:
+        r1 = make_reader(c1)
+        r2 = make_reader(c2)
+        inp = r1.read_input('TEMP_INPUT')
+        assert inp.red == 1
+        assert (c1.hits, c1.misses) == (0, 1)
+        inp2 = r2.read_input('TEMP_INPUT')
+        assert inp2 == inp
+        assert inp2 is not inp
+        assert (c2.hits, c2.misses) == (1, 0)
+        assert r2.input_file is None
+        assert r2.filename == 'TEMP_INPUT'
+        # Non-file input is never cached
+        r2.read_input(['red 2'])
+        assert (c2.hits, c2.misses) == (1, 0)
+        # Changing the file changes the key
+        with open('TEMP_INPUT', 'w') as fl:
+            print('red 12', file=fl)
+        assert r2.read_input('TEMP_INPUT').red == 12
+        assert c2.misses == 1
+    finally:
+        c1.clear()
+        c2.clear()
+
+def test_shared_memory_cache_outlives_process(setup):
+    if shared_memory is None:
+        skip('multiprocessing.shared_memory is not available')
+    import subprocess
+    import sys
+    if sys.platform.startswith('win'):
+        skip('segments are removed once no process has them open')
+    prefix = 'irt{0}p'.format(getpid())
+    # A worker stores the result, then exits
+    script = """if 1:
+        from input_reader import InputReader, SharedMemoryCache
+        r = InputReader(cache=SharedMemoryCache(prefix={0!r}))
+        r.add_line_key('red', type=int)
+        r.add_boolean_key('blue')
+        r.read_input('TEMP_INPUT')
+        """.format(prefix)
+    worker = subprocess.Popen([sys.executable, '-c', script],
+                              stderr=subprocess.PIPE)
+    stderr = worker.communicate()[1].decode('utf-8')
+    assert worker.returncode == 0, stderr
+    assert 'leaked' not in stderr
+    c = SharedMemoryCache(prefix=prefix)
+    r = make_reader(c)
+    key = c.key(r, 'TEMP_INPUT')
+    try:
+        assert r.read_input('TEMP_INPUT').red == 1
+        assert (c.hits, c.misses) == (1, 0)
+    finally:
+        shared_memory.SharedMemory(name=key).unlink()
+
+def test_shared_memory_cache_eviction(setup):
+    if shared_memory is None:
+        skip('multiprocessing.shared_memory is not available')
+    c = SharedMemoryCache(prefix='irt{0}e'.format(getpid()))
+    try:
+        r = make_reader(c)
+        r.read_input('TEMP_INPUT')
+        assert len(c._owned) == 1
+        # Only room for one result
+        c.max_bytes = c._nbytes + 1
+        with open('TEMP_INPUT', 'w') as fl:
+            print('red 2', file=fl)
+        r.read_input('TEMP_INPUT')
+        assert len(c._owned) == 1
+        assert c._nbytes < c.max_bytes
+    finally:
+        c.clear()
+    with raises(ValueError):
+        SharedMemoryCache(prefix='a/b')
+    with raises(ValueError):
+        SharedMemoryCache(max_bytes=0)
+
+def test_memory_cache(setup):
+    c = MemoryCache()
+    r = make_reader(c)
+    inp = r.read_input('TEMP_INPUT')
+    assert (c.hits, c.misses) == (0, 1)
+    inp2 = r.read_input('TEMP_INPUT')
+    assert (c.hits, c.misses) == (1, 1)
+    assert inp2 == inp
+    # Callers get a copy so they cannot corrupt the cache
+    inp2.red = 100
+    assert r.read_input('TEMP_INPUT').red == 1
+    # Adding a key invalidates the cached results
+    r.add_line_key('green')
+    assert r.read_input('TEMP_INPUT').green is None
+    assert c.misses == 2
+    # As does changing the file
+    with open('TEMP_INPUT', 'w') as fl:
+        print('red 12', file=fl)
+    assert r.read_input('TEMP_INPUT').red == 12
+    assert c.misses == 3
+
+def test_memory_cache_limits(setup):
+    c = MemoryCache(max_entries=1)
+    r1 = make_reader(c)
+    r2 = make_reader(c)
+    r2.add_line_key('green')
+    r1.read_input('TEMP_INPUT')
+    r2.read_input('TEMP_INPUT')
+    assert len(c) == 1
+    r2.read_input('TEMP_INPUT')
+    r1.read_input('TEMP_INPUT')
+    assert (c.hits, c.misses) == (1, 3)
+    # Each reader has its own results
+    make_reader(c).read_input('TEMP_INPUT')
+    assert (c.hits, c.misses) == (1, 4)
+    c = MemoryCache(max_entries=None, max_bytes=1)
+    make_reader(c).read_input('TEMP_INPUT')
+    assert len(c) == 0
+    assert c.nbytes == 0
+    # Results that cannot be pickled are not cached
+    c = MemoryCache()
+    r = InputReader(cache=c)
+    r.add_regex_line('red', r'red\s+\d+')
+    r.add_boolean_key('blue')
+    assert r.read_input('TEMP_INPUT').red.group(0) == 'red 1'
+    assert len(c) == 0
+    with raises(ValueError):
+        MemoryCache(max_entries=0)
+    with raises(ValueError):
+        MemoryCache(max_bytes='10')
+
+def test_schema_fingerprint():
+    r1 = make_reader(None)
+    r2 = make_reader(None)
+    assert r1._schema_fingerprint() == r2._schema_fingerprint()
+    # Anything about a key definition changes the fingerprint
+    r3 = InputReader()
+    r3.add_line_key('red', type=float)
+    r3.add_boolean_key('blue')
+    assert r1._schema_fingerprint() != r3._schema_fingerprint()
+    r4 = InputReader(ignoreunknown=True)
+    r4.add_line_key('red', type=int)
+    r4.add_boolean_key('blue')
+    assert r1._schema_fingerprint() != r4._schema_fingerprint()
+    r5 = InputReader()
+    r5.add_line_key('red', type=int, default=4)
+    r5.add_boolean_key('blue')
+    assert r1._schema_fingerprint() != r5._schema_fingerprint()
+    # Even deep inside blocks
+    fp = r1._schema_fingerprint()
+    r1.add_block_key('green').add_line_key('pink', type=int)
+    fp2 = r1._schema_fingerprint()
+    r2.add_block_key('green').add_line_key('pink', type=float)
+    assert len(set([fp, fp2, r2._schema_fingerprint()])) == 3
+
+@fixture
+def cachedir(request):
+    request.addfinalizer(lambda: rmtree('TEMP_CACHE', ignore_errors=True))
+    return 'TEMP_CACHE'
+
+def test_disk_cache(setup, cachedir):
+    c = DiskCache(cachedir)
+    r = make_reader(c)
+    inp = r.read_input('TEMP_INPUT')
+    assert (c.hits, c.misses) == (0, 1)
+    # A new cache (i.e. the next run of the program) finds the result
+    c = DiskCache(cachedir)
+    r = make_reader(c)
+    assert r.read_input('TEMP_INPUT') == inp
+    assert (c.hits, c.misses) == (1, 0)
+    # Changing the keys misses, as does changing the file
+    r.add_line_key('green')
+    assert r.read_input('TEMP_INPUT').green is None
+    with open('TEMP_INPUT', 'w') as fl:
+        print('red 12', file=fl)
+    assert r.read_input('TEMP_INPUT').red == 12
+    assert (c.hits, c.misses) == (1, 2)
+    assert len(listdir(cachedir)) == 2
+    c.clear(r)
+    assert len(listdir(cachedir)) == 1
+    assert r.read_input('TEMP_INPUT').red == 12
+    assert c.hits == 2
+    c.clear()
+    assert len(listdir(cachedir)) == 0
+
+def test_chained_caches(setup, cachedir):
+    m = MemoryCache()
+    d = DiskCache(cachedir)
+    make_reader(d).read_input('TEMP_INPUT')
+    r = make_reader((m, d))
+    r.read_input('TEMP_INPUT')
+    assert (m.hits, m.misses, d.hits) == (0, 1, 1)
+    # The memory cache was given the result found on disk
+    r.read_input('TEMP_INPUT')
+    assert (m.hits, m.misses, d.hits) == (1, 1, 1)
+
+def test_cache_callables(setup, cachedir):
+    class Scaled(InputReader):
+        def __init__(self, cache):
+            super(Scaled, self).__init__(cache=cache)
+            self.add_line_key('red', type=int)
+            self.add_boolean_key('blue')
+            self.scale = 1
+        def post_process(self, namespace):
+            namespace.red *= self.scale
+    m = MemoryCache()
+    d = DiskCache(cachedir)
+    x = make_reader(m)
+    x.post_process = lambda ns: ns.add('red', 10)
+    y = make_reader(m)
+    y.post_process = lambda ns: ns.add('red', 20)
+    assert x.read_input('TEMP_INPUT').red == 10
+    assert y.read_input('TEMP_INPUT').red == 20
+    # Readers with lambdas cannot be described between runs
+    r = make_reader(d)
+    r.add_line_key('green', default=lambda x: x)
+    assert r._schema_fingerprint() is None
+    r.read_input('TEMP_INPUT')
+    assert d.hits == d.misses == 0
+    assert not exists(cachedir)
+    # Changing an attribute of the reader misses the old result
+    r = Scaled(m)
+    assert r.read_input('TEMP_INPUT').red == 1
+    r.scale = 3
+    assert r.read_input('TEMP_INPUT').red == 3
+    # Functions that can be found by name are described by it
+    r = make_reader(d)
+    r.add_line_key('green', default=abs_file_path)
+    assert r._schema_fingerprint() is not None
+    # Nor can objects whose repr is their address
+    r = make_reader(d)
+    r.add_line_key('green', default=object())
+    assert r._schema_fingerprint() is None
+
+def test_cache_deep_nesting(tmpdir):
+    import sys
+    depth = sys.getrecursionlimit() + 100
+    c = MemoryCache()
+    r = InputReader(cache=c)
+    level = r
+    for n in range(depth):
+        level = level.add_block_key('b')
+    level.add_line_key('x', type=int)
+    filename = str(tmpdir.join('deep'))
+    with open(filename, 'w') as fl:
+        fl.write('\n'.join(['b'] * depth + ['x 1'] + ['end'] * depth))
+    assert r._schema_fingerprint() is not None
+    # A result too deep to pickle is read but not kept
+    for n in range(2):
+        inp = r.read_input(filename)
+        for n in range(depth):
+            inp = inp.b
+        assert inp.x == 1
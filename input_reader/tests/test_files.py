@@ -31,7 +31,9 @@ def test_range_check():
     assert range_check(1, 10) == (1, 10)
     assert range_check(1.0, 10.0) == (1.0, 10.0)
     assert range_check(1.0, 10.0, asint=True) == (1, 10)
-    assert range_check(1, 10, expand=True) == (1, 2, 3, 4, 5, 6, 7, 8, 9, 10)
+    assert tuple(range_check(1, 10, expand=True)) == (1, 2, 3, 4, 5, 6, 7, 8,
+                                                      9, 10)
+    assert len(range_check(1, 10**12, expand=True)) == 10**12
     assert range_check(1.5, 10) == (1.5, 10.0)
     with raises(ValueError):
         range_check(10, 1)
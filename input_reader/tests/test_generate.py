@@ -0,0 +1,53 @@
+from __future__ import unicode_literals
+import re
+from input_reader import InputReader, generate_input
+from pytest import raises, fixture
+
+@fixture
+def setup():
+    r = InputReader()
+    r.add_line_key('title', glob={'len':'*', 'join':True})
+    r.add_line_key('atom', type=[('h', 'he', 'o'), float, float, float],
+                   repeat=True)
+    r.add_line_key('opts', type=int, repeat=True,
+                   keywords={'a':{'type':float}, 'b':{'type':('x', 'y')}})
+    r.add_line_key('pat', type=re.compile(r'[a-z]\d{2,}-\w+'), required=True)
+    r.add_regex_line('rx', r'(\d+)\s+([a-c]+)x?$', repeat=True)
+    r.add_boolean_key('bool', depends='title')
+    m = r.add_mutually_exclusive_group(required=True)
+    m.add_boolean_key('angstrom')
+    m.add_boolean_key('bohr')
+    b = r.add_block_key('geometry', repeat=True)
+    b.add_line_key('charge', type=int, required=True)
+    c = b.add_block_key('inner')
+    c.add_line_key('x', type=None, glob={'len':'+', 'type':(int, 'none')},
+                   repeat=True)
+    return r
+
+def test_generate_valid(setup):
+    for seed in range(50):
+        lines = generate_input(setup, lines=100, seed=seed)
+        inp = setup.read_input(lines)
+        assert inp.pat is not None
+        assert inp.angstrom or inp.bohr
+        assert not (inp.angstrom and inp.bohr)
+        if inp.bool:
+            assert inp.title is not None
+
+def test_generate_size_and_seed(setup):
+    lines = generate_input(setup, lines=1000, seed=1)
+    assert 1000 <= len(lines) < 1100
+    assert lines == generate_input(setup, lines=1000, seed=1)
+    assert lines != generate_input(setup, lines=1000, seed=2)
+    assert len(generate_input(setup, lines=0, seed=1)) < 20
+
+def test_generate_errors(setup):
+    with raises(ValueError):
+        generate_input(setup, lines=-1)
+    with raises(ValueError):
+        generate_input(setup, max_glob=0)
+    # A regex that cannot be matched
+    r = InputReader()
+    r.add_line_key('bad', type=re.compile(r'(a)\1'), required=True)
+    with raises(ValueError):
+        generate_input(r, seed=1)
@@ -0,0 +1,68 @@
+from __future__ import unicode_literals
+from input_reader import InputReader, ReaderError
+from pytest import raises, fixture
+
+@fixture
+def setup():
+    r = InputReader()
+    r.add_line_key('title', glob={'len':'*', 'join':True})
+    r.add_line_key('atom', type=[str, float], repeat=True)
+    b = r.add_block_key('geometry', required=True)
+    b.add_line_key('charge', type=int)
+    b.add_boolean_key('angstrom')
+    s = r.add_block_key('scf')
+    s.add_line_key('maxiter', type=int)
+    return r
+
+def test_incremental_reuses_unchanged(setup):
+    lines = ['title water', 'atom O 1.0', 'atom H 2.0',
+             'geometry', 'charge 0', 'end',
+             'scf', 'maxiter 10', 'end']
+    inc = setup.read_input_incremental(lines)
+    assert inc.namespace == setup.read_input(lines)
+    assert (inc.parsed, inc.reused) == (5, 0)
+    geometry = inc.namespace.geometry
+
+    # Change the scf block; everything else is reused
+    lines[7] = 'maxiter 20'
+    inp = inc.update(lines)
+    assert inp == setup.read_input(lines)
+    assert inp.scf.maxiter == 20
+    assert (inc.parsed, inc.reused) == (1, 4)
+    assert inp.geometry is geometry
+
+    # Insert a line at the top; the rest shifts down but is reused
+    lines.insert(1, 'atom He 0.0')
+    inp = inc.update(lines)
+    assert inp == setup.read_input(lines)
+    assert inp.atom == (('he', 0.0), ('o', 1.0), ('h', 2.0))
+    assert (inc.parsed, inc.reused) == (1, 5)
+
+    # Re-reading with no changes parses nothing
+    inc.update()
+    assert (inc.parsed, inc.reused) == (0, 6)
+
+def test_incremental_checks(setup):
+    lines = ['geometry', 'charge 0', 'end', 'scf', 'end']
+    inc = setup.read_input_incremental(lines)
+    # The top level is always checked again
+    with raises(ReaderError) as e:
+        inc.update(['scf', 'end'])
+    assert 'The key "geometry" is required but not found' in str(e.value)
+    # Errors in a changed block are found
+    with raises(ReaderError) as e:
+        inc.update(['geometry', 'charge 0.5', 'end', 'scf', 'end'])
+    assert 'charge: expected int, got "0.5"' in str(e.value)
+    with raises(ReaderError) as e:
+        inc.update(['geometry', 'charge 0', 'end', 'geometry', 'end'])
+    assert 'The key "geometry" appears twice' in str(e.value)
+    # The previous result is kept after an error
+    assert inc.namespace.geometry.charge == 0
+
+def test_incremental_schema_change(setup):
+    lines = ['geometry', 'charge 0', 'end']
+    inc = setup.read_input_incremental(lines)
+    setup.add_boolean_key('debug')
+    inc.update()
+    assert (inc.parsed, inc.reused) == (1, 0)
+    assert inc.namespace.debug is None
@@ -371,3 +371,184 @@ def test_line_read_using_keywords():
     with raises(ReaderError) as e:
         inp = r.read_input(['cyan by = 3'])
     assert 'Error reading keyword argument' in str(e.value)
+
+def test_line_memoize():
+    import re
+    r = InputReader()
+    elements = ('h', 'he', 'c', 'n', 'o')
+    a = r.add_line_key('atom', type=[elements, float, re.compile(r'[xyz]+')],
+                       repeat=True, memoize=True)
+    b = r.add_line_key('basis', type=None,
+                       glob={'len':'+', 'type':elements},
+                       memoize=2, memoize_numbers=True)
+    c = r.add_line_key('opts', type=None,
+                       keywords={'elem':{'type':elements},
+                                         'n':{'type':int}},
+                       memoize=True, memoize_numbers=True)
+    inp = r.read_input(['atom H 1.0 x', 'atom C 2.0 x', 'atom H 3.0 xy',
+                        'basis h c h c n n', 'opts elem=c n=4'])
+    assert inp.atom == (('h', 1.0, 'x'), ('c', 2.0, 'x'), ('h', 3.0, 'xy'))
+    assert inp.basis == ('h', 'c', 'h', 'c', 'n', 'n')
+    assert inp.opts == {'elem': 'c', 'n': 4}
+    # Floats are only memoized when asked
+    assert a.memo_stats() == {0: (1, 2), 2: (1, 2)}
+    # Memos stop growing once full
+    assert b.memo_stats() == {'glob': (2, 4)}
+    assert c.memo_stats() == {'elem': (0, 1), 'n': (0, 1)}
+    # Bad tokens are still errors every time
+    with raises(ReaderError) as e:
+        r.read_input(['atom Zn 1.0 x'])
+    assert 'atom: expected one of' in str(e.value)
+    with raises(ValueError) as e:
+        r.add_line_key('red', memoize=-4)
+    assert 'memoize must be a bool or a positive int' in str(e.value)
+    with raises(ValueError) as e:
+        r.add_line_key('blue', memoize=True, memoize_numbers=None)
+    assert 'memoize_numbers must be a bool' in str(e.value)
+    assert r.add_line_key('green', memoize=True).memo_stats() == {}
+
+def test_line_intern():
+    import re
+    r = InputReader(intern=True)
+    r.add_line_key('name', type=str)
+    r.add_line_key('code', type=re.compile(r'[a-z]+\d+'))
+    r.add_line_key('color', type=('red', 'blue'), intern=False)
+    r.add_line_key('tags', type=None, glob={'len':'*'})
+    b = r.add_block_key('sub')
+    b.add_line_key('label')
+    b.add_line_key('raw', intern=False)
+    with raises(ValueError) as e:
+        r.add_line_key('bad', intern='yes')
+    assert 'intern must be bool' in str(e.value)
+    lines = ['name water', 'code ab12', 'color red', 'tags fast cheap',
+             'sub', 'label x', 'raw longname', 'end']
+    # Split the lines freshly each time so the strings start out distinct
+    inp1 = r.read_input([''.join(list(x)) for x in lines])
+    inp2 = r.read_input([''.join(list(x)) for x in lines])
+    assert inp1 == inp2
+    assert inp1.name is inp2.name
+    assert inp1.code is inp2.code
+    assert inp1.tags[1] is inp2.tags[1]
+    assert inp1.sub.label is inp2.sub.label
+    assert inp1.sub.raw is not inp2.sub.raw
+    # Explicit choices are always the choice given in the definition
+    assert inp1.color is inp2.color
+    # Without interning, equal strings are different objects
+    r = InputReader()
+    r.add_line_key('name', type=str)
+    inp1 = r.read_input(['name longname'])
+    inp2 = r.read_input(['name longname'])
+    assert inp1.name is not inp2.name
+
+def test_line_key_columns():
+    from array import array
+    r = InputReader()
+    r.add_line_key('atom', type=[str, float, float, int], repeat=True,
+                   columns=True)
+    r.add_line_key('charge', type=float, repeat=True, columns=True)
+    r.add_line_key('mass', type=float, repeat=True)
+    b = r.add_block_key('inner')
+    b.add_line_key('x', type=int, repeat=True, columns=True)
+    inp = r.read_input(['atom H 0.0 1.5 1', 'charge 0.5', 'atom O 2 -1 8',
+                        'charge -1', 'mass 1', 'inner', 'x 4', 'x 5', 'end'])
+    names, xs, ys, numbers = inp.atom
+    assert names == ('h', 'o')
+    assert list(xs) == [0.0, 2.0]
+    assert list(ys) == [1.5, -1.0]
+    assert list(numbers) == [1, 8]
+    assert list(inp.charge) == [0.5, -1.0]
+    assert list(inp.inner.x) == [4, 5]
+    assert inp.mass == (1.0,)
+    try:
+        import numpy
+    except ImportError:
+        assert isinstance(xs, array)
+    else:
+        assert isinstance(xs, numpy.ndarray)
+    # Not given
+    assert r.read_input([]).atom is None
+
+
+def test_line_key_columns_errors():
+    r = InputReader()
+    with raises(ValueError):
+        r.add_line_key('a', type=float, columns=True)
+    with raises(ValueError):
+        r.add_line_key('b', type=float, repeat=True, columns=1)
+    with raises(ValueError):
+        r.add_line_key('c', type=[float, ('x', 'y')], repeat=True,
+                       columns=True)
+    with raises(ValueError):
+        r.add_line_key('d', type=float, glob={'len': '*'}, repeat=True,
+                       columns=True)
+    r.add_line_key('e', type=[int, int], repeat=True, columns=True)
+    with raises(ReaderError) as e:
+        r.read_input(['e 1 2', 'e 3 '+str(2**70)])
+    assert e.value.code == ReaderError.BAD_VALUE
+    with raises(ReaderError) as e:
+        r.read_input(['e 1 2', 'e 3 x'])
+    assert e.value.code == ReaderError.BAD_VALUE
+
+
+def test_line_glob_numbers():
+    from array import array
+    r = InputReader()
+    r.add_line_key('coef', type=None, glob={'len': '*', 'type': float})
+    r.add_line_key('big', type=None, glob={'len': '*', 'type': int})
+    r.add_line_key('basis', type=str, glob={'len': '+', 'type': float,
+                                            'array': True})
+    r.add_line_key('grid', type=None, glob={'len': '*', 'type': int,
+                                            'array': True, 'default': None})
+    inp = r.read_input(['coef 1 2.5 -3e2', 'big 1 '+str(2**70),
+                        'basis s 0.5 1.5', 'grid'])
+    assert inp.coef == (1.0, 2.5, -300.0)
+    assert inp.big == (1, 2**70)
+    assert inp.basis[0] == 's'
+    assert list(inp.basis[1]) == [0.5, 1.5]
+    assert inp.grid is None
+    try:
+        import numpy
+    except ImportError:
+        assert isinstance(inp.basis[1], array)
+    else:
+        assert isinstance(inp.basis[1], numpy.ndarray)
+    assert list(r.read_input(['grid 1 2 3']).grid) == [1, 2, 3]
+
+    # The first bad token is reported
+    for line, token in (('coef 1 x y', 'x'), ('basis s 1 2 z', 'z'),
+                        ('grid 1 '+str(2**70), str(2**70))):
+        with raises(ReaderError) as e:
+            r.read_input([line])
+        assert e.value.code == ReaderError.BAD_VALUE
+        assert 'got "'+token+'"' in str(e.value)
+
+    with raises(ValueError):
+        r.add_line_key('a', glob={'len': '*', 'type': str, 'array': True})
+    with raises(ValueError):
+        r.add_line_key('b', glob={'len': '?', 'type': int, 'array': True})
+    with raises(ValueError):
+        r.add_line_key('c', glob={'len': '*', 'type': int, 'array': 1})
+
+
+def test_line_range_type():
+    r = InputReader()
+    r.add_line_key('frames', type=range)
+    r.add_line_key('one', type=range, repeat=True)
+    inp = r.read_input(['frames 1 10000000 3', 'one 5 5', 'one -2 2'])
+    assert isinstance(inp.frames, type(range(0)))
+    assert len(inp.frames) == 3333334
+    assert (inp.frames[0], inp.frames[-1]) == (1, 10000000)
+    assert [list(x) for x in inp.one] == [[5], [-2, -1, 0, 1, 2]]
+    for line, code in (('frames 1', ReaderError.BAD_ARGUMENTS),
+                       ('frames 1 2 3 4', ReaderError.BAD_ARGUMENTS),
+                       ('frames 1 x', ReaderError.BAD_VALUE),
+                       ('frames 1 2.5', ReaderError.BAD_VALUE),
+                       ('frames 1 10 0', ReaderError.BAD_VALUE),
+                       ('frames 10 1', ReaderError.BAD_VALUE)):
+        with raises(ReaderError) as e:
+            r.read_input([line])
+        assert e.value.code == code
+    with raises(TypeError):
+        r.add_line_key('a', type=range, glob={'len': '*'})
+    with raises(ValueError):
+        r.add_line_key('b', type=range, repeat=True, columns=True)
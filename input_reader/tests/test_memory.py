@@ -0,0 +1,66 @@
+from __future__ import unicode_literals
+import sys
+from input_reader import InputReader, memory_report
+from pytest import fixture
+
+@fixture
+def setup():
+    r = InputReader()
+    r.add_line_key('title', glob={'len':'*', 'join':True})
+    r.add_line_key('atom', type=[str, float, float, float], repeat=True)
+    r.add_regex_line('pair', r'(\d+)\s+(\d+)')
+    b = r.add_block_key('geometry', repeat=True)
+    b.add_line_key('charge', type=int)
+    b.add_line_key('coords', type=None, glob={'len':'*', 'type':float})
+    return r
+
+LINES = ['title water', 'atom O 0.0 0.0 0.0', 'atom H 1.0 0.0 0.0',
+         '12 34', 'geometry', 'charge 0', 'coords 1 2 3 4 5 6', 'end',
+         'geometry', 'charge 1', 'end']
+
+def test_memory_report(setup):
+    inp = setup.read_input(LINES)
+    report = memory_report(inp, input_size=LINES)
+    assert set(report.keys) == set(['title', 'atom', 'pair', 'geometry',
+                                    'geometry.charge', 'geometry.coords'])
+    assert set(report.blocks) == set(['geometry'])
+
+    # The tuple of two atoms, two inner tuples, and their values
+    atom = report.keys['atom']
+    assert atom.containers == (sys.getsizeof(inp.atom) +
+                               sys.getsizeof(inp.atom[0]) * 2)
+    assert atom.values > 0
+    # The match object keeps its line
+    assert report.keys['pair'].total > sys.getsizeof(inp.pair)
+    # Keys of repeated blocks are summed
+    assert report.keys['geometry.charge'].objects == 2
+    assert (report.keys['geometry'].total ==
+            report.blocks['geometry'].total + sys.getsizeof(inp.geometry))
+    # Everything adds up
+    assert report.total.total > sum([report.keys[k].total for k in
+                                     ('title', 'atom', 'pair', 'geometry')])
+    assert report.input_size == sum([len(x) + 1 for x in LINES])
+    assert report.ratio == report.total.total / report.input_size
+    assert 'geometry.coords' in report.report()
+
+def test_memory_report_shared(setup):
+    inp = setup.read_input(LINES)
+    # An object in two places is counted once
+    inp.add('again', inp.atom)
+    report = memory_report(inp)
+    assert report.keys['again'].total == 0
+    assert report.ratio is None
+    assert 'input' not in report.report()
+
+def test_memory_report_deep_nesting():
+    depth = sys.getrecursionlimit() + 100
+    r = InputReader()
+    level = r
+    for n in range(depth):
+        level = level.add_block_key('b')
+    level.add_line_key('x', type=int)
+    inp = r.read_input(['b'] * depth + ['x 1'] + ['end'] * depth)
+    report = memory_report(inp)
+    assert report.keys['.'.join(['b'] * depth + ['x'])].objects == 1
+    assert report.keys['b'].total == report.blocks['b'].total
+    assert 0 < report.keys['b'].total < report.total.total
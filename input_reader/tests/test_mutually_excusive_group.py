@@ -135,3 +135,25 @@ def test_read_mutex_set_dest_set_required():
     with raises(ReaderError) as e:
         inp = r.read_input(['cyan'])
     assert search(r'One and only one of .* must be included', str(e.value))
+
+def test_keys_added_after_reading():
+    # What is known about the keys is worked out once, so check it
+    # is worked out again when keys are added between reads
+    r = InputReader()
+    r.add_boolean_key('cyan')
+    assert r.read_input(['cyan']) == r.read_input(['cyan'])
+    meg = r.add_mutually_exclusive_group(required=True, dest='color')
+    meg.add_boolean_key('red')
+    with raises(ReaderError):
+        r.read_input(['cyan'])
+    meg.add_boolean_key('blue')
+    assert r.read_input(['cyan', 'blue']).color
+    r.add_line_key('gray', default=4, depends='cyan', required=True)
+    inp = r.read_input(['cyan', 'red', 'gray 5'])
+    assert inp.gray == '5'
+    with raises(ReaderError) as e:
+        r.read_input(['red', 'gray 5'])
+    assert e.value.code == ReaderError.MISSING_DEPENDENCY
+    with raises(ReaderError) as e:
+        r.read_input(['red', 'cyan'])
+    assert e.value.code == ReaderError.MISSING_REQUIRED
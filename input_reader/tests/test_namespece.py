@@ -65,3 +65,89 @@ def test_namespace_string():
     ns2.finalize()
     assert str(ns2) in ('Namespace(red=True, blue=False)',
                         'Namespace(blue=False, red=True)')
+
+def test_namespace_pickle():
+    import pickle
+    ns1 = Namespace(red=True)
+    ns1.add('big', True)
+    ns1.add('small', (1, 2.5))
+    ns1.add('block', Namespace())
+    ns1.block.add('medium', 'hello')
+    # Attributes set outside of add (i.e. mutually exclusive dest defaults)
+    # are kept as well
+    ns1.loose = 4
+    ns2 = pickle.loads(pickle.dumps(ns1, 2))
+    assert ns1 == ns2
+    assert tuple(ns2.keys()) == ('big', 'small', 'block')
+    assert ns2.loose == 4
+    assert ns2.block.medium == 'hello'
+    # Unfinalized defaults survive the round trip
+    ns2.finalize()
+    assert ns2.red
+
+def test_namespace_pickle_shares_keys():
+    import pickle
+    from input_reader.helpers import _intern_keys
+    namespaces = []
+    for i in range(3):
+        ns = Namespace()
+        ns.add('big', i)
+        ns.add('small', -i)
+        namespaces.append(ns)
+    # The key tuple is written only once for all three namespaces
+    data = pickle.dumps(namespaces, 2)
+    assert data.count(b'small') == 1
+    assert _intern_keys(('big', 'small')) is _intern_keys(('big', 'small'))
+    assert [ns.big for ns in pickle.loads(data)] == [0, 1, 2]
+
+def test_namespace_shared_defaults():
+    import pickle
+    defaults = {'red': 1, 'blue': [], 'green': 'g'}
+    ns1 = Namespace._sharing(defaults)
+    ns2 = Namespace._sharing(defaults)
+    ns1.add('red', 4)
+    ns1.remove('green')  # Not added yet, so still given by finalize
+    ns1.finalize()
+    ns2.finalize()
+    assert ns1.red == 4
+    assert ns2.red == 1
+    assert ns1.green == 'g'
+    assert 'green' in ns1
+    # Mutable defaults are not shared once used
+    ns1.blue.append(5)
+    assert ns1.blue == [5]
+    assert ns2.blue == []
+    assert defaults == {'red': 1, 'blue': [], 'green': 'g'}
+    # Removing a default after finalize removes it
+    ns2.remove('red')
+    assert 'red' not in ns2
+    assert ns2.get('red') is None
+    # Defaults compare and pickle like keys that were added
+    ns3 = Namespace()
+    ns3.add('red', 4)
+    ns3.add('green', 'g')
+    ns3.add('blue', [5])
+    assert sorted(ns1.items()) == sorted(ns3.items())
+    ns4 = pickle.loads(pickle.dumps(ns1))
+    assert ns4 == ns1
+    assert ns4.keys() == ns1.keys()
+
+def test_namespace_defaults_kept_as_given():
+    import threading
+    from input_reader import InputReader
+    sentinel = object()
+    lock = threading.Lock()
+    r = InputReader()
+    r.add_line_key('a', type=int, default=sentinel)
+    r.add_line_key('b', type=int, default=lock)
+    r.add_line_key('c', type=int, default=[1])
+    r.add_boolean_key('flag')
+    inp = r.read_input([])
+    assert inp.a is sentinel
+    assert inp.b is lock
+    assert inp.c == [1]
+    inp.c.append(2)
+    assert r.read_input([]).c == [1]
+    # The defaults are set on the namespace
+    assert vars(r.read_input(['a 1']))['flag'] is None
+    assert vars(r.read_input(['a 1']))['b'] is lock
@@ -0,0 +1,109 @@
+from __future__ import unicode_literals
+from input_reader import InputReader, ReaderError, ParseStats
+from pytest import raises, fixture
+
+@fixture
+def setup():
+    r = InputReader(profile=True)
+    r.add_line_key('title', glob={'len':'*', 'join':True})
+    r.add_line_key('atom', type=[str, float], repeat=True)
+    b = r.add_block_key('geometry')
+    b.add_line_key('charge', type=int)
+    m = b.add_mutually_exclusive_group()
+    m.add_boolean_key('angstrom')
+    m.add_boolean_key('bohr')
+    return r
+
+LINES = ['title water', 'atom O 1.0', 'atom H 2.0',
+         'geometry', 'charge 0', 'angstrom', 'end']
+
+def test_profile_off(monkeypatch):
+    r = InputReader()
+    r.add_line_key('atom', type=[str, float])
+    assert r.stats is None
+    # Reading without profiling makes no hooks
+    def hooks(*args):
+        raise AssertionError('hooks made with profiling off')
+    monkeypatch.setattr('input_reader.profiling._ProfileHooks', hooks)
+    monkeypatch.setattr('input_reader.tracing._TraceHooks', hooks)
+    assert r.read_input(['atom O 1.0']).atom == ('o', 1.0)
+    with raises(AssertionError):
+        InputReader(profile=True).read_input(['atom O 1.0'])
+    with raises(ValueError):
+        InputReader(profile='yes')
+
+def test_profile_counts(setup):
+    setup.read_input(LINES)
+    stats = setup.stats
+    assert stats.keys['title'].calls == 1
+    assert stats.keys['atom'].calls == 2
+    assert stats.keys['geometry'].calls == 1
+    assert stats.keys['geometry.charge'].calls == 1
+    assert stats.keys['geometry.angstrom'].calls == 1
+    assert stats.keys['geometry.bohr'].calls == 0
+    assert stats.levels['main'].calls == 1
+    assert stats.levels['geometry'].calls == 1
+    assert stats.post_process.calls == 1
+    assert stats.reads.calls == 1
+    # Block times include the keys in them
+    assert (stats.keys['geometry'].total >=
+            stats.keys['geometry.charge'].total)
+    # The wrappers are gone after reading
+    assert '_parse' not in setup._keys['atom'].__dict__
+    assert 'post_process' not in setup.__dict__
+
+def test_profile_errors_and_batch(setup):
+    setup.read_input(LINES)
+    with raises(ReaderError):
+        setup.read_input(['atom O one'])
+    stats = setup.stats
+    assert stats.keys['atom'].calls == 3
+    assert stats.keys['atom'].errors == 1
+    assert stats.reads.calls == 2
+    assert stats.reads.errors == 1
+    assert 'atom' in stats.report()
+
+    # Combine the statistics of several readers
+    total = ParseStats()
+    total.merge(stats)
+    total.merge(stats)
+    assert total.keys['atom'].calls == 6
+    assert total.keys['atom'].max == stats.keys['atom'].max
+
+    stats.reset()
+    assert stats.keys == {}
+    setup.read_input(LINES)
+    assert stats.keys['atom'].calls == 2
+
+def test_profile_schema_unchanged(setup):
+    # Profiling is not part of the key definitions
+    setup.read_input(LINES)
+    r = InputReader()
+    r.add_line_key('title', glob={'len':'*', 'join':True})
+    r.add_line_key('atom', type=[str, float], repeat=True)
+    b = r.add_block_key('geometry')
+    b.add_line_key('charge', type=int)
+    m = b.add_mutually_exclusive_group()
+    m.add_boolean_key('angstrom')
+    m.add_boolean_key('bohr')
+    assert r._describe() == setup._describe()
+
+def test_profile_deep_nesting():
+    import sys
+    from input_reader import SpanRecorder
+    depth = sys.getrecursionlimit() + 100
+    tracer = SpanRecorder()
+    r = InputReader(profile=True, tracer=tracer)
+    level = r
+    for n in range(depth):
+        level = level.add_block_key('b')
+    level.add_line_key('x', type=int)
+    inp = r.read_input(['b'] * depth + ['x 1'] + ['end'] * depth)
+    for n in range(depth):
+        inp = inp.b
+    assert inp.x == 1
+    assert r.stats.keys['b'].calls == 1
+    assert r.stats.keys['.'.join(['b'] * depth + ['x'])].calls == 1
+    levels = [s for s in tracer.spans if s.name == 'parse_level']
+    assert len(levels) == depth + 1
+    assert levels[0].attributes['first_line'] == depth
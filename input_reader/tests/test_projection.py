@@ -0,0 +1,68 @@
+from __future__ import unicode_literals
+from input_reader import InputReader, ReaderError
+from pytest import raises, fixture
+
+@fixture
+def setup():
+    r = InputReader()
+    r.add_line_key('title', type=str, required=True)
+    r.add_line_key('atoms', type=int, glob={'len': '*', 'type': float})
+    r.add_boolean_key('flag')
+    b = r.add_block_key('geometry')
+    b.add_line_key('charge', type=int)
+    b.add_line_key('coord', type=float, repeat=True)
+    b.add_boolean_key('linear', default=False)
+    inner = b.add_block_key('basis')
+    inner.add_line_key('name', required=True)
+    m = r.add_mutually_exclusive_group(dest='units', required=True)
+    m.add_boolean_key('bohr')
+    m.add_boolean_key('angstrom')
+    lines = ['title water', 'atoms 3 1.0 2.0 3.0', 'angstrom',
+             'geometry', 'coord 0.0', 'coord 1.0', 'charge -1',
+             'basis', 'name sto-3g', 'end', 'end']
+    return r, lines
+
+def test_projection_reads_only_what_is_asked(setup):
+    r, lines = setup
+    full = r.read_input(lines)
+    inp = r.read_input(lines, only=['title', 'geometry.charge'])
+    assert inp.title == full.title == 'water'
+    assert inp.geometry.charge == -1
+    assert 'atoms' not in inp
+    assert 'flag' not in inp
+    assert 'units' not in inp
+    assert 'coord' not in inp.geometry
+    assert 'linear' not in inp.geometry
+    assert 'basis' not in inp.geometry
+
+def test_projection_whole_block_and_groups(setup):
+    r, lines = setup
+    inp = r.read_input(lines, only=['GEOMETRY', 'units', 'geometry.charge'])
+    assert inp.geometry.coord == (0.0, 1.0)
+    assert inp.geometry.basis.name == 'sto-3g'
+    assert inp.units is r.read_input(lines).units
+    inp = r.read_input(lines, only='geometry.basis.name')
+    assert inp.geometry.basis.name == 'sto-3g'
+    assert 'charge' not in inp.geometry
+
+def test_projection_checks(setup):
+    r, lines = setup
+    # Required keys are only checked when asked for
+    assert 'title' not in r.read_input(lines[1:], only=['atoms'])
+    with raises(ReaderError) as e:
+        r.read_input(lines[1:], only=['title'])
+    assert e.value.code == ReaderError.MISSING_REQUIRED
+    # Structure is still checked everywhere
+    with raises(ReaderError) as e:
+        r.read_input(lines[:-1], only=['title'])
+    assert e.value.code == ReaderError.UNTERMINATED_BLOCK
+    with raises(ReaderError) as e:
+        r.read_input(lines + ['bad'], only=['title'])
+    assert e.value.code == ReaderError.UNKNOWN_KEY
+    # Unknown paths
+    with raises(ValueError):
+        r.read_input(lines, only=['colour'])
+    with raises(ValueError):
+        r.read_input(lines, only=['title.charge'])
+    with raises(ValueError):
+        r.read_input(lines, only=[5])
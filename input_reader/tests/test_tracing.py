@@ -0,0 +1,72 @@
+from __future__ import unicode_literals
+from input_reader import InputReader, ReaderError, SpanRecorder
+from pytest import raises, fixture
+
+@fixture
+def setup():
+    recorder = SpanRecorder()
+    r = InputReader(tracer=recorder, profile=True)
+    r.add_line_key('title', glob={'len':'*', 'join':True})
+    b = r.add_block_key('geometry')
+    b.add_line_key('charge', type=int)
+    return r, recorder
+
+LINES = ['title water  # comment', 'geometry', 'charge 0', 'end']
+
+def test_tracer_validation():
+    with raises(ValueError):
+        InputReader(tracer=object())
+    r = InputReader(tracer=(SpanRecorder(), SpanRecorder()))
+    assert len(r._tracers) == 2
+
+def test_tracing_spans(setup):
+    r, recorder = setup
+    r.read_input(LINES)
+    names = [s.name for s in recorder.spans]
+    assert names == ['read_file', 'preprocess', 'validate', 'parse_level',
+                     'validate', 'parse_level', 'post_process',
+                     'read_input']
+    spans = dict([((s.name, s.attributes.get('level')), s)
+                  for s in recorder.spans])
+    root = spans['read_input', None]
+    assert root.parent is None
+    assert root.attributes == {'lines': 4}
+    assert root.error is None
+    assert spans['read_file', None].attributes == {'lines': 4, 'characters': 41}
+    assert spans['read_file', None].parent is root
+    block = spans['parse_level', 'geometry']
+    assert block.attributes == {'level': 'geometry', 'first_line': 2,
+                                'last_line': 3}
+    assert block.parent is spans['parse_level', 'main']
+    assert spans['validate', 'geometry'].parent is block
+    assert spans['validate', 'main'].attributes['keys'] == 2
+    for s in recorder.spans:
+        assert s.duration >= 0
+        assert s.end_time >= s.start_time
+    # Profiling still sees everything
+    assert r.stats.keys['geometry.charge'].calls == 1
+    # Nothing is left wrapped
+    assert '_parse_key_level' not in r.__dict__
+    assert '_read_lines' not in r.__dict__
+
+def test_tracing_errors(setup):
+    r, recorder = setup
+    with raises(ReaderError):
+        r.read_input(['geometry', 'charge zero', 'end'])
+    root = recorder.spans[-1]
+    assert root.name == 'read_input'
+    assert isinstance(root.error, ReaderError)
+    assert all(s.error is not None for s in recorder.spans
+               if s.name == 'parse_level')
+
+def test_tracing_filename(setup, tmpdir):
+    r, recorder = setup
+    path = tmpdir.join('input.txt')
+    path.write('\n'.join(LINES))
+    inc = r.read_input_incremental(str(path))
+    root = recorder.spans[-1]
+    assert root.name == 'read_input_incremental'
+    assert root.attributes['filename'] == str(path)
+    recorder.clear()
+    inc.update()
+    assert recorder.spans[-1].name == 'read_input_incremental'
@@ -0,0 +1,120 @@
+from __future__ import unicode_literals
+from input_reader import InputReader, ReaderError
+from pytest import raises, fixture
+
+@fixture
+def setup():
+    r = InputReader()
+    r.add_line_key('title', glob={'len':'*', 'join':True}, required=True)
+    r.add_line_key('atom', type=[str, float], repeat=True)
+    r.add_boolean_key('verbose', depends='title')
+    m = r.add_mutually_exclusive_group()
+    m.add_boolean_key('angstrom')
+    m.add_boolean_key('bohr')
+    b = r.add_block_key('geometry')
+    b.add_line_key('charge', type=int, required=True)
+    b.add_line_key('mult', type=int)
+    return r
+
+def test_validate_good(setup):
+    lines = ['title water', 'atom O 1.0', 'geometry', 'charge 0', 'end']
+    assert setup.validate_input(lines) == []
+
+def test_validate_collects_everything(setup):
+    lines = ['atom O one',          # 1: wrong type
+             'bogus 7',             # 2: unknown
+             'angstrom',
+             'bohr',
+             'geometry',            # 5
+             'mult two',            # 6: wrong type, charge is missing
+             'mult 2',
+             'mult 3',              # 8: twice
+             'end',
+             'geometry',            # 10: block given twice
+             'charge 1',
+             'end',
+             'atom H 2.0']
+    errors = setup.validate_input(lines)
+    found = [(e.level, e.line) for e in errors]
+    assert found == [('main', 1), ('main', 2), ('geometry', 6),
+                     ('geometry', 8), ('geometry', 5), ('main', 10),
+                     ('main', None), ('main', None)]
+    assert all(isinstance(e, ReaderError) for e in errors)
+    msgs = [str(e) for e in errors]
+    assert msgs[0] == 'main: atom: expected float, got "one"'
+    assert 'Unrecognized key: "bogus 7"' in msgs[1]
+    assert msgs[2] == 'main: geometry: mult: expected int, got "two"'
+    assert 'The key "mult" appears twice' in msgs[3]
+    assert msgs[4] == ('main: geometry: The key "charge" is required '
+                       'but not found')
+    assert 'The key "geometry" appears twice' in msgs[5]
+    assert "Only one of 'angstrom', or 'bohr' may be included." in msgs[6]
+    assert 'The key "title" is required but not found' in msgs[7]
+
+    # read_input gives the first of them
+    with raises(ReaderError) as e:
+        setup.read_input(lines)
+    assert str(e.value) == msgs[0]
+    assert (e.value.level, e.value.line) == ('main', 1)
+
+def test_error_fields(setup):
+    # The fields say what went wrong and where
+    cases = [(['title t', 'atom O one'], 'bad_value', 'atom', 'main', 2),
+             (['title t', 'bogus 7'], 'unknown_key', 'bogus', 'main', 2),
+             (['title t', 'atom O'], 'bad_arguments', 'atom', 'main', 2),
+             (['title t', 'angstrom', 'bohr'], 'mutually_exclusive',
+              'bohr', 'main', None),
+             (['atom O 1.0'], 'missing_required', 'title', 'main', None),
+             (['title t', 'geometry', 'mult 1', 'end'], 'missing_required',
+              'charge', 'geometry', 2),
+             (['title t', '', 'geometry', 'charge 0', 'charge 1', 'end'],
+              'duplicate_key', 'charge', 'geometry', 5),
+             (['title t', 'geometry', 'charge 0'], 'unterminated_block',
+              'geometry', 'geometry', 2)]
+    for lines, code, key, level, line in cases:
+        with raises(ReaderError) as e:
+            setup.read_input(lines)
+        assert (e.value.code, e.value.key, e.value.level, e.value.line) == \
+               (code, key, level, line)
+        # The same is found when collecting all the errors
+        errors = setup.validate_input(lines)
+        assert len(errors) == 1
+        assert (errors[0].code, errors[0].key) == (code, key)
+    assert ReaderError.BAD_VALUE == 'bad_value'
+    with raises(ReaderError) as e:
+        setup.read_input('/no/such/file')
+    assert e.value.code == ReaderError.UNREADABLE_FILE
+
+def test_error_fields_nested():
+    r = InputReader()
+    b = r.add_block_key('red')
+    b.add_block_key('blue').add_line_key('egg', type=int)
+    with raises(ReaderError) as e:
+        r.read_input(['red', 'blue', 'egg one', 'end', 'end'])
+    assert str(e.value) == 'main: red: blue: egg: expected int, got "one"'
+    assert (e.value.level, e.value.line) == ('red.blue', 3)
+    r.add_boolean_key('green', depends='red')
+    with raises(ReaderError) as e:
+        r.read_input(['green'])
+    assert (e.value.code, e.value.key) == ('missing_dependency', 'green')
+
+def test_ignoreunknown_is_not_an_error():
+    r = InputReader(ignoreunknown=True)
+    r.add_line_key('red', type=int)
+    b = r.add_block_key('blue', ignoreunknown=False)
+    b.add_boolean_key('egg')
+    inp = r.read_input(['bogus', 'red 4', 'other 1 2 3'])
+    assert inp.red == 4
+    # A block that does not ignore unknown keys still complains
+    with raises(ReaderError) as e:
+        r.read_input(['blue', 'bogus', 'end'])
+    assert (e.value.code, e.value.key, e.value.level) == \
+           ('unknown_key', 'bogus', 'blue')
+
+def test_validate_unterminated(setup):
+    errors = setup.validate_input(['title t', 'geometry', 'charge 0'])
+    assert [str(e) for e in errors] == ['main: geometry: Unterminated block.']
+    assert errors[0].line == 2
+    # Unknown keys are not errors if ignored
+    setup._ignoreunknown = True
+    assert setup.validate_input(['title t', 'bogus']) == []
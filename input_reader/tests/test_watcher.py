@@ -0,0 +1,98 @@
+from __future__ import print_function, unicode_literals
+from input_reader import InputReader, InputWatcher
+from pytest import raises, fixture
+from os import remove
+import threading
+import time
+
+def write(text):
+    with open('TEMP_WATCHED', 'w') as fl:
+        fl.write(text)
+
+@fixture
+def reader(request):
+    write('red 1\n')
+    request.addfinalizer(lambda: remove('TEMP_WATCHED'))
+    r = InputReader()
+    r.add_line_key('red', type=int)
+    r.add_boolean_key('blue')
+    return r
+
+def test_watcher_definition(reader):
+    with raises(ValueError):
+        InputWatcher(reader, interval=-1)
+    with raises(ValueError):
+        InputWatcher(reader, debounce='1')
+    with raises(ValueError):
+        InputWatcher(reader, inotify=1)
+
+def test_watcher_check(reader):
+    w = InputWatcher(reader, debounce=0)
+    found = []
+    errors = []
+    w.subscribe(lambda f, ns: found.append((f, ns.red)),
+                lambda f, e: errors.append((f, str(e))))
+    assert w.watch('TEMP_WATCHED').red == 1
+    assert w.check() == []
+    write('red 22\n')
+    assert w.check() == ['TEMP_WATCHED']
+    assert w.get('TEMP_WATCHED').red == 22
+    assert found == [('TEMP_WATCHED', 22)]
+    # A bad file keeps the old result
+    write('red 2.5\n')
+    assert w.check() == []
+    assert w.get('TEMP_WATCHED').red == 22
+    assert errors[0][0] == 'TEMP_WATCHED'
+    assert 'expected int' in errors[0][1]
+    w.unwatch('TEMP_WATCHED')
+    with raises(KeyError):
+        w.get('TEMP_WATCHED')
+
+def test_watcher_debounce(reader):
+    w = InputWatcher(reader, debounce=60)
+    w.watch('TEMP_WATCHED')
+    write('red 22\n')
+    assert w.check() == []
+    write('red 333\n')
+    assert w.check() == []
+    w.debounce = 0
+    assert w.check() == ['TEMP_WATCHED']
+    assert w.get('TEMP_WATCHED').red == 333
+
+def test_watcher_thread(reader):
+    event = threading.Event()
+    with InputWatcher(reader, interval=0.05, debounce=0.01) as w:
+        w.subscribe(lambda f, ns: event.set())
+        w.watch('TEMP_WATCHED')
+        time.sleep(0.05)
+        write('red 4444\n')
+        assert event.wait(5)
+    assert w.get('TEMP_WATCHED').red == 4444
+
+def test_watcher_failing_subscribers(reader):
+    w = InputWatcher(reader, debounce=0)
+    found = []
+    errors = []
+    def fail(*args):
+        raise RuntimeError('bad subscriber')
+    w.subscribe(fail, fail)
+    w.subscribe(lambda f, ns: found.append(ns.red),
+                lambda f, e: errors.append(str(e)))
+    w.watch('TEMP_WATCHED')
+    write('red 22\n')
+    # The other subscribers are still called
+    assert w.check() == ['TEMP_WATCHED']
+    assert found == [22]
+    assert errors == ['bad subscriber']
+    write('red 2.5\n')
+    assert w.check() == []
+    assert 'expected int' in errors[1]
+
+def test_watcher_stop_is_prompt(reader):
+    w = InputWatcher(reader, interval=60)
+    w.watch('TEMP_WATCHED')
+    w.start()
+    time.sleep(0.05)
+    start = time.time()
+    w.stop()
+    assert time.time() - start < 5
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Report each stage of reading an input as a tracing span."""
+from __future__ import division, print_function, unicode_literals
+
+import itertools
+import time
+from contextlib import contextmanager
+
+from .helpers import _Hooks
+from .profiling import _clock, _levels
+from .py23compat import py23_basestring
+
+__all__ = ['Span', 'SpanRecorder']
+
+_span_ids = itertools.count(1)
+
+
+class Span(object):
+    """\
+    One stage of reading an input.  The stages are
+
+    ``read_input``
+        The whole call to :py:meth:`~InputReader.read_input` (or
+        ``read_input_incremental`` for
+        :py:meth:`~InputReader.read_input_incremental` and its updates).
+        Has the ``filename`` read, if it is a name, and the number of
+        ``lines`` read.
+    ``read_file``
+        Reading the lines from the file.  Has the number of ``lines`` and
+        ``characters`` read.
+    ``preprocess``
+        Removing comments and whitespace.  Has the number of ``lines``.
+    ``parse_level``
+        Parsing the keys of one level, including its blocks.  Has the
+        ``level`` (the names of the blocks leading to it joined by dots,
+        or the name of the reader for the top level) and the
+        ``first_line`` and ``last_line`` parsed.
+    ``validate``
+        Checking the keys found in a level are allowed together.  Has the
+        ``level`` and the number of ``keys`` found.
+    ``post_process``
+        The call to :py:meth:`~InputReader.post_process`.
+
+    .. py:attribute:: name
+
+        The stage, one of the above.
+
+    .. py:attribute:: attributes
+
+        A :py:class:`dict` of information about the stage.
+
+    .. py:attribute:: span_id
+
+        A number identifying this span.
+
+    .. py:attribute:: parent
+
+        The :py:class:`Span` this stage is part of, or :py:obj:`None`
+        for ``read_input``.
+
+    .. py:attribute:: start_time
+
+        When the stage started, in seconds since the epoch.
+
+    .. py:attribute:: duration
+
+        How long the stage took, in seconds, or :py:obj:`None` if it has
+        not finished.
+
+    .. py:attribute:: error
+
+        The exception that ended the stage, or :py:obj:`None`.
+    """
+
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(_span_ids)
+        self.parent = parent
+        self.start_time = time.time()
+        self.duration = None
+        self.error = None
+        self._start = _clock()
+
+    def __repr__(self):
+        return '{0}({1!r}, {2!r}, duration={3!r})'.format(
+            type(self).__name__, self.name, self.attributes, self.duration)
+
+    @property
+    def end_time(self):
+        """When the stage finished, in seconds since the epoch."""
+        if self.duration is None:
+            return None
+        return self.start_time + self.duration
+
+
+class SpanRecorder(object):
+    """\
+    A tracer that keeps every finished :py:class:`Span` in
+    :py:attr:`spans`, in the order they finished (so stages come
+    before the stages they are part of).  Useful for testing and
+    for looking at a few reads by hand.
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    def start(self, span):
+        """Called when a stage starts.  Does nothing."""
+        pass
+
+    def finish(self, span):
+        """Called when a stage finishes.  Keeps the span."""
+        self.spans.append(span)
+
+    def clear(self):
+        """Forget the spans kept so far."""
+        del self.spans[:]
+
+
+class _Trace(object):
+    """The spans of one read that are in progress"""
+
+    def __init__(self, tracers):
+        self.tracers = tracers
+        self.stack = []
+
+    def start(self, name, **attributes):
+        """Starts a span inside the innermost span in progress"""
+        parent = self.stack[-1] if self.stack else None
+        span = Span(name, parent, **attributes)
+        for tracer in self.tracers:
+            tracer.start(span)
+        self.stack.append(span)
+        return span
+
+    def finish(self, error=None):
+        """Finishes the innermost span in progress"""
+        span = self.stack.pop()
+        span.error = error
+        span.duration = _clock() - span._start
+        for tracer in self.tracers:
+            tracer.finish(span)
+        return span
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Give the tracers a span for the code inside this context"""
+        span = self.start(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.finish(e)
+            raise
+        self.finish()
+
+
+class _TraceHooks(_Hooks):
+    """Gives the tracers a span for each stage of reading"""
+
+    def __init__(self, trace, reader):
+        self.trace = trace
+        # The path of each level, as the tracers are given it
+        self.paths = {}
+        for blocks, level in _levels(reader, ()):
+            self.paths[level] = '.'.join(blocks) if blocks else reader.name
+
+    def _path(self, level):
+        """The path of *level*, or its name if it was added while reading"""
+        return self.paths.get(level, level.name)
+
+    def enter(self, level, i):
+        self.trace.start('parse_level', level=self._path(level), first_line=i)
+
+    def leave(self, level, i, error=None):
+        if error is None:
+            self.trace.stack[-1].attributes['last_line'] = i
+        self.trace.finish(error)
+
+    def post(self, level, namespace, run):
+        with self.trace.span('validate', level=self._path(level),
+                             keys=len(namespace._order)):
+            return run()
+
+    def stage(self, name, run):
+        with self.trace.span(name) as span:
+            result = run()
+            if name == 'read_file':
+                span.attributes['lines'] = len(result)
+                span.attributes['characters'] = sum([len(x) for x in result])
+            elif name == 'preprocess':
+                span.attributes['lines'] = len(result)
+            return result
+
+
+@contextmanager
+def _traced(reader, name, filename):
+    """\
+    Report the stages of reading *filename* with *reader* inside this
+    context to the tracers of the reader.  The context gives the hooks
+    to read with.
+    """
+    trace = _Trace(reader._tracers)
+    attributes = {}
+    if isinstance(filename, py23_basestring):
+        attributes['filename'] = filename
+    with trace.span(name, **attributes) as span:
+        yield _TraceHooks(trace, reader)
+        if reader.input_file is not None:
+            span.attributes['lines'] = len(reader.input_file)
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""Keep the results of reading input files up to date as the files change."""
+from __future__ import division, print_function, unicode_literals
+
+import logging
+import os
+import select
+import sys
+import threading
+import time
+
+from .cache import _file_identity
+
+__all__ = ['InputWatcher']
+
+_log = logging.getLogger(__name__)
+
+# inotify events that mean a file in a watched directory may have changed
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO |
+            _IN_CREATE | _IN_DELETE)
+_IN_NONBLOCK = getattr(os, 'O_NONBLOCK', 0o4000)
+_IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0o2000000)
+
+
+def _load_inotify():
+    """Returns the C library if it provides inotify, otherwise None."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (ImportError, OSError, AttributeError):
+        return None
+    return libc
+
+
+class _WatchedFile(object):
+    """The state of one watched file."""
+
+    def __init__(self, incremental, identity):
+        self.incremental = incremental
+        # The identity of the file that was last read
+        self.identity = identity
+        # A change that is waiting for writes to settle, and when it was seen
+        self.pending = None
+        self.since = 0.0
+
+
+class InputWatcher(object):
+    """\
+    Watches a set of input files and reads them again in the background
+    when they change, so that a long-running program always has the
+    latest results without reading its input each time it needs it.
+
+    Files are checked for changes every *interval* seconds by looking at
+    their size and modification time.  On Linux, inotify is also used to
+    notice changes as soon as they happen.  A change is only read once
+    the file has stopped changing for *debounce* seconds, so a burst of
+    writes causes one read.  Files are read again with
+    :py:meth:`InputReader.read_input_incremental`, so only the parts that
+    changed are parsed.
+
+    New results replace the old ones all at once: :py:meth:`get` returns
+    either the complete old :py:class:`Namespace` or the complete new one.
+    If reading a changed file fails, the old result is kept.
+
+    The reader is used from the background thread, so it should not be
+    used elsewhere while the watcher is running.  An exception raised
+    by a callback is given to the errbacks, and one raised by an errback
+    is logged, so that the other subscribers are still called and the
+    thread keeps running.
+
+    :argument reader:
+        The reader used to read the files.
+    :type reader: :py:class:`InputReader`
+    :keyword interval:
+        How often, in seconds, to check the files for changes.
+        The default is :py:const:`1.0`.
+    :type interval: float
+    :keyword debounce:
+        How long, in seconds, a file must stop changing before
+        it is read.  The default is :py:const:`0.25`.
+    :type debounce: float
+    :keyword inotify:
+        Use inotify when it is available.  The default is :py:obj:`True`.
+    :type inotify: bool
+    """
+
+    def __init__(self, reader, interval=1.0, debounce=0.25, inotify=True):
+        for name, value in (('interval', interval), ('debounce', debounce)):
+            if not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(name+' must be a non-negative number, '
+                                 'given '+repr(value))
+        if not isinstance(inotify, bool):
+            raise ValueError('inotify must be a bool, given '+repr(inotify))
+        self.reader = reader
+        self.interval = interval
+        self.debounce = debounce
+        self._files = {}
+        self._results = {}
+        self._callbacks = []
+        self._errbacks = []
+        # Only one read at a time may use the reader
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # inotify file descriptor and the watched directories
+        self._libc = _load_inotify() if inotify else None
+        self._fd = None
+        self._dirs = set()
+        # A pipe written to by stop to wake the thread from select
+        self._wake = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def watch(self, filename):
+        """\
+        Read *filename* and start watching it for changes.
+
+        :argument filename:
+            The file to watch.
+        :type filename: str
+        :rtype: :py:class:`Namespace`: The result of reading the file.
+        :exception:
+            :py:exc:`ReaderError`: The file could not be read.
+        """
+        identity = _file_identity(filename)
+        with self._lock:
+            incremental = self.reader.read_input_incremental(filename)
+        self._files[filename] = _WatchedFile(incremental, identity)
+        self._results[filename] = incremental.namespace
+        self._watch_directory(filename)
+        return incremental.namespace
+
+    def unwatch(self, filename):
+        """Stop watching *filename*.  It is ignored if not watched."""
+        self._files.pop(filename, None)
+        self._results.pop(filename, None)
+
+    def get(self, filename):
+        """\
+        Return the latest result of reading *filename*.
+
+        :argument filename:
+            A file given to :py:meth:`watch`.
+        :type filename: str
+        :rtype: :py:class:`Namespace`
+        """
+        return self._results[filename]
+
+    def subscribe(self, callback, errback=None):
+        """\
+        Have functions called from the background thread when a
+        watched file is read again.
+
+        :argument callback:
+            Called as ``callback(filename, namespace)`` with each new result.
+        :keyword errback:
+            Called as ``errback(filename, exception)`` when reading a
+            changed file fails.  Optional.
+        """
+        self._callbacks.append(callback)
+        if errback is not None:
+            self._errbacks.append(errback)
+
+    def start(self):
+        """Start watching in a background thread."""
+        if self._thread is not None:
+            return
+        for filename in self._files:
+            self._watch_directory(filename)
+        self._stop.clear()
+        self._wake = os.pipe()
+        self._thread = threading.Thread(target=self._run,
+                                        name='InputWatcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread, waiting for it to finish."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        os.write(self._wake[1], b'x')
+        self._thread.join()
+        self._thread = None
+        for fd in self._wake:
+            os.close(fd)
+        self._wake = None
+
+    def check(self):
+        """\
+        Check the watched files for changes once, reading the ones that
+        changed and have settled.  This is what the background thread
+        does repeatedly, but it may also be called directly instead of
+        using the thread.
+
+        :rtype: :py:class:`list`: The files that were read again.
+        """
+        now = time.time()
+        reloaded = []
+        for filename, state in list(self._files.items()):
+            identity = _file_identity(filename)
+            if identity == state.identity:
+                state.pending = None
+                continue
+            # Wait for the writes to stop before reading
+            if identity != state.pending:
+                state.pending = identity
+                state.since = now
+            if now - state.since < self.debounce:
+                continue
+            state.identity = identity
+            state.pending = None
+            try:
+                with self._lock:
+                    namespace = state.incremental.update()
+            except Exception as e:
+                self._failed(filename, e)
+                continue
+            self._results[filename] = namespace
+            reloaded.append(filename)
+            for callback in list(self._callbacks):
+                try:
+                    callback(filename, namespace)
+                except Exception as e:
+                    self._failed(filename, e)
+        return reloaded
+
+    def _failed(self, filename, error):
+        """Give *error* to each errback, or log it if there are none."""
+        if not self._errbacks:
+            _log.error('Error while watching %s', filename, exc_info=True)
+        for errback in list(self._errbacks):
+            try:
+                errback(filename, error)
+            except Exception:
+                _log.error('Error in errback for %s', filename, exc_info=True)
+
+    def _timeout(self):
+        """How long to wait before checking the files again."""
+        timeout = self.interval
+        now = time.time()
+        for state in list(self._files.values()):
+            if state.pending is not None:
+                timeout = min(timeout, state.since + self.debounce - now)
+        return max(timeout, 0.0)
+
+    def _run(self):
+        """The loop of the background thread."""
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception:
+                # e.g. a watched file could not be looked at
+                _log.error('Error while checking the watched files',
+                           exc_info=True)
+            timeout = self._timeout()
+            if self._fd is not None:
+                # Wake up early if something in a watched directory
+                # changes, or if stop is called
+                ready = select.select([self._fd, self._wake[0]], [], [],
+                                      timeout)[0]
+                if self._fd in ready:
+                    try:
+                        os.read(self._fd, 65536)
+                    except OSError:
+                        pass
+            else:
+                self._stop.wait(timeout)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._dirs = set()
+
+    def _watch_directory(self, filename):
+        """\
+        Add the directory of *filename* to the inotify watches.  The
+        directory is watched rather than the file because editors often
+        replace a file rather than write to it.
+        """
+        if self._libc is None:
+            return
+        if self._fd is None:
+            fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd < 0:
+                self._libc = None
+                return
+            self._fd = fd
+        dirname = os.path.dirname(os.path.abspath(filename))
+        if dirname in self._dirs:
+            return
+        path = dirname.encode(sys.getfilesystemencoding())
+        if self._libc.inotify_add_watch(self._fd, path, _IN_MASK) >= 0:
+            self._dirs.add(dirname)